@@ -0,0 +1,81 @@
+"""Cold start of the command line client, compared with the imports of the Streamlit app.
+
+Every sample is a fresh interpreter, so nothing is cached in the process. The benchmark
+measures importing the CLI, a complete submission of a case of ``--files`` photos to the
+local mock server, including their pre-flight checks, and, for comparison, importing
+what ``streamlit_app.py`` needs. It fails if the median CLI submission takes longer than
+``--max-seconds``, or longer than ``--max-submit-seconds`` on top of importing the CLI
+(e.g. because the checks start worker processes), or if the CLI imports Streamlit,
+Pillow or PyPDF2 at start-up.
+
+    $ python benchmarks/bench_coldstart.py --repeat 10
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fraudscanner.mockserver import JSON, MockConfig, MockServer, make_image  # noqa: E402
+
+HEAVY_MODULES = ("streamlit", "PIL", "PyPDF2")
+CHECK_IMPORTS = f"import sys, fraudscanner.cli; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+
+
+def run(args: list[str]) -> tuple[float, str]:
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return time.perf_counter() - started, output
+
+
+def median_seconds(args: list[str], repeat: int) -> float:
+    return statistics.median(run(args)[0] for _ in range(repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--files", type=int, default=8, help="Photos in the submitted case")
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="Allowed median time of a CLI submission")
+    parser.add_argument("--max-submit-seconds", type=float, default=0.2, help="Allowed median time of a CLI submission after the imports")
+    args = parser.parse_args(argv)
+
+    failed = False
+    _, heavy = run(["-c", CHECK_IMPORTS])
+    if heavy.strip():
+        print(f"the CLI imports {heavy.strip()} at start-up")
+        failed = True
+
+    with tempfile.TemporaryDirectory() as directory, MockServer(MockConfig(mode=JSON), port=0) as server:
+        photos = [Path(directory) / f"photo_{i}.jpg" for i in range(args.files)]
+        for i, photo in enumerate(photos):
+            # Valid JPEGs, so that they pass the pre-flight checks
+            photo.write_bytes(make_image(256, True, i))
+        submit = ["-m", "fraudscanner.cli", *map(str, photos), "--case-number", "BENCH-1", "--api-url", server.url, "--api-key", "benchmark"]
+        timings = {
+            "python -c pass": median_seconds(["-c", "pass"], args.repeat),
+            "import fraudscanner.cli": median_seconds(["-c", "import fraudscanner.cli"], args.repeat),
+            f"CLI submission, {args.files} files": median_seconds(submit, args.repeat),
+            "import app dependencies": median_seconds(["-c", "import streamlit, PIL.Image, PyPDF2"], args.repeat),
+        }
+
+    for name, seconds in timings.items():
+        print(f"{name:<25} {seconds * 1000:8.1f} ms")
+    submission = timings[f"CLI submission, {args.files} files"]
+    if submission > args.max_seconds:
+        print(f"  CLI submission slower than {args.max_seconds}s")
+        failed = True
+    if submission - timings["import fraudscanner.cli"] > args.max_submit_seconds:
+        print(f"  CLI submission takes more than {args.max_submit_seconds}s after the imports")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
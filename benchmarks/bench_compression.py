@@ -0,0 +1,164 @@
+"""Upload compression: CPU spent deflating against upload bytes saved, on fast and slow links.
+
+A generated case of photos, PDFs, PNG screenshots and text is encoded with each policy:
+
+- ``stored``: no compression, as before
+- ``default``: the client's default, :meth:`CompressionPolicy.from_env`
+- ``zipfile``: every member deflated at level 6 on one thread, like ``ZipFile(..., ZIP_DEFLATED)``
+- ``adaptive``: :class:`CompressionPolicy` with its defaults, on all cores
+- ``adaptive-1``: the same policy on a single thread
+- ``fast``: the policy with level 1 for all compressible data
+
+For each policy the benchmark reports the wall and CPU seconds of building the body,
+the bytes sent, the measured upload to the local mock server, and the modelled submit
+time (build plus transfer) for each ``--links`` speed in Mbit/s, and the link speed
+below which the adaptive policy is faster than storing. It fails if the adaptive
+policy sends more bytes than ``stored``, or if the default policy is more than
+``--max-overhead`` slower than ``stored`` on the fastest link.
+
+    $ python benchmarks/bench_compression.py --photos 10 --pdfs 4 --links 2 10 100 1000
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fraudscanner.client import FraudScannerClient  # noqa: E402
+from fraudscanner.encoder import STORED, CompressionPolicy, ZipUploadBody  # noqa: E402
+from fraudscanner.mockserver import JSON, MockConfig, MockServer  # noqa: E402
+
+POLICIES = {
+    "stored": STORED,
+    "default": CompressionPolicy.from_env(),
+    "adaptive": CompressionPolicy(),
+    "adaptive-1": CompressionPolicy(workers=1),
+    "fast": CompressionPolicy(level=1),
+}
+
+
+def make_pdf(size: int, image_share: float) -> bytes:
+    # Text content streams with an embedded photo, like a scanned repair invoice
+    image = os.urandom(int(size * image_share))
+    lines = []
+    while sum(map(len, lines)) < size - len(image):
+        n = len(lines)
+        lines.append(b"BT /F1 10 Tf 72 %d Td (Position %d: Ersatzteil %d, %d,00 EUR) Tj ET\n" % (800 - n % 700, n, n * 7 % 9973, n % 500))
+    return b"%PDF-1.4\n" + b"".join(lines) + b"stream\n" + image + b"\nendstream\n%%EOF\n"
+
+
+def make_screenshot(side: int) -> bytes:
+    image = Image.new("RGB", (side, side), "white")
+    draw = ImageDraw.Draw(image)
+    for i in range(0, side, 24):
+        draw.rectangle((16, i, side - 16, i + 12), fill=(i % 256, 90, 160))
+        draw.text((20, i), f"Schadenposition {i}", fill="black")
+    output = io.BytesIO()
+    image.save(output, "PNG")
+    return output.getvalue()
+
+
+def make_case(args) -> list[tuple[str, bytes]]:
+    files = [(f"IMG_{i:04d}.jpg", os.urandom(args.photo_size)) for i in range(args.photos)]
+    files += [(f"rechnung_{i}.pdf", make_pdf(args.pdf_size, args.pdf_image_share)) for i in range(args.pdfs)]
+    files += [(f"screenshot_{i}.png", make_screenshot(args.screenshot_side)) for i in range(args.screenshots)]
+    files.append(("notizen.txt", "Kunde meldet Hagelschaden am Fahrzeug.\n".encode() * 2000))
+    return files
+
+
+def build_zipfile(files) -> tuple[int, float, float]:
+    started, cpu_started = time.perf_counter(), time.process_time()
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+    return len(output.getvalue()), time.perf_counter() - started, time.process_time() - cpu_started
+
+
+def build(files, policy: CompressionPolicy) -> tuple[ZipUploadBody, float, float]:
+    started, cpu_started = time.perf_counter(), time.process_time()
+    body = ZipUploadBody(files, compression=policy)
+    for _ in body:
+        pass
+    return body, time.perf_counter() - started, time.process_time() - cpu_started
+
+
+def upload_seconds(client: FraudScannerClient, files, policy: CompressionPolicy) -> float:
+    started = time.perf_counter()
+    with client.post(ZipUploadBody(files, compression=policy), "BENCH-1") as response:
+        response.content
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--photos", type=int, default=10)
+    parser.add_argument("--photo-size", type=int, default=3_000_000)
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pdf-size", type=int, default=4_000_000)
+    parser.add_argument("--pdf-image-share", type=float, default=0.3, help="Share of each PDF taken by an incompressible image")
+    parser.add_argument("--screenshots", type=int, default=4)
+    parser.add_argument("--screenshot-side", type=int, default=1200)
+    parser.add_argument("--links", type=float, nargs="+", default=[2, 10, 100, 1000], help="Uplink speeds in Mbit/s")
+    parser.add_argument("--repeat", type=int, default=3, help="Builds per policy, the fastest counts")
+    parser.add_argument("--max-overhead", type=float, default=0.25, help="Allowed extra time of the default policy on the fastest link")
+    parser.add_argument("--out", type=Path, default=None, help="Append the results to this JSONL file")
+    args = parser.parse_args(argv)
+
+    files = make_case(args)
+    raw = sum(len(data) for _, data in files)
+    print(f"case: {len(files)} files, {raw / 1e6:.1f} MB, {os.cpu_count()} cores\n")
+
+    results = {}
+    with MockServer(MockConfig(mode=JSON), port=0) as server:
+        client = FraudScannerClient(server.url, "benchmark")
+        for name, policy in POLICIES.items():
+            builds = [build(files, policy) for _ in range(args.repeat)]
+            body, wall, cpu = min(builds, key=lambda build: build[1])
+            results[name] = {"bytes": len(body), "build": wall, "cpu": cpu, "upload": upload_seconds(client, files, policy)}
+    size, wall, cpu = min((build_zipfile(files) for _ in range(args.repeat)), key=lambda build: build[1])
+    results["zipfile"] = {"bytes": size, "build": wall, "cpu": cpu, "upload": None}
+
+    links = [f"{mbit:g} Mbit/s" for mbit in args.links]
+    print(f"{'policy':<12}{'MB':>8}{'saved':>8}{'build s':>9}{'cpu s':>8}{'local s':>9}" + "".join(f"{link:>14}" for link in links))
+    for name, result in results.items():
+        # Modelled submit time: building the body, then sending its bytes at the link speed
+        result["links"] = {link: result["build"] + result["bytes"] * 8 / (mbit * 1e6) for link, mbit in zip(links, args.links)}
+        local = f"{result['upload']:9.3f}" if result["upload"] is not None else f"{'–':>9}"
+        print(
+            f"{name:<12}{result['bytes'] / 1e6:8.2f}{1 - result['bytes'] / results['stored']['bytes']:8.1%}{result['build']:9.3f}{result['cpu']:8.3f}{local}"
+            + "".join(f"{seconds:14.2f}" for seconds in result["links"].values())
+        )
+    print("\nfastest: " + ", ".join(f"{link} {min(results, key=lambda name: results[name]['links'][link])}" for link in links))
+    adaptive, stored = results["adaptive"], results["stored"]
+    # Deflating takes extra build time and saves transfer time, which grows the slower the link is
+    extra = adaptive["build"] - stored["build"]
+    if extra > 0:
+        print(f"adaptive pays off below {(stored['bytes'] - adaptive['bytes']) * 8 / extra / 1e6:.0f} Mbit/s")
+
+    if args.out:
+        record = {"time": time.time(), "args": {key: str(value) for key, value in vars(args).items()}, "results": results}
+        with open(args.out, "a", encoding="utf-8") as out:
+            out.write(json.dumps(record) + "\n")
+
+    failed = False
+    if adaptive["bytes"] > stored["bytes"]:
+        print("  the adaptive policy sends more bytes than storing")
+        failed = True
+    fastest = links[args.links.index(max(args.links))]
+    if results["default"]["links"][fastest] > stored["links"][fastest] * (1 + args.max_overhead):
+        print(f"  the default policy is more than {args.max_overhead:.0%} slower than storing at {fastest}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""End-to-end benchmarks of the client against the local mock server.
+
+Each phase runs in a fresh process with its own mock server, so that its peak RSS is
+measured on its own:
+
+- ``build``: stream a ZIP upload body for the generated case without sending it
+- ``upload``: send the case to a server answering with a small JSON verdict
+- ``parse``: receive a multipart response with result ZIPs and split it into artifacts
+- ``preview``: index the result ZIPs and prepare thumbnails of all their images
+- ``malformed``: receive a large malformed verdict and repair it
+- ``trickle``: receive a response that trickles in slowly, reporting the time to first byte
+
+    $ python benchmarks/bench_e2e.py --files 20 --file-size 2000000 --zips 2 --images 100
+    $ python benchmarks/bench_e2e.py --phases upload parse --out benchmarks/results.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fraudscanner import multipart  # noqa: E402
+from fraudscanner.artifacts import ArtifactProcessor  # noqa: E402
+from fraudscanner.client import FraudScannerClient, parse_artifacts  # noqa: E402
+from fraudscanner.encoder import ZipUploadBody  # noqa: E402
+from fraudscanner.mockserver import JSON, MULTIPART, MockConfig, MockServer  # noqa: E402
+
+PHASES = ("build", "upload", "parse", "preview", "malformed", "trickle")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def make_files(count: int, size: int) -> list[tuple[str, bytes]]:
+    # Random bytes stand in for photos, which do not compress either
+    return [(f"IMG_{i:04d}.jpg", os.urandom(size)) for i in range(count)]
+
+
+def _timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def run_build(args) -> dict:
+    files = make_files(args.files, args.file_size)
+    body = ZipUploadBody(files)
+    size, seconds = _timed(lambda: sum(len(chunk) for chunk in body))
+    return {"bytes": size, "seconds": seconds, "mb_per_s": size / seconds / 1e6}
+
+
+def run_upload(args) -> dict:
+    files = make_files(args.files, args.file_size)
+    with MockServer(MockConfig(mode=JSON), port=0) as server:
+        client = FraudScannerClient(server.url, "benchmark")
+        body = ZipUploadBody(files)
+
+        def upload():
+            with client.post(body, "BENCH-1") as response:
+                return response.content
+
+        _, seconds = _timed(upload)
+    return {"bytes": len(body), "seconds": seconds, "mb_per_s": len(body) / seconds / 1e6}
+
+
+def _response_server(args, **kwargs) -> MockServer:
+    config = MockConfig(mode=MULTIPART, zips=args.zips, images=args.images, image_size=args.image_size, noise=True, **kwargs)
+    return MockServer(config, port=0).warm_up()
+
+
+def run_parse(args) -> dict:
+    with _response_server(args) as server:
+        client = FraudScannerClient(server.url, "benchmark")
+
+        def receive():
+            with client.post([("a.jpg", b"jpeg")], "BENCH-1") as response:
+                artifacts = list(client.iter_artifacts(response))
+            size = sum(artifact.size for artifact in artifacts)
+            for artifact in artifacts:
+                artifact.close()
+            return size
+
+        size, seconds = _timed(receive)
+
+        # The same body parsed from memory, without the network
+        with client.post([("a.jpg", b"jpeg")], "BENCH-1") as response:
+            content_type, body = response.headers["Content-Type"], response.content
+    chunks = [body[i : i + multipart.CHUNK_SIZE] for i in range(0, len(body), multipart.CHUNK_SIZE)]
+    artifacts, parse_seconds = _timed(lambda: list(parse_artifacts(content_type, chunks)))
+    for artifact in artifacts:
+        artifact.close()
+    return {
+        "bytes": size,
+        "seconds": seconds,
+        "mb_per_s": size / seconds / 1e6,
+        "parse_seconds": parse_seconds,
+        "parse_mb_per_s": len(body) / parse_seconds / 1e6,
+    }
+
+
+def run_preview(args) -> dict:
+    with _response_server(args) as server:
+        client = FraudScannerClient(server.url, "benchmark")
+        with client.post([("a.jpg", b"jpeg")], "BENCH-1") as response:
+            zips = [artifact for artifact in client.iter_artifacts(response) if artifact.is_zip]
+
+    processor = ArtifactProcessor(max_workers=args.workers)
+
+    def preview():
+        count = 0
+        for artifact in zips:
+            with processor.index(artifact, page_size=args.images) as gallery:
+                count += sum(preview.thumbnail is not None for preview in processor.previews(gallery, gallery.page(1)))
+        return count
+
+    count, seconds = _timed(preview)
+    processor.shutdown()
+    return {"images": count, "seconds": seconds, "images_per_s": count / seconds, "workers": args.workers or os.cpu_count()}
+
+
+def run_malformed(args) -> dict:
+    with MockServer(MockConfig(mode=JSON, malformed_json=True), port=0) as server:
+        client = FraudScannerClient(server.url, "benchmark")
+        files = [(f"IMG_{i:05d}.jpg", b"jpeg") for i in range(args.verdict_images)]
+
+        def receive():
+            with client.post(files, "BENCH-1") as response:
+                (artifact,) = client.iter_artifacts(response)
+            with artifact:
+                return artifact.size, artifact.json()
+
+        (size, verdict), seconds = _timed(receive)
+    assert len(verdict["images"]) == args.verdict_images
+    return {"bytes": size, "seconds": seconds, "mb_per_s": size / seconds / 1e6}
+
+
+def run_trickle(args) -> dict:
+    with _response_server(args, trickle_chunk=args.trickle_chunk, trickle_interval=args.trickle_interval) as server:
+        client = FraudScannerClient(server.url, "benchmark")
+        started = time.perf_counter()
+        with client.post([("a.jpg", b"jpeg")], "BENCH-1") as response:
+            ttfb = time.perf_counter() - started
+            first_part = None
+            size = 0
+            for artifact in client.iter_artifacts(response):
+                first_part = first_part or time.perf_counter() - started
+                size += artifact.size
+                artifact.close()
+        seconds = time.perf_counter() - started
+    return {"bytes": size, "seconds": seconds, "ttfb": ttfb, "first_part": first_part, "mb_per_s": size / seconds / 1e6}
+
+
+def run_phase(phase: str, args) -> dict:
+    result = globals()[f"run_{phase}"](args)
+    return {"phase": phase, **result, "peak_rss_mb": peak_rss_mb()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=PHASES)
+    parser.add_argument("--files", type=int, default=20, help="Uploaded files per case")
+    parser.add_argument("--file-size", type=int, default=2_000_000, help="Bytes per uploaded file")
+    parser.add_argument("--zips", type=int, default=2, help="Result ZIPs in the multipart response")
+    parser.add_argument("--images", type=int, default=50, help="Images per result ZIP")
+    parser.add_argument("--image-size", type=int, default=1024, help="Side length of the result images")
+    parser.add_argument("--verdict-images", type=int, default=5000, help="Per-image entries in the malformed verdict")
+    parser.add_argument("--workers", type=int, default=None, help="Preview workers, defaults to the number of cores")
+    parser.add_argument("--trickle-chunk", type=int, default=64 * 1024)
+    parser.add_argument("--trickle-interval", type=float, default=0.01)
+    parser.add_argument("--out", type=Path, default=None, help="Append the results to this JSONL file")
+    args = parser.parse_args(argv)
+
+    # A fresh interpreter per phase, so that peak RSS is not inherited from earlier phases
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for phase in args.phases:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_phase, (phase, args))
+        results.append(result)
+        details = "  ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in result.items() if key != "phase")
+        print(f"{phase:<10} {details}")
+
+    if args.out:
+        record = {"time": time.time(), "args": {key: str(value) for key, value in vars(args).items()}, "results": results}
+        with open(args.out, "a", encoding="utf-8") as out:
+            out.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Micro-benchmark of lenient JSON loading on large, malformed FraudScanner verdicts.
+
+The bodies mimic verdicts with per-image details, formatted with newlines instead of
+commas and with trailing commas. The benchmark fails if the throughput drops below
+``--min-mb-per-s`` or if the time per byte grows with the body size (i.e. the repair
+is no longer linear).
+
+    $ python benchmarks/bench_jsonrepair.py --images 100 1000 10000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fraudscanner import jsonrepair  # noqa: E402
+
+
+def make_verdict(images: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    return {
+        "caseNumber": "BENCH-1",
+        "verdict": "suspicious",
+        "score": 0.87,
+        "report": "https://example.com/report.zip",
+        "images": [
+            {
+                "name": f"IMG_{i:05d}.jpg",
+                "sha256": f"{rng.getrandbits(256):064x}",
+                "score": round(rng.random(), 4),
+                "flags": {"edited": rng.random() < 0.1, "generated": rng.random() < 0.05, "duplicate": None},
+                "exif": {"Make": "Apple", "Model": "iPhone 13", "DateTimeOriginal": "2024:05:01 12:00:00"},
+                "regions": [[rng.randrange(4000), rng.randrange(3000), 64, 64] for _ in range(3)],
+                "comment": 'Kontrast "auffällig", Kanten: ok',
+            }
+            for i in range(images)
+        ],
+    }
+
+
+def make_malformed(data: dict) -> str:
+    """Pretty-print ``data``, then drop every line-ending comma and add trailing commas."""
+    lines = json.dumps(data, indent=2, ensure_ascii=False).split("\n")
+    return "\n".join(line[:-1] if line.endswith(",") else line + "," if line.endswith(("}", "]")) else line for line in lines)
+
+
+def measure(text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        jsonrepair.loads_lenient(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, nargs="+", default=[100, 1000, 10000], help="Images per verdict")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-mb-per-s", type=float, default=2.0)
+    # Allowed growth of the time per byte between the smallest and the largest body
+    parser.add_argument("--max-growth", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    per_byte = []
+    failed = False
+    for images in args.images:
+        data = make_verdict(images)
+        text = make_malformed(data)
+        assert jsonrepair.loads_lenient(text) == data, "repair changed the verdict"
+        seconds = measure(text, args.repeat)
+        size = len(text.encode("utf-8"))
+        mb_per_s = size / seconds / 1e6
+        per_byte.append(seconds / size)
+        print(f"{images:>7} images  {size / 1e6:8.2f} MB  {seconds * 1000:9.1f} ms  {mb_per_s:7.1f} MB/s")
+        if mb_per_s < args.min_mb_per_s:
+            print(f"  slower than {args.min_mb_per_s} MB/s")
+            failed = True
+
+    growth = per_byte[-1] / per_byte[0]
+    print(f"time per byte, largest vs smallest body: {growth:.2f}x")
+    if growth > args.max_growth:
+        print(f"  grows by more than {args.max_growth}x, the repair is no longer linear")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
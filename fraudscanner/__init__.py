@@ -0,0 +1 @@
+"""Client-side helpers for the VAARHAFT FraudScanner API."""
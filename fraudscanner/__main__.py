@@ -0,0 +1,5 @@
+import sys
+
+from fraudscanner.cli import main
+
+sys.exit(main())
@@ -0,0 +1,109 @@
+"""Parallel preparation of previews for the members of result ZIPs.
+
+All response shapes (ZIP parts of a multipart response, a whole-body ZIP and ZIPs
+referenced in the JSON verdict) are indexed once as a :class:`ZipGallery`, and the
+members of a page are decompressed and decoded concurrently on a pool sized to the
+available cores. Zlib and Pillow release the GIL while they work, so threads scale
+with the cores without copying member data to other processes.
+
+A :class:`ParsedResult` keeps what was parsed from one response (the JSON verdicts, the
+ZIP indexes and the previews by member name), so that showing the same result again
+does not read or decode the response body a second time.
+"""
+
+import os
+import zipfile
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from fraudscanner import thumbnails
+from fraudscanner.client import Artifact
+from fraudscanner.gallery import IMAGE, PDF, ZipGallery, member_kind
+
+
+@dataclass
+class Preview:
+    name: str
+    kind: str
+    thumbnail: bytes | None = None
+    # Number of pages of a PDF member
+    pages: int | None = None
+    error: Exception | None = None
+
+
+def make_preview(gallery: ZipGallery, info: zipfile.ZipInfo, size: tuple[int, int] = thumbnails.THUMBNAIL_SIZE) -> Preview:
+    preview = Preview(info.filename, member_kind(info.filename))
+    try:
+        if preview.kind == IMAGE:
+            preview.thumbnail = gallery.preview(info.filename, size)
+        elif preview.kind == PDF:
+            preview.pages = gallery.pdf_page_count(info.filename)
+    except Exception as e:
+        preview.error = e
+    return preview
+
+
+class ArtifactProcessor:
+    def __init__(self, executor: Executor | None = None, max_workers: int | None = None):
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1, thread_name_prefix="artifacts")
+
+    def index(self, artifact: Artifact, page_size: int | None = None) -> ZipGallery:
+        """Read the central directory of a ZIP artifact, raising ``zipfile.BadZipFile`` if it is none."""
+        artifact.file.seek(0)
+        return ZipGallery(artifact.file) if page_size is None else ZipGallery(artifact.file, page_size)
+
+    def previews(self, gallery: ZipGallery, members: list[zipfile.ZipInfo], size: tuple[int, int] = thumbnails.THUMBNAIL_SIZE) -> list[Preview]:
+        """Prepare the previews of ``members`` in parallel, in the order of ``members``."""
+        if len(members) <= 1:
+            return [make_preview(gallery, info, size) for info in members]
+        return list(self.executor.map(lambda info: make_preview(gallery, info, size), members))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ParsedResult:
+    """Memoized parsed form of the artifacts of one response, by artifact and member name."""
+
+    def __init__(self, processor: ArtifactProcessor):
+        self.processor = processor
+        self._json = {}
+        self._galleries = {}
+        self._previews = {}
+
+    def json(self, artifact: Artifact):
+        """Return ``artifact.json()``, raising its ``ValueError`` again on later calls."""
+        if artifact.name not in self._json:
+            try:
+                self._json[artifact.name] = artifact.json()
+            except ValueError as e:
+                self._json[artifact.name] = e
+        result = self._json[artifact.name]
+        if isinstance(result, ValueError):
+            raise result
+        return result
+
+    def gallery(self, artifact: Artifact) -> ZipGallery:
+        """Return the index of a ZIP artifact, which stays open until :meth:`close`."""
+        if artifact.name not in self._galleries:
+            try:
+                self._galleries[artifact.name] = self.processor.index(artifact)
+            except zipfile.BadZipFile as e:
+                self._galleries[artifact.name] = e
+        gallery = self._galleries[artifact.name]
+        if isinstance(gallery, zipfile.BadZipFile):
+            raise gallery
+        return gallery
+
+    def previews(self, artifact: Artifact, members: list[zipfile.ZipInfo], size: tuple[int, int] = thumbnails.THUMBNAIL_SIZE) -> list[Preview]:
+        """Return the previews of ``members`` of a ZIP artifact, preparing only those not seen before."""
+        missing = [info for info in members if (artifact.name, info.filename, size) not in self._previews]
+        for preview in self.processor.previews(self.gallery(artifact), missing, size):
+            self._previews[artifact.name, preview.name, size] = preview
+        return [self._previews[artifact.name, info.filename, size] for info in members]
+
+    def close(self):
+        for gallery in self._galleries.values():
+            if isinstance(gallery, ZipGallery):
+                gallery.close()
+        self._galleries.clear()
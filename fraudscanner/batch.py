@@ -0,0 +1,213 @@
+"""Headless batch submission of many cases to the FraudScanner API.
+
+A case is a folder of jpg/png/heic/webp/pdf files. Cases are taken either from the
+sub-folders of a directory (the folder name is the ``caseNumber``) or from a JSONL
+manifest with one ``{"caseNumber": ..., "path": ...}`` object per line, where ``path``
+is a folder or ``files`` lists the individual files.
+
+Usage::
+
+    python -m fraudscanner.batch cases/ --stage Local --out results/ --workers 4 --rate 60
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from fraudscanner.client import STAGES, SUPPORTED_EXTENSIONS, FraudScannerClient, Result
+from fraudscanner.preflight import PreflightChecker
+from fraudscanner.session import SessionConfig
+
+
+@dataclasses.dataclass
+class Case:
+    case_number: str
+    files: list[Path]
+
+
+class RateLimiter:
+    """Spaces out calls to :meth:`acquire` to at most ``per_minute`` per minute across threads."""
+
+    def __init__(self, per_minute: float | None):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def case_files(folder: Path) -> list[Path]:
+    return sorted(path for path in folder.iterdir() if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS)
+
+
+def load_cases(source: Path) -> Iterator[Case]:
+    """Yield the cases in a directory of case folders or a JSONL manifest."""
+    if source.is_dir():
+        for folder in sorted(path for path in source.iterdir() if path.is_dir()):
+            yield Case(folder.name, case_files(folder))
+        return
+
+    with open(source, encoding="utf-8") as manifest:
+        for line in manifest:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "files" in entry:
+                files = [source.parent / path for path in entry["files"]]
+            else:
+                files = case_files(source.parent / entry["path"])
+            yield Case(str(entry["caseNumber"]), files)
+
+
+def safe_name(name: str) -> str:
+    return re.sub(r"[^\w.\-]+", "_", name).strip("._") or "case"
+
+
+def unique_name(name: str, taken: set[str]) -> str:
+    """Return ``name``, or ``name_2``, ``name_3``, ... if it is taken already, and mark it as taken.
+
+    Names are compared case-insensitively, as on the file systems of macOS and Windows.
+    """
+    stem, suffix = os.path.splitext(name)
+    candidate, number = name, 1
+    while candidate.casefold() in taken:
+        number += 1
+        candidate = f"{stem}_{number}{suffix}"
+    taken.add(candidate.casefold())
+    return candidate
+
+
+def save_artifacts(result: Result, case_dir: Path) -> list[Path]:
+    """Write the artifacts of ``result`` to ``case_dir`` and return their paths."""
+    paths = []
+    taken = set()
+    for artifact in result.artifacts:
+        case_dir.mkdir(parents=True, exist_ok=True)
+        path = case_dir / unique_name(safe_name(artifact.name), taken)
+        artifact.file.seek(0)
+        with open(path, "wb") as target:
+            shutil.copyfileobj(artifact.file, target)
+        paths.append(path)
+    return paths
+
+
+def run_case(
+    client: FraudScannerClient, case: Case, out_dir: Path, rate_limiter: RateLimiter, case_dir: Path | None = None, checker: PreflightChecker | None = None
+) -> dict:
+    """Submit one case and save its artifacts to ``case_dir`` (by default named after the case), returning the result record.
+
+    With a ``checker``, a case with files that fail the pre-flight checks is not sent; the problems are recorded instead.
+    """
+    case_dir = case_dir or out_dir / safe_name(case.case_number)
+    record = {"caseNumber": case.case_number, "files": [path.name for path in case.files]}
+    started = time.perf_counter()
+    try:
+        if not case.files:
+            raise ValueError("Case contains no supported files")
+        files = [(path.name, path.read_bytes()) for path in case.files]
+        if checker is not None:
+            failed = [report for report in checker.check(files) if not report.ok]
+            if failed:
+                record["preflight"] = {report.name: report.problems for report in failed}
+                raise ValueError(f"{len(failed)} of {len(files)} files failed the checks, nothing was sent")
+        rate_limiter.acquire()
+        started = time.perf_counter()
+        with client.submit(files, case.case_number) as result:
+            saved = [str(path.relative_to(out_dir)) for path in save_artifacts(result, case_dir)]
+        record.update(status="ok", json=result.json, artifacts=saved)
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+        if getattr(e, "status_code", None):
+            record["statusCode"] = e.status_code
+    record["elapsed"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(
+    client: FraudScannerClient,
+    cases: Iterator[Case],
+    out_dir: Path,
+    workers: int = 4,
+    rate_per_minute: float | None = None,
+    checker: PreflightChecker | None = None,
+) -> Iterator[dict]:
+    """Submit ``cases`` through a bounded worker pool, yielding result records as they complete.
+
+    Cases are checked with ``checker`` first, if given; see :func:`run_case`.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rate_limiter = RateLimiter(rate_per_minute)
+    # Case numbers that differ only in characters replaced by safe_name() get their own folders
+    taken = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for case in cases:
+            case_dir = out_dir / unique_name(safe_name(case.case_number), taken)
+            futures.append(executor.submit(run_case, client, case, out_dir, rate_limiter, case_dir, checker))
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Submit many cases to the VAARHAFT FraudScanner API.")
+    parser.add_argument("source", type=Path, help="Directory of case folders or a JSONL manifest")
+    parser.add_argument("--out", type=Path, default=Path("results"), help="Output directory for results.jsonl and ZIPs")
+    parser.add_argument("--stage", choices=STAGES, default="Production")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="Defaults to the API_KEY environment variable")
+    parser.add_argument("--workers", type=int, default=4, help="Number of cases submitted concurrently")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum number of submissions per minute")
+    parser.add_argument("--no-preflight", action="store_true", help="Send cases even if their files fail the pre-flight checks")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or API_KEY)")
+
+    config = SessionConfig.from_env()
+    # Every worker needs its own pooled connection to keep them all busy
+    config = dataclasses.replace(config, pool_maxsize=max(config.pool_maxsize, args.workers))
+    client = FraudScannerClient.for_stage(args.stage, args.api_key, config=config)
+
+    checker = None if args.no_preflight else PreflightChecker()
+
+    started = time.perf_counter()
+    count = failed = 0
+    args.out.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(args.out / "results.jsonl", "a", encoding="utf-8") as results:
+            for record in run_batch(client, load_cases(args.source), args.out, args.workers, args.rate, checker):
+                results.write(json.dumps(record, ensure_ascii=False) + "\n")
+                results.flush()
+                count += 1
+                failed += record["status"] != "ok"
+                print(f"[{count}] {record['caseNumber']}: {record['status']} ({record['elapsed']:.1f}s)", file=sys.stderr)
+                for name, problems in record.get("preflight", {}).items():
+                    print(f"    {name}: {'; '.join(problems)}", file=sys.stderr)
+    finally:
+        if checker is not None:
+            checker.shutdown()
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed * 60 if elapsed else 0.0
+    print(f"{count} cases ({failed} failed) in {elapsed:.1f}s, {rate:.1f} cases/min", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Small in-process caches shared by all Streamlit sessions of a server process."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+
+
+def content_hash(data) -> str:
+    """Return a hex digest of a bytes-like object, used as a cache key for file contents."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by the number of entries and, optionally, their total size.
+
+    With ``max_bytes`` the size of each value is taken with ``sizeof`` (``len`` by default, for bytes values).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int | None = None, sizeof: Callable[[object], int] = len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self.size -= self._sizes.pop(key, 0)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.max_bytes is not None:
+                self._sizes[key] = self.sizeof(value)
+                self.size += self._sizes[key]
+            self._evict()
+
+    def resize(self, max_entries: int, max_bytes: int | None = None):
+        """Change the bounds, evicting the least recently used entries that no longer fit."""
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._sizes = {key: self.sizeof(value) for key, value in self._data.items()} if max_bytes is not None else {}
+            self.size = sum(self._sizes.values())
+            self._evict()
+
+    def _evict(self):
+        # The newest entry is kept even if it alone exceeds max_bytes
+        while len(self._data) > self.max_entries or (self.max_bytes is not None and self.size > self.max_bytes and len(self._data) > 1):
+            key, _ = self._data.popitem(last=False)
+            self.size -= self._sizes.pop(key, 0)
+
+    def get_or_compute(self, key, compute: Callable[[], object]):
+        """Return the cached value for ``key``, computing and storing it on a miss.
+
+        ``compute`` runs outside the lock, so a slow computation does not block other threads.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._data)
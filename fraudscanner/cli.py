@@ -0,0 +1,117 @@
+"""Submit a single case from the command line, e.g. once per case from a shell pipeline.
+
+Only the client and its HTTP stack are imported at start-up; Pillow and PyPDF2 are loaded
+when files are checked before the upload or previews are asked for, and Streamlit is
+never imported. Broken files are reported before anything is sent. The JSON verdict is
+written to stdout, everything else to stderr::
+
+    python -m fraudscanner.cli photos/*.jpg --case-number "Case 1A-421" --stage Dev --out results/
+    find cases/1A-421 -name "*.pdf" | python -m fraudscanner.cli - --case-number 1A-421 --pages | jq .score
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+from fraudscanner import pdfinfo
+from fraudscanner.batch import case_files, safe_name, save_artifacts
+from fraudscanner.client import STAGES, SUPPORTED_EXTENSIONS, FraudScannerClient, FraudScannerError, Result
+from fraudscanner.gallery import IMAGE, ZipGallery
+from fraudscanner.preflight import PreflightChecker
+
+
+def collect_files(paths: list[str]) -> list[Path]:
+    """Expand folders to their supported files; ``-`` reads further paths from stdin, one per line."""
+    files = []
+    for path in paths:
+        if path == "-":
+            files += collect_files([line.strip() for line in sys.stdin if line.strip()])
+        elif Path(path).is_dir():
+            files += case_files(Path(path))
+        else:
+            files.append(Path(path))
+    return files
+
+
+def print_page_counts(files: list[Path]):
+    for path in files:
+        if path.suffix.lower() == ".pdf":
+            try:
+                print(f"{path.name}: {pdfinfo.page_count(path.read_bytes())} pages", file=sys.stderr)
+            except pdfinfo.PdfInfoError as e:
+                print(f"{path.name}: {e}", file=sys.stderr)
+
+
+def save_previews(result: Result, preview_dir: Path) -> int:
+    """Write thumbnails of the images in the result ZIPs to ``preview_dir`` and return their number."""
+    count = 0
+    for artifact in result.artifacts:
+        if not artifact.is_zip:
+            continue
+        with ZipGallery(artifact.file) as gallery:
+            for info in gallery.by_kind[IMAGE]:
+                preview_dir.mkdir(parents=True, exist_ok=True)
+                (preview_dir / safe_name(f"{Path(artifact.name).stem}_{info.filename}")).write_bytes(gallery.preview(info.filename))
+                count += 1
+    return count
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Submit one case to the VAARHAFT FraudScanner API and print the JSON verdict.")
+    parser.add_argument("files", nargs="+", help="Files or folders of the case, or - to read paths from stdin")
+    parser.add_argument("--case-number", required=True)
+    parser.add_argument("--stage", choices=STAGES, default="Production")
+    parser.add_argument("--api-url", default=None, help="Send to this URL instead of the stage's, e.g. a mock server")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="Defaults to the API_KEY environment variable")
+    parser.add_argument("--out", type=Path, default=None, help="Save the returned ZIPs to this directory")
+    parser.add_argument("--previews", type=Path, default=None, help="Save thumbnails of the returned images to this directory")
+    parser.add_argument("--pages", action="store_true", help="Print the page counts of the submitted PDFs")
+    parser.add_argument("--no-referenced", action="store_true", help="Do not download ZIPs referenced in the verdict")
+    parser.add_argument("--no-preflight", action="store_true", help="Send the files without checking them first")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or API_KEY)")
+    files = collect_files(args.files)
+    unsupported = [path.name for path in files if path.suffix.lower() not in SUPPORTED_EXTENSIONS]
+    if not files:
+        parser.error("no files given")
+    if unsupported:
+        parser.error(f"unsupported files: {', '.join(unsupported)}")
+    if args.pages:
+        print_page_counts(files)
+    contents = [(path.name, path.read_bytes()) for path in files]
+    if not args.no_preflight:
+        checker = PreflightChecker()
+        failed = [report for report in checker.check(contents) if not report.ok]
+        checker.shutdown()
+        for report in failed:
+            print(f"{report.name}: {'; '.join(report.problems)}", file=sys.stderr)
+        if failed:
+            print(f"{args.case_number}: {len(failed)} of {len(files)} files failed the checks, nothing was sent", file=sys.stderr)
+            return 1
+
+    client = FraudScannerClient(args.api_url or STAGES[args.stage], args.api_key)
+    started = time.perf_counter()
+    try:
+        with client.submit(contents, args.case_number, not args.no_referenced) as result:
+            if args.out:
+                for path in save_artifacts(result, args.out / safe_name(args.case_number)):
+                    print(f"Saved {path}", file=sys.stderr)
+            if args.previews:
+                print(f"Saved {save_previews(result, args.previews)} previews to {args.previews}", file=sys.stderr)
+            print(json.dumps(result.json, ensure_ascii=False))
+    except (FraudScannerError, requests.RequestException, OSError) as e:
+        print(f"{args.case_number}: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.case_number}: done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
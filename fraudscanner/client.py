@@ -0,0 +1,451 @@
+"""Submit cases to the VAARHAFT FraudScanner API and parse its responses.
+
+This module has no Streamlit dependency, so it can be used from scripts and batch jobs
+as well as from ``streamlit_app.py``.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from typing import BinaryIO
+
+import requests
+
+from fraudscanner import jsonrepair, multipart
+from fraudscanner.deadline import DOWNLOAD, RESPONSE, UPLOAD, Deadline
+from fraudscanner.encoder import CompressionPolicy, ZipUploadBody
+from fraudscanner.session import SessionConfig, abort_connection, create_session, mount_submit_adapter, track_connections
+
+STAGES = {
+    "Production": "https://api.vaarhaft.com/v2/fraudscanner",
+    "Dev": "https://0nx6soggmd.execute-api.eu-central-1.amazonaws.com/dev/v2/fraudscanner",
+    "Local": "http://127.0.0.1:9999/fraudScanner_v2",
+}
+
+SUPPORTED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".heic", ".webp", ".pdf")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".heic")
+
+ZIP_SIGNATURE = b"PK\x03\x04"
+
+# Referenced ZIPs of one case that are downloaded at the same time
+DOWNLOAD_WORKERS = 4
+# Seconds between checks for cancellation, the deadline and hedging while a POST is in flight
+POLL_INTERVAL = 0.1
+
+
+class FraudScannerError(Exception):
+    """Base class for errors raised by the FraudScanner client."""
+
+
+class ApiError(FraudScannerError):
+    """Raised when the API answers with a non-200 status code."""
+
+    def __init__(self, status_code: int, text: str, retry_after: float | None = None):
+        super().__init__(f"Request failed with status code {status_code}")
+        self.status_code = status_code
+        self.text = text
+        # Seconds from the Retry-After header of a 429 or 503 response
+        self.retry_after = retry_after
+
+
+def _retry_after(response: requests.Response) -> float | None:
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+@dataclass
+class Artifact:
+    """A complete part of a response, spooled to memory or disk."""
+
+    name: str
+    content_type: str
+    file: BinaryIO
+
+    @property
+    def size(self) -> int:
+        file = self._raw_file()
+        if hasattr(file, "getbuffer"):
+            with file.getbuffer() as view:
+                return view.nbytes
+        file.flush()
+        return os.fstat(file.fileno()).st_size
+
+    @property
+    def is_json(self) -> bool:
+        content_type = self.content_type.lower()
+        return "application/json" in content_type or "text/json" in content_type
+
+    @property
+    def is_zip(self) -> bool:
+        return ZIP_SIGNATURE in self._pread(10)
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def read_all(self) -> bytes:
+        """Read the whole artifact without moving the file position.
+
+        Unlike :meth:`read`, this is safe while other threads read the file, e.g. for a
+        download that is prepared on demand while the ZIP is being previewed.
+        """
+        return self._pread()
+
+    def _raw_file(self):
+        # A SpooledTemporaryFile keeps its in-memory or on-disk file in _file
+        return getattr(self.file, "_file", self.file)
+
+    def _pread(self, size: int | None = None) -> bytes:
+        """Read ``size`` bytes (or all) from the start of the file, without using or moving its position."""
+        file = self._raw_file()
+        if hasattr(file, "getbuffer"):
+            with file.getbuffer() as view:
+                return bytes(view[:size])
+        file.flush()
+        descriptor = file.fileno()
+        return os.pread(descriptor, os.fstat(descriptor).st_size if size is None else size, 0)
+
+    def json(self):
+        """Parse the artifact as (possibly malformed) JSON, raising ``ValueError`` on failure."""
+        return jsonrepair.loads_lenient(self.read().decode("utf-8", errors="ignore"))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@dataclass
+class Result:
+    """Parsed response to a submission."""
+
+    case_number: str
+    json: dict | None = None
+    artifacts: list[Artifact] = field(default_factory=list)
+
+    def close(self):
+        for artifact in self.artifacts:
+            artifact.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def referenced_archives(json_data) -> list[tuple[str, str]]:
+    """Return ``(key, url)`` pairs for ZIP files referenced by top-level JSON string values."""
+    if not isinstance(json_data, dict):
+        return []
+    return [(key, value) for key, value in json_data.items() if isinstance(value, str) and value.endswith(".zip")]
+
+
+def parse_verdict(artifact: Artifact, load: Callable[[Artifact], object] = Artifact.json):
+    """Return the JSON verdict held by ``artifact``, or ``None`` if it holds none.
+
+    The verdict is a JSON part, or any other part that is not a ZIP and contains a JSON
+    object or array, since some servers label it as text or send no usable boundary at all.
+    The lenient reader skips the text around it, e.g. the part headers of such a body.
+    ``load`` parses the artifact, e.g. a memoizing wrapper of :meth:`Artifact.json`.
+    """
+    if not artifact.is_json and artifact.is_zip:
+        return None
+    try:
+        verdict = load(artifact)
+    except ValueError:
+        return None
+    return verdict if artifact.is_json or isinstance(verdict, (dict, list)) else None
+
+
+def parse_artifacts(content_type: str, chunks: Iterable[bytes]) -> Iterator[Artifact]:
+    """Yield the artifacts of a response body read incrementally from ``chunks``.
+
+    Multipart responses yield one artifact per part. Any other response, including
+    multipart responses without a boundary, yields the whole body as one artifact.
+    """
+    boundary = multipart.get_boundary(content_type) if multipart.is_multipart(content_type) else None
+
+    if not boundary:
+        name = "FraudScanner.zip" if multipart.is_multipart(content_type) else "response.json"
+        yield Artifact(name, content_type, multipart.spool(chunks))
+        return
+
+    for part in multipart.iter_parts(chunks, boundary):
+        suffix = "json" if part.is_json else "zip"
+        name = part.filename or f"FraudScanner_part{part.index}.{suffix}"
+        yield Artifact(name, part.content_type, multipart.spool(part.iter_chunks()))
+
+
+class _Attempt:
+    """The connections of one request, which :meth:`abort` shuts down until the request is :meth:`done`."""
+
+    def __init__(self):
+        self._connections = []
+        self._aborted = False
+        self._done = False
+        self._lock = threading.Lock()
+
+    def add(self, connection):
+        with self._lock:
+            self._connections.append(connection)
+            aborted = self._aborted
+        if aborted:
+            abort_connection(connection)
+
+    def abort(self):
+        with self._lock:
+            if self._done:
+                return
+            self._aborted = True
+            connections = list(self._connections)
+        for connection in connections:
+            abort_connection(connection)
+
+    def done(self):
+        # The connections go back to the pool and are reused by other requests
+        with self._lock:
+            self._done = True
+            self._connections = []
+
+
+class FraudScannerClient:
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        http_session: requests.Session | None = None,
+        config: SessionConfig | None = None,
+        compression: CompressionPolicy | None = None,
+    ):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.http_session = http_session or create_session(config)
+        if isinstance(self.http_session, requests.Session):
+            # The POST is retried by post_with_deadline() alone
+            mount_submit_adapter(self.http_session, api_url)
+        self.compression = compression or CompressionPolicy.from_env()
+
+    @classmethod
+    def for_stage(cls, stage: str, api_key: str, **kwargs) -> "FraudScannerClient":
+        return cls(STAGES[stage], api_key, **kwargs)
+
+    def headers(self, case_number: str) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "x-api-key": self.api_key, "caseNumber": case_number}
+
+    def upload_body(self, files: Iterable[tuple[str, object]]) -> ZipUploadBody:
+        """Build the upload of ``(name, buffer)`` pairs, deflating members by the client's compression policy."""
+        return ZipUploadBody(files, compression=self.compression)
+
+    def post(
+        self, files: Iterable[tuple[str, object]] | ZipUploadBody, case_number: str, extra_headers: dict | None = None, timeout: tuple | None = None
+    ) -> requests.Response:
+        """Upload ``(name, buffer)`` pairs as one ZIP and return the still unread, streamed response.
+
+        A prepared :class:`ZipUploadBody` can be passed instead, e.g. to observe upload progress.
+        """
+        body = files if isinstance(files, ZipUploadBody) else self.upload_body(files)
+        headers = {**self.headers(case_number), **(extra_headers or {}), "Content-Type": body.content_type}
+        response = self.http_session.post(self.api_url, data=body, headers=headers, stream=True, timeout=timeout)
+        if response.status_code != 200:
+            with response:
+                raise ApiError(response.status_code, response.text, _retry_after(response))
+        return response
+
+    def post_with_deadline(
+        self,
+        files: Iterable[tuple[str, object]] | ZipUploadBody,
+        case_number: str,
+        deadline: Deadline,
+        extra_headers: dict | None = None,
+        on_attempt: Callable[[ZipUploadBody], None] | None = None,
+    ) -> tuple[requests.Response, ZipUploadBody]:
+        """Like :meth:`post`, but bounded by ``deadline``, and return the response with the body that was answered.
+
+        Connection errors, timeouts and retryable status codes are retried with jittered backoff. With
+        ``hedge_after`` set, an attempt without a response after that long is raced by a second one, and
+        whichever is answered first wins. Sending a case again is safe, the API identifies it by its case
+        number. ``on_attempt`` is called with the upload body of every attempt, e.g. to show its progress.
+        """
+        policy = deadline.policy
+        body = files if isinstance(files, ZipUploadBody) else self.upload_body(files)
+        for attempt in itertools.count():
+            try:
+                return self._post_hedged(body, case_number, deadline, extra_headers, on_attempt)
+            except (ApiError, requests.ConnectionError, requests.Timeout) as e:
+                if isinstance(e, ApiError) and e.status_code not in policy.retry_statuses or attempt >= policy.retries:
+                    raise
+                delay = policy.retry_delay(attempt, getattr(e, "retry_after", None))
+                remaining = deadline.remaining()
+                if remaining is not None and delay >= remaining:
+                    raise
+                deadline.sleep(delay)
+
+    def _post_hedged(self, body, case_number, deadline, extra_headers, on_attempt) -> tuple[requests.Response, ZipUploadBody]:
+        adapter_timeout = getattr(self.http_session.get_adapter(self.api_url), "timeout", None)
+        connect_timeout = adapter_timeout[0] if adapter_timeout else None
+        lock = threading.Lock()
+        # Set once an attempt has won or the submission was given up, so the other attempts stop
+        finished = threading.Event()
+
+        def check(started):
+            deadline.check(UPLOAD, started)
+            if finished.is_set():
+                raise FraudScannerError("Attempt was superseded")
+
+        def send(body, attempt):
+            deadline.check()
+            started = time.monotonic()
+            body.check = lambda: check(started)
+            if on_attempt:
+                on_attempt(body)
+            read_timeout = deadline.remaining(RESPONSE, started)
+            if read_timeout is None and adapter_timeout:
+                read_timeout = adapter_timeout[1]
+            deadline.on_cancel(attempt.abort)
+            try:
+                with track_connections(attempt.add):
+                    response = self.post(body, case_number, extra_headers, timeout=(connect_timeout, read_timeout))
+            except requests.ReadTimeout:
+                deadline.check(RESPONSE, started)
+                raise
+            except requests.ConnectionError:
+                # An attempt that was aborted or ran out of time fails with a closed connection
+                deadline.check(UPLOAD if body.finished_at is None else RESPONSE, started)
+                if finished.is_set():
+                    raise FraudScannerError("Attempt was superseded")
+                raise
+            finally:
+                # From here on the response owns the connection, and is closed instead
+                attempt.done()
+            with lock:
+                if finished.is_set():
+                    response.close()
+                    raise FraudScannerError("Attempt was superseded")
+                finished.set()
+            return response, body
+
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="post")
+        started = time.monotonic()
+        attempts = [_Attempt()]
+        futures = {executor.submit(send, body, attempts[0])}
+        hedged = not deadline.policy.hedge_after
+        try:
+            while True:
+                done, _ = wait(futures, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    futures.discard(future)
+                    if future.exception() is None:
+                        return future.result()
+                    # A failed attempt only counts once no other attempt can still succeed
+                    if not futures:
+                        raise future.exception()
+                deadline.check()
+                if not hedged and time.monotonic() - started >= deadline.policy.hedge_after:
+                    attempts.append(_Attempt())
+                    futures.add(executor.submit(send, body.copy(), attempts[-1]))
+                    hedged = True
+        finally:
+            with lock:
+                finished.set()
+            # Attempts still waiting for their response are aborted, the others stop at their next chunk
+            for attempt in attempts:
+                attempt.abort()
+            executor.shutdown(wait=False)
+
+    def iter_artifacts(self, response: requests.Response) -> Iterator[Artifact]:
+        """Yield each part of a streamed ``response`` as soon as it has been received completely."""
+        return parse_artifacts(response.headers.get("Content-Type", ""), response.iter_content(chunk_size=multipart.CHUNK_SIZE))
+
+    def download(self, url: str, name: str, case_number: str, deadline: Deadline | None = None) -> Artifact:
+        """Download a ZIP referenced in a JSON verdict, within the download phase of ``deadline`` if given."""
+        if deadline is None:
+            return self._download(url, name, case_number)
+        deadline.check()
+        attempt = _Attempt()
+        deadline.on_cancel(attempt.abort)
+        try:
+            with track_connections(attempt.add):
+                return self._download(url, name, case_number, deadline)
+        except requests.RequestException:
+            # An aborted download fails with a closed connection
+            deadline.check()
+            raise
+        finally:
+            attempt.done()
+
+    def _download(self, url: str, name: str, case_number: str, deadline: Deadline | None = None) -> Artifact:
+        with self.http_session.get(url, headers=self.headers(case_number), stream=True) as response:
+            if response.status_code != 200:
+                raise ApiError(response.status_code, response.text, _retry_after(response))
+            chunks = response.iter_content(multipart.CHUNK_SIZE)
+            if deadline is not None:
+                chunks = deadline.guard(chunks, DOWNLOAD)
+            return Artifact(name, response.headers.get("Content-Type", ""), multipart.spool(chunks))
+
+    def download_all(
+        self, archives: Iterable[tuple[str, str]], case_number: str, max_workers: int = DOWNLOAD_WORKERS, deadline: Deadline | None = None
+    ) -> Iterator[tuple[str, Artifact | Exception]]:
+        """Download ``(key, url)`` pairs concurrently and yield ``(key, artifact)`` in the order they finish.
+
+        A failed download yields its exception instead of an artifact. Each download is spooled to memory
+        and spills to disk above :data:`multipart.SPOOL_MAX_SIZE`. Cancelling ``deadline`` aborts them all.
+        """
+        archives = list(archives)
+        if not archives:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(archives)), thread_name_prefix="download")
+        try:
+            futures = {executor.submit(self.download, url, f"{key}.zip", case_number, deadline): key for key, url in archives}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    yield futures[future], e
+        finally:
+            # A consumer that stops early (e.g. on cancellation) does not wait for the remaining downloads
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, files: Iterable[tuple[str, object]], case_number: str, download_referenced: bool = True, deadline: Deadline | None = None) -> Result:
+        """Submit a case and collect the JSON verdict and all returned artifacts.
+
+        The submission is bounded by ``deadline``, by default one with the policy from the environment.
+        """
+        deadline = deadline or Deadline()
+        result = Result(case_number)
+        try:
+            response, _ = self.post_with_deadline(files, case_number, deadline)
+            with response:
+                deadline.on_cancel(response.close)
+                chunks = deadline.guard(response.iter_content(chunk_size=multipart.CHUNK_SIZE), DOWNLOAD)
+                for artifact in parse_artifacts(response.headers.get("Content-Type", ""), chunks):
+                    if result.json is None:
+                        result.json = parse_verdict(artifact)
+                        if result.json is not None:
+                            artifact.close()
+                            continue
+                    result.artifacts.append(artifact)
+
+            if download_referenced:
+                errors = []
+                for key, artifact in self.download_all(referenced_archives(result.json), case_number, deadline=deadline):
+                    if isinstance(artifact, Exception):
+                        errors.append(artifact)
+                    else:
+                        result.artifacts.append(artifact)
+                if errors:
+                    raise errors[0]
+        except BaseException:
+            result.close()
+            raise
+        return result
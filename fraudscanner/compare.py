@@ -0,0 +1,197 @@
+"""Send the same case to several stages at once and compare their latency and verdicts.
+
+In each round the case is submitted to all stages concurrently, so that every stage sees
+the same client, network and time of day. Rounds run one after another, and with a repeat
+count the per-phase percentiles of each stage are compared side by side. The verdict of
+each stage is diffed against the first stage's, e.g. to check a Dev deployment against
+Production before it is promoted::
+
+    python -m fraudscanner.compare photos/ --case-number BENCH-1 --stages Production Dev --repeat 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Iterable
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+from fraudscanner.cli import collect_files
+from fraudscanner.client import STAGES, FraudScannerClient
+from fraudscanner.jobs import DONE, SubmissionJob
+from fraudscanner.metrics import PHASES, SubmissionMetrics, percentile, phase_seconds
+
+# Phases compared between stages; rendering is not part of a headless submission
+COMPARED_PHASES = tuple(phase for phase in PHASES if phase != "render")
+
+
+@dataclass
+class StageRun:
+    stage: str
+    round: int
+    metrics: SubmissionMetrics
+    json: dict | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def diff_verdicts(expected, actual, path: str = "") -> list[tuple[str, object, object]]:
+    """Return ``(path, expected, actual)`` for every value that differs between two verdicts."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        differences = []
+        for key in [*expected, *(key for key in actual if key not in expected)]:
+            differences += diff_verdicts(expected.get(key), actual.get(key), f"{path}.{key}" if path else str(key))
+        return differences
+    if isinstance(expected, list) and isinstance(actual, list):
+        differences = []
+        for index in range(max(len(expected), len(actual))):
+            item_path = f"{path}[{index}]"
+            if index >= len(expected):
+                differences.append((item_path, None, actual[index]))
+            elif index >= len(actual):
+                differences.append((item_path, expected[index], None))
+            else:
+                differences += diff_verdicts(expected[index], actual[index], item_path)
+        return differences
+    return [] if expected == actual else [(path, expected, actual)]
+
+
+class Comparison:
+    """Submits one case ``repeat`` times to each of several stages; the stages of a round run concurrently."""
+
+    def __init__(self, clients: dict[str, FraudScannerClient], files: Iterable[tuple[str, object]], case_number: str, repeat: int = 1):
+        self.id = uuid.uuid4().hex[:8]
+        self.clients = clients
+        self.stages = list(clients)
+        self.files = list(files)
+        self.case_number = case_number
+        self.repeat = repeat
+        self.runs: list[StageRun] = []
+        self.error: Exception | None = None
+        self.done = False
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return self.repeat * len(self.stages)
+
+    def start(self, executor: Executor) -> "Comparison":
+        executor.submit(self.run)
+        return self
+
+    def run(self) -> "Comparison":
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.stages), thread_name_prefix="compare") as executor:
+                for index in range(self.repeat):
+                    wait([executor.submit(self._run_stage, stage, index) for stage in self.stages])
+        except Exception as e:
+            self.error = e
+        finally:
+            self.files = []
+            self.done = True
+        return self
+
+    def _run_stage(self, stage: str, index: int):
+        # Without a result cache, so that every round reaches the API
+        job = SubmissionJob(self.clients[stage], self.files, self.case_number, stage)
+        job.run()
+        run = StageRun(stage, index, job.metrics, job.json, None if job.status == DONE else f"{type(job.error).__name__}: {job.error}")
+        job.close()
+        with self._lock:
+            self.runs.append(run)
+
+    def summary(self) -> dict[str, dict[str, dict[str, float]]]:
+        """Return p50 and p95 of each phase, and the median upload and response sizes, per stage."""
+        summary = {}
+        for stage in self.stages:
+            runs = [run for run in self.runs if run.stage == stage and run.ok]
+            stage_summary = {"runs": {"count": len(runs), "failed": sum(run.stage == stage and not run.ok for run in self.runs)}}
+            for phase in COMPARED_PHASES:
+                values = sorted(seconds for run in runs if (seconds := phase_seconds(vars(run.metrics), phase)) is not None)
+                if values:
+                    stage_summary[phase] = {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for name in ("upload_bytes", "download_bytes", "referenced_bytes"):
+                values = sorted(getattr(run.metrics, name) for run in runs)
+                if values:
+                    stage_summary[name] = {"p50": percentile(values, 50)}
+            summary[stage] = stage_summary
+        return summary
+
+    def verdict_differences(self) -> dict[str, list[tuple[str, object, object]]]:
+        """Diff the first verdict of every stage against the first stage's."""
+        verdicts = {}
+        for run in sorted(self.runs, key=lambda run: run.round):
+            if run.ok and run.json is not None:
+                verdicts.setdefault(run.stage, run.json)
+        reference = self.stages[0]
+        if reference not in verdicts:
+            return {}
+        return {stage: diff_verdicts(verdicts[reference], verdicts[stage]) for stage in self.stages[1:] if stage in verdicts}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Send one case to several FraudScanner stages and compare latency and verdicts.")
+    parser.add_argument("files", nargs="+", help="Files or folders of the case, or - to read paths from stdin")
+    parser.add_argument("--case-number", required=True)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=["Production", "Dev"], help="The first stage is the reference")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per stage")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="Defaults to the API_KEY environment variable")
+    parser.add_argument("--url", action="append", default=[], metavar="STAGE=URL", help="Send a stage to another URL, e.g. Local=http://127.0.0.1:8000/fraudScanner_v2")
+    parser.add_argument("--max-ratio", type=float, default=None, help="Fail if the p50 total of a stage exceeds the reference's by this factor")
+    parser.add_argument("--out", type=Path, default=None, help="Append the summary and differences to this JSONL file")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or API_KEY)")
+    if len(set(args.stages)) < 2:
+        parser.error("at least two different stages are required")
+    urls = {**STAGES, **dict(url.split("=", 1) for url in args.url)}
+    clients = {stage: FraudScannerClient(urls[stage], args.api_key) for stage in dict.fromkeys(args.stages)}
+
+    comparison = Comparison(clients, [(path.name, path.read_bytes()) for path in collect_files(args.files)], args.case_number, args.repeat).run()
+    summary = comparison.summary()
+    differences = comparison.verdict_differences()
+
+    print(f"{'Phase':<16}" + "".join(f"{stage:>24}" for stage in comparison.stages))
+    for phase in COMPARED_PHASES:
+        cells = [summary[stage].get(phase) for stage in comparison.stages]
+        if any(cells):
+            print(f"{phase:<16}" + "".join(f"{cell['p50']:>10.3f}s /{cell['p95']:>9.3f}s" if cell else f"{'–':>24}" for cell in cells))
+    for name in ("upload_bytes", "download_bytes", "referenced_bytes"):
+        cells = [summary[stage].get(name) for stage in comparison.stages]
+        print(f"{name:<16}" + "".join(f"{cell['p50']:>24}" if cell else f"{'–':>24}" for cell in cells))
+    print(f"{'runs (failed)':<16}" + "".join(f"{summary[stage]['runs']['count']:>19} ({summary[stage]['runs']['failed']})" for stage in comparison.stages))
+    for run in comparison.runs:
+        if not run.ok:
+            print(f"{run.stage} round {run.round + 1}: {run.error}", file=sys.stderr)
+    for stage, stage_differences in differences.items():
+        print(f"\nVerdict {stage} vs {comparison.stages[0]}: {len(stage_differences) or 'no'} differences")
+        for path, expected, actual in stage_differences:
+            print(f"  {path}: {json.dumps(expected)} -> {json.dumps(actual)}")
+
+    if args.out:
+        record = {"time": time.time(), "caseNumber": args.case_number, "stages": comparison.stages, "summary": summary, "differences": differences}
+        with open(args.out, "a", encoding="utf-8") as out:
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    failed = any(not run.ok for run in comparison.runs)
+    reference = summary[comparison.stages[0]].get("total")
+    if args.max_ratio and reference:
+        for stage in comparison.stages[1:]:
+            total = summary[stage].get("total")
+            if total and total["p50"] > reference["p50"] * args.max_ratio:
+                print(f"{stage} is {total['p50'] / reference['p50']:.2f}x slower than {comparison.stages[0]} (p50 total)", file=sys.stderr)
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
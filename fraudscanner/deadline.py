@@ -0,0 +1,140 @@
+"""Time budgets and cancellation of submissions.
+
+A :class:`DeadlinePolicy` bounds a submission as a whole and each of its phases (upload,
+waiting for the response, download), and sets how often retryable failures are retried
+and whether a slow submission is hedged with a second one. A :class:`Deadline` tracks one
+submission against its policy. It is shared by the threads working on the submission, and
+cancelling it aborts the transfer: the upload and download stop at their next chunk, and
+responses and connections registered with :meth:`Deadline.on_cancel` are closed right away.
+"""
+
+import os
+import random
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+
+UPLOAD = "upload"
+RESPONSE = "response"
+DOWNLOAD = "download"
+
+
+class SubmissionCancelled(Exception):
+    """Raised in the threads of a submission after it was cancelled."""
+
+    def __init__(self):
+        super().__init__("Submission was cancelled")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a submission or one of its phases takes longer than its policy allows.
+
+    Not an ``OSError`` (like ``TimeoutError``), so urllib3 does not wrap it in a retryable connection error
+    when it is raised from the upload body.
+    """
+
+    def __init__(self, phase: str, seconds: float):
+        super().__init__(f"The {phase} took longer than {seconds:g} s")
+        self.phase = phase
+
+
+@dataclass(frozen=True)
+class DeadlinePolicy:
+    # Seconds for the whole submission and for each phase; 0 means no limit
+    total_timeout: float = 900.0
+    upload_timeout: float = 300.0
+    # From the start of the request until the response headers arrive
+    response_timeout: float = 600.0
+    download_timeout: float = 300.0
+    # Retries of a POST that failed to connect or was answered with a retryable status code
+    retries: int = 2
+    retry_backoff: float = 1.0
+    max_retry_backoff: float = 30.0
+    retry_statuses: tuple[int, ...] = (429, 502, 503, 504)
+    # Send the case a second time if no response arrived after this many seconds; 0 disables hedging
+    hedge_after: float = 0.0
+
+    @classmethod
+    def from_env(cls, prefix: str = "FRAUDSCANNER_") -> "DeadlinePolicy":
+        """Read overrides such as ``FRAUDSCANNER_TOTAL_TIMEOUT`` or ``FRAUDSCANNER_HEDGE_AFTER`` from the environment.
+
+        ``retries`` is read from ``FRAUDSCANNER_SUBMIT_RETRIES``, since ``FRAUDSCANNER_RETRIES`` configures the session.
+        """
+        defaults = cls()
+        values = {}
+        for name in ("total_timeout", "upload_timeout", "response_timeout", "download_timeout", "retries", "retry_backoff", "max_retry_backoff", "hedge_after"):
+            value = os.getenv(prefix + ("SUBMIT_RETRIES" if name == "retries" else name.upper()))
+            if value:
+                values[name] = type(getattr(defaults, name))(value)
+        return cls(**values)
+
+    def phase_timeout(self, phase: str) -> float:
+        return {UPLOAD: self.upload_timeout, RESPONSE: self.response_timeout, DOWNLOAD: self.download_timeout}[phase]
+
+    def retry_delay(self, attempt: int, retry_after: float | None = None, rng: random.Random = random) -> float:
+        """Seconds to wait before retry number ``attempt`` (from 0), with full jitter and at least ``retry_after``."""
+        delay = rng.uniform(0, min(self.max_retry_backoff, self.retry_backoff * 2**attempt))
+        return max(delay, retry_after or 0.0)
+
+
+class Deadline:
+    def __init__(self, policy: DeadlinePolicy | None = None):
+        self.policy = policy or DeadlinePolicy.from_env()
+        self.started = time.monotonic()
+        self._cancelled = threading.Event()
+        self._on_cancel: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled.set()
+            callbacks, self._on_cancel = self._on_cancel, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Call ``callback`` (e.g. ``response.close``) when the submission is cancelled, or now if it already was."""
+        with self._lock:
+            if not self.cancelled:
+                self._on_cancel.append(callback)
+                return
+        callback()
+
+    def remaining(self, phase: str | None = None, phase_started: float | None = None) -> float | None:
+        """Seconds left for the whole submission, or for ``phase`` started at the monotonic time ``phase_started``."""
+        now = time.monotonic()
+        limits = []
+        if self.policy.total_timeout:
+            limits.append(self.started + self.policy.total_timeout - now)
+        if phase is not None and self.policy.phase_timeout(phase):
+            limits.append((phase_started or now) + self.policy.phase_timeout(phase) - now)
+        return min(limits) if limits else None
+
+    def check(self, phase: str | None = None, phase_started: float | None = None):
+        """Raise if the submission was cancelled or is out of time."""
+        if self.cancelled:
+            raise SubmissionCancelled()
+        if self.policy.total_timeout and time.monotonic() - self.started > self.policy.total_timeout:
+            raise DeadlineExceeded("submission", self.policy.total_timeout)
+        if phase is not None and self.policy.phase_timeout(phase) and time.monotonic() - phase_started > self.policy.phase_timeout(phase):
+            raise DeadlineExceeded(phase, self.policy.phase_timeout(phase))
+
+    def guard(self, chunks: Iterable[bytes], phase: str) -> Iterator[bytes]:
+        """Pass ``chunks`` through, raising before the next chunk once the submission is cancelled or out of time."""
+        started = time.monotonic()
+        for chunk in chunks:
+            self.check(phase, started)
+            yield chunk
+
+    def sleep(self, seconds: float):
+        """Sleep, but wake up and raise as soon as the submission is cancelled."""
+        if self._cancelled.wait(seconds):
+            raise SubmissionCancelled()
@@ -0,0 +1,326 @@
+"""Streamed request bodies for FraudScanner uploads.
+
+:class:`ZipUploadBody` produces the multipart/form-data framing and a ZIP archive of
+the uploaded files as an iterator of chunks. Nothing is written to disk and the
+archive is never materialised: stored members are yielded as memoryview slices of
+the caller's buffers, so encoding only adds O(chunk) memory on top of the uploads.
+Without a compression policy the output is byte-for-byte what
+``zipfile.ZipFile.writestr`` plus ``requests.post(files=...)`` produced for the same
+inputs.
+
+A :class:`CompressionPolicy` deflates the members that are worth it, chosen by file
+type and the entropy of a few samples of their data: photos (JPEG, HEIC, WebP) are
+stored as before, while PDFs, PNGs and text are deflated unless their samples look
+already compressed. The body has a known length, so members are deflated up front, in
+blocks of :data:`BLOCK_SIZE` on a thread pool. Like pigz, each block is compressed with
+the preceding 32 KiB as dictionary and the blocks concatenate to one deflate stream,
+so a single large PDF uses all cores too. Zlib releases the GIL while it works.
+Deflating up front only pays off on slow links, so the client compresses nothing
+unless ``FRAUDSCANNER_COMPRESSION_LEVEL`` is set.
+"""
+
+import copy
+import itertools
+import math
+import os
+import secrets
+import struct
+import time
+import zipfile
+import zlib
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+CHUNK_SIZE = 64 * 1024
+# Members are deflated in blocks of this size, concurrently
+BLOCK_SIZE = 1024 * 1024
+# Deflate can refer back this far, so each block gets the preceding bytes as dictionary
+WINDOW_SIZE = 32 * 1024
+SAMPLE_SIZE = 4096
+SAMPLES = 3
+
+# Formats whose data is compressed already; deflating them costs CPU and saves nothing
+COMPRESSED_SUFFIXES = frozenset({".jpg", ".jpeg", ".heic", ".heif", ".webp", ".avif", ".gif", ".zip", ".gz", ".7z", ".mp4", ".mov"})
+# Formats that are usually uncompressed
+UNCOMPRESSED_SUFFIXES = frozenset({".txt", ".csv", ".json", ".xml", ".html", ".svg", ".bmp", ".tif", ".tiff"})
+
+_UTF8_FLAG = 0x800
+
+
+def _encode_filename(filename: str) -> tuple[bytes, int]:
+    try:
+        return filename.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return filename.encode("utf-8"), _UTF8_FLAG
+
+
+def sample_entropy(data, sample_size: int = SAMPLE_SIZE, samples: int = SAMPLES) -> float:
+    """Shannon entropy in bits per byte of ``samples`` evenly spaced slices of ``data``."""
+    data = memoryview(data).cast("B")
+    if len(data) <= sample_size * samples:
+        sample = bytes(data)
+    else:
+        step = (len(data) - sample_size) // (samples - 1)
+        sample = b"".join(data[i * step : i * step + sample_size] for i in range(samples))
+    if not sample:
+        return 0.0
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in Counter(sample).values())
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    # Deflate level for data that compresses well; 0 stores every member
+    level: int = 6
+    # Level for data that compresses only somewhat, e.g. PDFs with embedded images
+    fast_level: int = 1
+    # Sampled entropy in bits per byte above which data counts as compressed already
+    stored_entropy: float = 7.5
+    # Sampled entropy above which only the fast level is used
+    fast_entropy: float = 6.0
+    # Smaller members are stored; deflating them saves a few bytes at most
+    min_size: int = 1024
+    # Threads deflating the blocks of a body, defaults to the number of cores
+    workers: int | None = None
+
+    @classmethod
+    def from_env(cls, prefix: str = "FRAUDSCANNER_") -> "CompressionPolicy":
+        """Read ``FRAUDSCANNER_COMPRESSION_LEVEL`` (unset or 0 stores every member) and ``FRAUDSCANNER_COMPRESSION_WORKERS``."""
+        values = {"level": int(os.getenv(prefix + "COMPRESSION_LEVEL") or STORED.level)}
+        if value := os.getenv(prefix + "COMPRESSION_WORKERS"):
+            values["workers"] = int(value)
+        return cls(**values)
+
+    def level_for(self, name: str, data) -> int:
+        """Return the deflate level for a member, or 0 to store it."""
+        if not self.level or len(data) < self.min_size:
+            return 0
+        suffix = os.path.splitext(name)[1].lower()
+        if suffix in COMPRESSED_SUFFIXES:
+            return 0
+        if suffix in UNCOMPRESSED_SUFFIXES:
+            return self.level
+        entropy = sample_entropy(data)
+        if entropy > self.stored_entropy:
+            return 0
+        return min(self.fast_level, self.level) if entropy > self.fast_entropy else self.level
+
+
+# Stores every member, for byte-for-byte compatibility with earlier uploads
+STORED = CompressionPolicy(level=0)
+
+
+def _deflate_block(data: memoryview, start: int, level: int, block_size: int = BLOCK_SIZE) -> bytes:
+    """Raw deflate of one block of ``data``; the blocks of a member concatenate to one deflate stream."""
+    end = min(start + block_size, len(data))
+    if start:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=data[max(0, start - WINDOW_SIZE) : start])
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    # A sync flush ends the block on a byte boundary without marking it as the last one
+    return compressor.compress(data[start:end]) + compressor.flush(zlib.Z_FINISH if end == len(data) else zlib.Z_SYNC_FLUSH)
+
+
+class _Entry:
+    def __init__(self, name: str, data, date_time: tuple):
+        self.data = memoryview(data).cast("B")
+        self.info = zipfile.ZipInfo(filename=name, date_time=date_time)
+        # Same attributes zipfile.ZipFile.writestr() sets for a plain archive name
+        self.info.compress_type = zipfile.ZIP_STORED
+        self.info.external_attr = 0o600 << 16
+        self.info.file_size = self.info.compress_size = len(self.data)
+        # Bytes sent for the member: the data itself, or its deflated form
+        self.payload = self.data
+        if self.info.file_size * 1.05 > zipfile.ZIP64_LIMIT:
+            raise zipfile.LargeZipFile(f"{name} is too large for a ZIP upload")
+        self.filename, self.flag_bits = _encode_filename(self.info.filename)
+        self.info.flag_bits = self.flag_bits
+        self.header_offset = 0
+
+    @property
+    def header_size(self) -> int:
+        return zipfile.sizeFileHeader + len(self.filename) + len(self.info.extra)
+
+    @property
+    def central_dir_size(self) -> int:
+        return zipfile.sizeCentralDir + len(self.filename) + len(self.info.extra) + len(self.info.comment)
+
+    def deflated(self, payload: bytes, crc: int):
+        self.payload = memoryview(payload)
+        self.info.compress_type = zipfile.ZIP_DEFLATED
+        self.info.compress_size = len(payload)
+        self.info.CRC = crc
+
+    def local_header(self) -> bytes:
+        # The CRC of a stored entry is only computed right before it is sent, so the upload starts immediately
+        if self.info.compress_type == zipfile.ZIP_STORED:
+            self.info.CRC = zlib.crc32(self.data)
+        return self.info.FileHeader(zip64=False)
+
+    def central_dir_record(self) -> bytes:
+        info = self.info
+        dt = info.date_time
+        dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+        dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+        record = struct.pack(
+            zipfile.structCentralDir,
+            zipfile.stringCentralDir,
+            info.create_version,
+            info.create_system,
+            info.extract_version,
+            info.reserved,
+            self.flag_bits,
+            info.compress_type,
+            dostime,
+            dosdate,
+            info.CRC,
+            info.compress_size,
+            info.file_size,
+            len(self.filename),
+            len(info.extra),
+            len(info.comment),
+            0,
+            info.internal_attr,
+            info.external_attr,
+            self.header_offset,
+        )
+        return record + self.filename + info.extra + info.comment
+
+
+class ZipUploadBody:
+    """Iterable multipart/form-data body containing a ZIP archive of ``files``.
+
+    ``files`` is an iterable of ``(name, buffer)`` pairs where ``buffer`` supports the
+    buffer protocol (``bytes``, ``memoryview``, ``UploadedFile.getvalue()``). The body
+    has a known length, so ``requests`` sends it with a Content-Length header instead of
+    chunked transfer encoding. With a ``compression`` policy, the members it selects are
+    deflated when the body is created, on ``executor`` or a pool of the policy's workers.
+    """
+
+    def __init__(
+        self,
+        files: Iterable[tuple[str, object]],
+        field_name: str = "file",
+        filename: str = "upload.zip",
+        boundary: str | None = None,
+        chunk_size: int = CHUNK_SIZE,
+        date_time: tuple | None = None,
+        compression: CompressionPolicy = STORED,
+        executor: Executor | None = None,
+    ):
+        date_time = date_time or time.localtime(time.time())[:6]
+        self.boundary = boundary or secrets.token_hex(16)
+        self.chunk_size = chunk_size
+        self.bytes_sent = 0
+        # Seconds spent producing chunks (CRCs, headers), as opposed to waiting for the socket
+        self.build_seconds = 0.0
+        # perf_counter() times at which the consumer asked for the first chunk, i.e. the upload started,
+        # and for more after the last chunk, i.e. the upload finished
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        # Called before each chunk; raising from it aborts the upload
+        self.check: Callable[[], None] | None = None
+
+        self._entries = [_Entry(name, data, date_time) for name, data in files]
+        # Wall seconds spent deflating members when the body was created
+        self.compress_seconds = self._compress(compression, executor)
+        offset = 0
+        for entry in self._entries:
+            entry.header_offset = offset
+            offset += entry.header_size + entry.info.compress_size
+        self._central_dir_offset = offset
+        self._central_dir_size = sum(entry.central_dir_size for entry in self._entries)
+        if len(self._entries) > zipfile.ZIP_FILECOUNT_LIMIT or offset + self._central_dir_size > zipfile.ZIP64_LIMIT:
+            raise zipfile.LargeZipFile("Too much data for a single ZIP upload")
+
+        self._preamble = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            "Content-Type: application/zip\r\n\r\n"
+        ).encode("utf-8")
+        self._epilogue = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    @property
+    def zip_size(self) -> int:
+        return self._central_dir_offset + self._central_dir_size + zipfile.sizeEndCentDir
+
+    def __len__(self) -> int:
+        return len(self._preamble) + self.zip_size + len(self._epilogue)
+
+    def copy(self) -> "ZipUploadBody":
+        """Return a body with the same content but its own progress, e.g. to send it twice at the same time."""
+        body = copy.copy(self)
+        body.bytes_sent = 0
+        body.build_seconds = 0.0
+        body.started_at = body.finished_at = None
+        body.check = None
+        return body
+
+    @property
+    def uncompressed_size(self) -> int:
+        return sum(entry.info.file_size for entry in self._entries)
+
+    def _compress(self, policy: CompressionPolicy, executor: Executor | None) -> float:
+        started = time.perf_counter()
+        selected = [(entry, level) for entry in self._entries if (level := policy.level_for(entry.info.filename, entry.data))]
+        if not selected:
+            return 0.0
+        pool = executor or ThreadPoolExecutor(max_workers=policy.workers or os.cpu_count() or 1, thread_name_prefix="deflate")
+        try:
+            tasks = [
+                (entry, pool.submit(zlib.crc32, entry.data), [pool.submit(_deflate_block, entry.data, start, level, BLOCK_SIZE) for start in range(0, len(entry.data), BLOCK_SIZE)])
+                for entry, level in selected
+            ]
+            for entry, crc, blocks in tasks:
+                payload = b"".join(block.result() for block in blocks)
+                # Data that looked compressible but is not stays stored
+                if len(payload) < len(entry.data):
+                    entry.deflated(payload, crc.result())
+        finally:
+            if executor is None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        return time.perf_counter() - started
+
+    def _iter_zip(self) -> Iterator[bytes]:
+        for entry in self._entries:
+            yield entry.local_header()
+            for start in range(0, len(entry.payload), self.chunk_size):
+                yield entry.payload[start : start + self.chunk_size]
+
+        yield b"".join(entry.central_dir_record() for entry in self._entries)
+        count = len(self._entries)
+        yield struct.pack(
+            zipfile.structEndArchive,
+            zipfile.stringEndArchive,
+            0,
+            0,
+            count,
+            count,
+            self._central_dir_size,
+            self._central_dir_offset,
+            0,
+        )
+
+    def __iter__(self) -> Iterator[bytes]:
+        self.bytes_sent = 0
+        self.build_seconds = 0.0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        chunks = itertools.chain((self._preamble,), self._iter_zip(), (self._epilogue,))
+        while True:
+            if self.check is not None:
+                self.check()
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            self.build_seconds += time.perf_counter() - started
+            if chunk is None:
+                break
+            self.bytes_sent += len(chunk)
+            yield chunk
+        self.finished_at = time.perf_counter()
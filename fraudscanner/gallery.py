@@ -0,0 +1,70 @@
+"""Paginated, lazily decoded view of the members of a result ZIP.
+
+Opening a :class:`ZipGallery` only reads the archive's central directory. A member is
+decompressed when its page is shown (as a downscaled preview) or when its full
+resolution is requested, so the cost of showing a page does not depend on how many
+members the archive has.
+"""
+
+import zipfile
+from typing import BinaryIO
+
+from fraudscanner import pdfinfo, thumbnails
+from fraudscanner.client import IMAGE_EXTENSIONS
+
+PAGE_SIZE = 12
+
+IMAGE = "image"
+PDF = "pdf"
+OTHER = "other"
+
+
+def member_kind(name: str) -> str:
+    name = name.lower()
+    if name.endswith(IMAGE_EXTENSIONS):
+        return IMAGE
+    if name.endswith(".pdf"):
+        return PDF
+    return OTHER
+
+
+class ZipGallery:
+    def __init__(self, file: BinaryIO, page_size: int = PAGE_SIZE):
+        self.zip = zipfile.ZipFile(file)
+        self.page_size = page_size
+        self.by_kind = {IMAGE: [], PDF: [], OTHER: []}
+        for info in self.zip.infolist():
+            if not info.is_dir():
+                self.by_kind[member_kind(info.filename)].append(info)
+        # Images and PDFs are shown in the gallery in archive order, anything else is only listed
+        self.items = sorted(self.by_kind[IMAGE] + self.by_kind[PDF], key=lambda info: info.header_offset)
+        self.others = self.by_kind[OTHER]
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.items) // self.page_size))
+
+    def page(self, number: int) -> list[zipfile.ZipInfo]:
+        """Return the members shown on the 1-based page ``number``."""
+        number = min(max(number, 1), self.page_count)
+        start = (number - 1) * self.page_size
+        return self.items[start : start + self.page_size]
+
+    def read(self, name: str) -> bytes:
+        return self.zip.read(name)
+
+    def preview(self, name: str, size: tuple[int, int] = thumbnails.THUMBNAIL_SIZE) -> bytes:
+        """Return a downscaled preview of an image member, cached by content hash."""
+        return thumbnails.get_thumbnail(self.read(name), size)
+
+    def pdf_page_count(self, name: str) -> int:
+        return pdfinfo.page_count(self.read(name))
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
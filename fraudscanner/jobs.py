@@ -0,0 +1,383 @@
+"""Background submissions with live progress.
+
+A :class:`SubmissionJob` runs the whole upload, server processing, download and parse
+sequence on a worker thread. Its status and progress counters can be read at any time
+from another thread (e.g. a Streamlit script run polling for updates), and its results
+stay available as spooled artifacts until the job is closed.
+
+Every job is bounded by a :class:`~fraudscanner.deadline.Deadline`: transient failures are
+retried, slow submissions can be hedged, and :meth:`SubmissionJob.cancel` aborts the transfer.
+
+A :class:`ShardedJob` sends a large case as several size-bounded sub-requests that run in
+parallel under the same case number, and exposes their merged results the same way.
+"""
+
+import io
+import json
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+
+from fraudscanner import multipart, shards
+from fraudscanner.client import Artifact, FraudScannerClient, parse_artifacts, parse_verdict, referenced_archives
+from fraudscanner.deadline import DOWNLOAD, Deadline, DeadlinePolicy, SubmissionCancelled
+from fraudscanner.encoder import ZipUploadBody
+from fraudscanner.metrics import SubmissionMetrics, timed_source
+from fraudscanner.resultcache import ResultCache
+
+QUEUED = "queued"
+UPLOADING = "uploading"
+DOWNLOADING = "downloading"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class JobProgress:
+    upload_total: int = 0
+    uploaded: int = 0
+    # Seconds from the start of the upload until the response headers arrived
+    ttfb: float | None = None
+    downloaded: int = 0
+    parts: int = 0
+    # ZIPs referenced in the verdict, downloaded concurrently after the response
+    referenced_total: int = 0
+
+
+class SubmissionJob:
+    def __init__(
+        self,
+        client: FraudScannerClient,
+        files: Iterable[tuple[str, object]],
+        case_number: str,
+        stage: str,
+        cache: ResultCache | None = None,
+        cache_key: str | None = None,
+        force: bool = False,
+        extra_headers: dict | None = None,
+        policy: DeadlinePolicy | None = None,
+    ):
+        self.id = uuid.uuid4().hex[:8]
+        self.client = client
+        self.files = list(files)
+        self.case_number = case_number
+        self.stage = stage
+        self.cache = cache
+        self.cache_key = cache_key
+        self.force = force
+        self.extra_headers = extra_headers
+
+        self.status = QUEUED
+        self.error: Exception | None = None
+        self.created = time.time()
+        self.elapsed: float | None = None
+        self.cached_at: float | None = None
+        self.progress = JobProgress()
+        self.metrics = SubmissionMetrics(stage, case_number)
+        self.deadline = Deadline(policy)
+
+        self.content_type = ""
+        self.json = None
+        self.artifacts: list[Artifact] = []
+        # Referenced ZIPs (or their download errors) in the order their downloads finished
+        self.referenced: dict[str, Artifact | Exception] = {}
+        self.future: Future | None = None
+        # Number of POSTs sent, including retries and hedged attempts
+        self.attempts = 0
+        self._body: ZipUploadBody | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def from_cache(self) -> bool:
+        return self.cached_at is not None
+
+    def start(self, executor: Executor) -> "SubmissionJob":
+        self.future = executor.submit(self.run)
+        return self
+
+    def cancel(self):
+        """Stop the submission, aborting its upload or download; a queued job does not start."""
+        self.deadline.cancel()
+
+    def run(self):
+        started = time.perf_counter()
+        # The time budget starts when the job runs, not when it was queued
+        self.deadline.started = time.monotonic()
+        try:
+            self.deadline.check()
+            cached = None if self.force or self.cache is None else self.cache.get(self.cache_key)
+            if cached is not None:
+                self._run_cached(cached)
+            else:
+                self._run_live(started)
+            self.status = DONE
+        except SubmissionCancelled as e:
+            self.error = e
+            self.status = CANCELLED
+        except Exception as e:
+            self.error = e
+            self.status = FAILED
+        finally:
+            # The upload buffers are no longer needed once the request has been sent
+            self.files = []
+            if self._body is not None:
+                self.progress.uploaded = self._body.bytes_sent
+                self._body = None
+            self.elapsed = time.perf_counter() - started
+            self.metrics.status = self.status
+            self.metrics.from_cache = self.from_cache
+            self.metrics.upload_bytes = self.progress.uploaded
+            self.metrics.download_bytes = self.progress.downloaded
+            self.metrics.total = self.elapsed
+
+    def _run_cached(self, cached):
+        self.cached_at = cached.created
+        self.content_type = cached.content_type
+        self.status = DOWNLOADING
+        self._collect(cached.iter_chunks())
+        referenced_started = time.perf_counter()
+        archives = referenced_archives(self.json)
+        self.progress.referenced_total = len(archives)
+        missing = []
+        for key, url in archives:
+            artifact = cached.open_referenced(key)
+            if artifact is None:
+                missing.append((key, url))
+            else:
+                self.referenced[key] = artifact
+        for key, artifact in self.client.download_all(missing, self.case_number, deadline=self.deadline):
+            self.deadline.check()
+            self.referenced[key] = artifact
+        self._referenced_metrics(referenced_started)
+
+    def _run_live(self, started: float):
+        self._body = self.client.upload_body(self.files)
+        self.progress.upload_total = len(self._body)
+        self.status = UPLOADING
+
+        response, self._body = self.client.post_with_deadline(self._body, self.case_number, self.deadline, self.extra_headers, on_attempt=self._on_attempt)
+        with response:
+            self.deadline.on_cancel(response.close)
+            # Deflating, retries and backoff are not part of the upload; its clock starts with the winning attempt's body
+            self.progress.ttfb = time.perf_counter() - (self._body.started_at or started)
+            self._upload_metrics()
+            self.status = DOWNLOADING
+            self.content_type = response.headers.get("Content-Type", "")
+            writer = self.cache.writer(self.cache_key, self.content_type) if self.cache is not None else None
+            chunks = self.deadline.guard(response.iter_content(chunk_size=multipart.CHUNK_SIZE), DOWNLOAD)
+            try:
+                self._collect(chunks, tee=writer.tee if writer else None)
+                referenced_started = time.perf_counter()
+                archives = referenced_archives(self.json)
+                self.progress.referenced_total = len(archives)
+                for key, artifact in self.client.download_all(archives, self.case_number, deadline=self.deadline):
+                    self.deadline.check()
+                    self.referenced[key] = artifact
+                    if writer and isinstance(artifact, Artifact):
+                        writer.add_referenced(key, artifact)
+                self._referenced_metrics(referenced_started)
+            except BaseException:
+                if writer:
+                    writer.discard()
+                raise
+
+            # Only responses with a usable verdict are worth serving again
+            if writer and self.json:
+                writer.commit()
+            elif writer:
+                writer.discard()
+
+    def _on_attempt(self, body: ZipUploadBody):
+        # Progress follows the latest retry or hedged attempt
+        self.attempts += 1
+        self._body = body
+
+    def _count(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.progress.downloaded += len(chunk)
+            yield chunk
+
+    def _upload_metrics(self):
+        body = self._body
+        self.metrics.ttfb = self.progress.ttfb
+        self.metrics.zip_build = body.compress_seconds + body.build_seconds
+        if body.started_at is not None and body.finished_at is not None:
+            self.metrics.upload = body.finished_at - body.started_at
+            self.metrics.server = body.started_at + self.progress.ttfb - body.finished_at
+
+    def _referenced_metrics(self, started: float):
+        self.metrics.referenced = time.perf_counter() - started if self.referenced else None
+        self.metrics.referenced_bytes = sum(artifact.size for artifact in self.referenced.values() if isinstance(artifact, Artifact))
+
+    def _collect(self, chunks: Iterable[bytes], tee=None):
+        """Parse the response body from ``chunks``, timing the download and the parsing separately."""
+        started = time.perf_counter()
+        waited = [0.0]
+        chunks = self._count(timed_source(chunks, waited))
+        if tee is not None:
+            chunks = tee(chunks)
+        self._parse(chunks)
+        self.metrics.download = time.perf_counter() - started
+        self.metrics.parse = self.metrics.download - waited[0]
+
+    def _parse(self, chunks: Iterable[bytes]):
+        for artifact in parse_artifacts(self.content_type, chunks):
+            self.artifacts.append(artifact)
+            self.progress.parts += 1
+            # The verdict is exposed as soon as it is parsed, before the remaining parts arrive
+            if self.json is None:
+                self.json = parse_verdict(artifact)
+
+    @property
+    def uploaded(self) -> int:
+        body = self._body
+        return body.bytes_sent if body is not None else self.progress.uploaded
+
+    def close(self):
+        for artifact in [*self.artifacts, *self.referenced.values()]:
+            if isinstance(artifact, Artifact):
+                artifact.close()
+
+
+class ShardedJob:
+    def __init__(self, client: FraudScannerClient, files: Iterable[tuple[str, object]], case_number: str, stage: str, max_bytes: int = shards.DEFAULT_MAX_BYTES, cache: ResultCache | None = None, cache_key_for=None, **kwargs):
+        """Split ``files`` into shards of at most ``max_bytes``.
+
+        ``cache_key_for(files)`` returns the result cache key of one shard's files, so that each shard is cached
+        on its own. Further keyword arguments are passed to each shard's :class:`SubmissionJob`.
+        """
+        self.id = uuid.uuid4().hex[:8]
+        self.case_number = case_number
+        self.stage = stage
+        self.shards = [
+            SubmissionJob(client, shard_files, case_number, stage, cache=cache, cache_key=cache_key_for(shard_files) if cache_key_for else None, **kwargs)
+            for shard_files in shards.plan_shards(list(files), max_bytes)
+        ]
+        self._artifacts: list[Artifact] | None = None
+        self._metrics = SubmissionMetrics(stage, case_number, shards=len(self.shards))
+
+    def start(self, executor: Executor) -> "ShardedJob":
+        for shard in self.shards:
+            shard.start(executor)
+        return self
+
+    def cancel(self):
+        # Queued shards first, so that none of them starts on a worker freed by a cancelled one
+        for shard in reversed(self.shards):
+            shard.cancel()
+
+    @property
+    def done(self) -> bool:
+        return all(shard.done for shard in self.shards)
+
+    @property
+    def status(self) -> str:
+        statuses = [shard.status for shard in self.shards]
+        if self.done:
+            # Partial results are shown, together with the errors of the failed shards
+            if DONE in statuses:
+                return DONE
+            return CANCELLED if CANCELLED in statuses else FAILED
+        for status in (UPLOADING, DOWNLOADING):
+            if status in statuses:
+                return status
+        return QUEUED
+
+    @property
+    def error(self) -> Exception | None:
+        return next((shard.error for shard in self.shards if shard.error is not None), None)
+
+    @property
+    def progress(self) -> JobProgress:
+        ttfbs = [shard.progress.ttfb for shard in self.shards if shard.progress.ttfb is not None]
+        return JobProgress(
+            upload_total=sum(shard.progress.upload_total for shard in self.shards),
+            uploaded=self.uploaded,
+            ttfb=min(ttfbs) if ttfbs else None,
+            downloaded=sum(shard.progress.downloaded for shard in self.shards),
+            parts=sum(shard.progress.parts for shard in self.shards),
+            referenced_total=sum(shard.progress.referenced_total for shard in self.shards),
+        )
+
+    @property
+    def uploaded(self) -> int:
+        return sum(shard.uploaded for shard in self.shards)
+
+    @property
+    def attempts(self) -> int:
+        return sum(shard.attempts for shard in self.shards)
+
+    @property
+    def metrics(self) -> SubmissionMetrics:
+        """Timings of the whole case: the shards run in parallel, so durations are those of the slowest shard."""
+        metrics = self._metrics
+        shard_metrics = [shard.metrics for shard in self.shards]
+        metrics.status = self.status
+        metrics.from_cache = self.from_cache
+        for name in ("upload_bytes", "download_bytes", "referenced_bytes"):
+            setattr(metrics, name, sum(getattr(shard, name) for shard in shard_metrics))
+        for name, combine in (("zip_build", sum), ("parse", sum), ("ttfb", min), ("upload", max), ("server", max), ("download", max), ("referenced", max), ("total", max)):
+            values = [getattr(shard, name) for shard in shard_metrics if getattr(shard, name) is not None]
+            setattr(metrics, name, combine(values) if values else None)
+        return metrics
+
+    @property
+    def elapsed(self) -> float | None:
+        elapsed = [shard.elapsed for shard in self.shards if shard.elapsed is not None]
+        return max(elapsed) if elapsed else None
+
+    @property
+    def cached_at(self) -> float | None:
+        cached_at = [shard.cached_at for shard in self.shards]
+        return None if None in cached_at else min(cached_at)
+
+    @property
+    def from_cache(self) -> bool:
+        return self.cached_at is not None
+
+    @property
+    def json(self):
+        return shards.merge_verdicts([shard.json for shard in self.shards])
+
+    @property
+    def content_type(self) -> str:
+        content_types = [shard.content_type for shard in self.shards if shard.status == DONE]
+        return next((content_type for content_type in content_types if multipart.is_multipart(content_type)), "application/json")
+
+    @property
+    def artifacts(self) -> list[Artifact]:
+        """The merged verdict, followed by the result ZIPs of all shards."""
+        if not self.done:
+            return []
+        if self._artifacts is None:
+            verdict = json.dumps(self.json).encode("utf-8")
+            self._artifacts = [Artifact("verdict.json", "application/json", io.BytesIO(verdict))]
+            for index, shard in enumerate(self.shards, 1):
+                for artifact in shard.artifacts:
+                    # The verdict parts are replaced by the merged verdict
+                    if artifact.is_zip:
+                        name = f"teil{index}_{artifact.name}" if len(self.shards) > 1 else artifact.name
+                        self._artifacts.append(Artifact(name, artifact.content_type, artifact.file))
+        return self._artifacts
+
+    @property
+    def referenced(self) -> dict[str, Artifact | Exception]:
+        referenced = {}
+        for index, shard in enumerate(self.shards, 1):
+            for key, artifact in list(shard.referenced.items()):
+                if len(self.shards) > 1:
+                    key = f"{key} (Teil {index})"
+                    if isinstance(artifact, Artifact):
+                        artifact = Artifact(f"teil{index}_{artifact.name}", artifact.content_type, artifact.file)
+                referenced[key] = artifact
+        return referenced
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
@@ -0,0 +1,104 @@
+"""Lenient JSON loading for FraudScanner response parts that are not strictly valid JSON.
+
+Malformed parts are repaired by a single pass over their tokens: a comma is inserted
+wherever one value directly follows another, trailing and repeated commas are dropped,
+text before and after the top-level value is ignored and unclosed brackets are closed.
+The repaired token stream is then parsed by :func:`json.loads`, so the whole repair is
+linear in the size of the text.
+"""
+
+import json
+import re
+
+# Strings may be unterminated at the end of a truncated body
+_TOKEN_RE = re.compile(
+    r"""
+    \s*
+    (?:
+    (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<open_string>"(?:[^"\\]|\\.)*)\\?\Z
+    | (?P<number>-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    | (?P<literal>true|false|null|NaN|-?Infinity)
+    | (?P<punct>[{}\[\]:,])
+    | (?P<other>[^"{}\[\]:,\s]+|.)
+    )?
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_CLOSING = {"{": "}", "[": "]"}
+
+
+def repair(text: str) -> str:
+    """Return ``text`` rewritten as syntactically valid JSON where the damage allows it."""
+    output = []
+    stack = []
+    # Whether the last emitted token ended a value, so that the next value needs a comma
+    after_value = False
+    last_comma = None
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind is None or kind == "other":
+            continue
+        token = match.group(kind)
+        if not stack and token not in _CLOSING:
+            # Anything around the top-level object or array (e.g. a log prefix) is ignored
+            continue
+
+        if kind == "punct" and token in "}]":
+            if _CLOSING[stack[-1]] != token:
+                continue
+            if last_comma is not None:
+                output[last_comma] = ""
+            stack.pop()
+            output.append(token)
+            after_value = True
+            last_comma = None
+            if not stack:
+                break
+        elif token == ",":
+            if after_value:
+                last_comma = len(output)
+                output.append(token)
+            after_value = False
+        elif token == ":":
+            output.append(token)
+            after_value = False
+            last_comma = None
+        else:
+            if after_value:
+                output.append(",")
+            if kind == "open_string":
+                # The body was cut off inside a string
+                token += '"'
+            output.append(token)
+            if token in _CLOSING:
+                stack.append(token)
+                after_value = False
+            else:
+                after_value = True
+            last_comma = None
+
+    if last_comma is not None:
+        output[last_comma] = ""
+    if output and output[-1] == ":":
+        output.append("null")
+    output.extend(_CLOSING[opening] for opening in reversed(stack))
+    return "".join(output)
+
+
+def loads_lenient(text: str):
+    """Parse ``text`` as JSON, repairing missing and trailing commas if needed.
+
+    Raises ``json.JSONDecodeError`` if the text cannot be repaired.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        error = e
+
+    repaired = repair(text)
+    if not repaired:
+        raise error
+    return json.loads(repaired)
@@ -0,0 +1,52 @@
+"""Memory-bounded mode for large responses.
+
+With a memory limit set (``FRAUDSCANNER_MEMORY_LIMIT``, e.g. ``512M``), responses are held in
+memory only in small pieces: each artifact spills to a temporary file once it grows beyond
+a fraction of the limit, and the in-process thumbnail cache is sized to fit the limit.
+Response bodies are parsed into memoryviews instead of copied slices, and the UI serves
+downloads from the spooled files on request instead of keeping a copy per download button.
+"""
+
+import os
+import re
+
+from fraudscanner import multipart, thumbnails
+
+ENV_VARIABLE = "FRAUDSCANNER_MEMORY_LIMIT"
+
+# Share of the limit that a single artifact may occupy in memory before it spills to disk
+SPOOL_SHARE = 32
+MIN_SPOOL_SIZE = 256 * 1024
+# Upper estimate of the size of one cached thumbnail
+THUMBNAIL_SIZE = 128 * 1024
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as ``"512M"``, ``"2GiB"`` or ``"1048576"`` into bytes."""
+    match = _SIZE_RE.match(value)
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    number, unit = match.groups()
+    return int(float(number) * _UNITS[unit.lower()])
+
+
+def configure(limit: int | None):
+    """Bound the memory used for responses to roughly ``limit`` bytes, or restore the defaults for ``None``."""
+    if limit is None:
+        multipart.SPOOL_MAX_SIZE = multipart.DEFAULT_SPOOL_MAX_SIZE
+        thumbnails._cache.resize(thumbnails.CACHE_ENTRIES)
+        return
+    multipart.SPOOL_MAX_SIZE = min(multipart.DEFAULT_SPOOL_MAX_SIZE, max(MIN_SPOOL_SIZE, limit // SPOOL_SHARE))
+    # A quarter of the limit for thumbnails that are shared by all sessions
+    thumbnails._cache.resize(max(16, min(thumbnails.CACHE_ENTRIES, limit // 4 // THUMBNAIL_SIZE)), limit // 4)
+
+
+def configure_from_env() -> int | None:
+    """Apply the limit in ``FRAUDSCANNER_MEMORY_LIMIT`` if it is set, and return it."""
+    value = os.getenv(ENV_VARIABLE)
+    limit = parse_size(value) if value else None
+    configure(limit)
+    return limit
@@ -0,0 +1,188 @@
+"""Per-phase timings of submissions and a local log to track them over time.
+
+Every submission records how long it spent building the ZIP, uploading, waiting for the
+server, downloading, parsing the response, downloading referenced ZIPs and rendering each
+artifact, together with the bytes moved. Records are appended as JSON lines to
+:data:`DEFAULT_PATH` (or ``FRAUDSCANNER_METRICS_FILE``). The command line summarizes them as
+latency percentiles per stage, or exports them in the Prometheus text format::
+
+    python -m fraudscanner.metrics
+    python -m fraudscanner.metrics --prometheus /var/lib/node_exporter/fraudscanner.prom
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+DEFAULT_PATH = Path(os.getenv("FRAUDSCANNER_METRICS_FILE", Path.home() / ".cache" / "fraudscanner" / "metrics.jsonl"))
+
+# Phases in the order they happen, in seconds
+PHASES = ("zip_build", "upload", "server", "ttfb", "download", "parse", "referenced", "render", "total")
+# Upper bounds of the Prometheus histogram buckets, in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+@dataclass
+class SubmissionMetrics:
+    stage: str
+    case_number: str
+    started: float = field(default_factory=time.time)
+    status: str = ""
+    from_cache: bool = False
+    shards: int = 1
+    upload_bytes: int = 0
+    download_bytes: int = 0
+    referenced_bytes: int = 0
+
+    zip_build: float | None = None
+    upload: float | None = None
+    # From the end of the upload until the response headers arrived
+    server: float | None = None
+    # From the start of the answered attempt's upload until the response headers arrived
+    ttfb: float | None = None
+    download: float | None = None
+    # Time spent splitting and spooling the response, excluding the wait for the network
+    parse: float | None = None
+    referenced: float | None = None
+    total: float | None = None
+    # Render time per artifact name, measured by the UI
+    render: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def upload_throughput(self) -> float | None:
+        """Upload rate in bytes per second."""
+        return self.upload_bytes / self.upload if self.upload else None
+
+    @property
+    def download_throughput(self) -> float | None:
+        return self.download_bytes / self.download if self.download else None
+
+    def as_record(self) -> dict:
+        record = asdict(self)
+        record["upload_throughput"] = self.upload_throughput
+        record["download_throughput"] = self.download_throughput
+        return record
+
+
+def timed_source(chunks: Iterable[bytes], waited: list[float]) -> Iterator[bytes]:
+    """Pass ``chunks`` through, adding the time spent waiting for each chunk to ``waited[0]``."""
+    chunks = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        waited[0] += time.perf_counter() - started
+        if chunk is None:
+            return
+        yield chunk
+
+
+class MetricsLog:
+    """Append-only JSON lines file of submission records, safe to share between threads."""
+
+    def __init__(self, path: Path = DEFAULT_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, metrics: SubmissionMetrics | dict):
+        record = metrics.as_record() if isinstance(metrics, SubmissionMetrics) else metrics
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as log:
+                log.write(line)
+
+    def read(self) -> Iterator[dict]:
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as log:
+            for line in log:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def phase_seconds(record: dict, phase: str) -> float | None:
+    if phase == "render":
+        return sum(record["render"].values()) if record.get("render") else None
+    return record.get(phase)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+    return values[min(len(values), max(1, math.ceil(q / 100 * len(values)))) - 1]
+
+
+def summarize(records: Iterable[dict]) -> dict[tuple[str, str], dict[str, float]]:
+    """Return count, p50, p95 and p99 of each phase per stage, for submissions that were not cached."""
+    samples = defaultdict(list)
+    for record in records:
+        if record.get("from_cache") or record.get("status") != "done":
+            continue
+        for phase in PHASES:
+            seconds = phase_seconds(record, phase)
+            if seconds is not None:
+                samples[record["stage"], phase].append(seconds)
+    summary = {}
+    for key, values in samples.items():
+        values.sort()
+        summary[key] = {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)}
+    return summary
+
+
+def prometheus_text(records: Iterable[dict]) -> str:
+    """Render the phase durations of ``records`` as Prometheus histograms per stage and phase."""
+    counts = defaultdict(lambda: [0] * len(BUCKETS))
+    sums = defaultdict(float)
+    totals = defaultdict(int)
+    for record in records:
+        if record.get("from_cache") or record.get("status") != "done":
+            continue
+        for phase in PHASES:
+            seconds = phase_seconds(record, phase)
+            if seconds is None:
+                continue
+            key = record["stage"], phase
+            for i, bound in enumerate(BUCKETS):
+                counts[key][i] += seconds <= bound
+            sums[key] += seconds
+            totals[key] += 1
+
+    name = "fraudscanner_phase_seconds"
+    lines = [f"# HELP {name} Duration of the phases of FraudScanner submissions.", f"# TYPE {name} histogram"]
+    for (stage, phase), bucket_counts in sorted(counts.items()):
+        labels = f'stage="{stage}",phase="{phase}"'
+        for bound, count in zip(BUCKETS, bucket_counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {totals[stage, phase]}')
+        lines.append(f"{name}_sum{{{labels}}} {sums[stage, phase]:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {totals[stage, phase]}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the recorded timings of FraudScanner submissions.")
+    parser.add_argument("path", type=Path, nargs="?", default=DEFAULT_PATH, help="Metrics JSONL file")
+    parser.add_argument("--prometheus", type=Path, default=None, help="Write Prometheus histograms to this file instead")
+    args = parser.parse_args(argv)
+
+    records = list(MetricsLog(args.path).read())
+    if args.prometheus:
+        # Written to a temporary file first, so that a collector never reads a partial file
+        temporary = args.prometheus.with_suffix(".tmp")
+        temporary.write_text(prometheus_text(records), encoding="utf-8")
+        temporary.replace(args.prometheus)
+        return
+
+    print(f"{'Stage':<12} {'Phase':<11} {'Count':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for (stage, phase), values in sorted(summarize(records).items(), key=lambda item: (item[0][0], PHASES.index(item[0][1]))):
+        print(f"{stage:<12} {phase:<11} {values['count']:>6} {values['p50']:>8.3f}s {values['p95']:>8.3f}s {values['p99']:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
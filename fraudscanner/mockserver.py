@@ -0,0 +1,275 @@
+"""Local stand-in for the FraudScanner API, serving the "Local" stage.
+
+The server accepts the ZIP upload like the real API and answers with a configurable
+response: a JSON verdict only, or a multipart body with the verdict and N result ZIPs
+of M images each. The verdict can be malformed (newlines instead of commas, trailing
+commas) and can reference further ZIPs by URL, the images can be made arbitrarily large,
+and the response can be trickled out slowly to simulate a slow link.
+
+Usage::
+
+    python -m fraudscanner.mockserver --mode multipart --zips 2 --images 50
+"""
+
+import argparse
+import functools
+import io
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+DEFAULT_PORT = 9999
+API_PATH = "/fraudScanner_v2"
+ARCHIVE_PATH = "/archives/"
+BOUNDARY = "fraudscanner-mock-boundary"
+
+JSON = "json"
+MULTIPART = "multipart"
+
+
+@dataclass(frozen=True)
+class MockConfig:
+    mode: str = MULTIPART
+    # Result ZIPs in a multipart response, and images in each of them
+    zips: int = 1
+    images: int = 10
+    # Side length of the square result images; noisy images compress badly, like photos
+    image_size: int = 512
+    noise: bool = False
+    # ZIPs referenced by URL in the verdict
+    referenced: int = 0
+    malformed_json: bool = False
+    # Seconds before the response headers are sent
+    delay: float = 0.0
+    # Answer the first N uploads with fail_status, like a gateway with a transient failure
+    fail_first: int = 0
+    fail_status: int = 502
+    # Extra seconds before answering the first upload, e.g. to trigger a hedged resubmission
+    first_delay: float = 0.0
+    # Send the body in chunks of this size with a pause in between (0 sends it at once)
+    trickle_chunk: int = 0
+    trickle_interval: float = 0.0
+
+
+@functools.lru_cache(maxsize=16)
+def make_image(size: int, noise: bool, index: int = 0) -> bytes:
+    if noise:
+        image = Image.frombytes("RGB", (size, size), random.Random(index).randbytes(size * size * 3))
+    else:
+        image = Image.new("RGB", (size, size), (index * 37 % 256, 80, 160))
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=90)
+    return output.getvalue()
+
+
+@functools.lru_cache(maxsize=16)
+def make_zip(config: MockConfig, index: int = 0) -> bytes:
+    output = io.BytesIO()
+    # JPEGs do not compress, so deflating them would only slow down building large responses
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as archive:
+        for i in range(config.images):
+            # A few distinct images are enough, their content does not matter
+            archive.writestr(f"result_{index}_{i:04d}.jpg", make_image(config.image_size, config.noise, i % 4))
+    return output.getvalue()
+
+
+def make_verdict(config: MockConfig, case_number: str, names: list[str], base_url: str) -> dict:
+    verdict = {
+        "caseNumber": case_number,
+        "verdict": "ok",
+        "score": 0.12,
+        "images": [{"name": name, "score": round(random.Random(name).random(), 4), "edited": False} for name in names],
+    }
+    for i in range(config.referenced):
+        verdict[f"report_{i}"] = f"{base_url}{ARCHIVE_PATH}{i}.zip"
+    return verdict
+
+
+def dump_verdict(config: MockConfig, verdict: dict) -> bytes:
+    text = json.dumps(verdict, indent=2)
+    if config.malformed_json:
+        # The format the lenient reader repairs: values separated by newlines only, trailing commas
+        lines = text.split("\n")
+        text = "\n".join(line[:-1] if line.endswith(",") else line + "," if line.endswith(("}", "]")) else line for line in lines)
+    return text.encode("utf-8")
+
+
+def make_multipart(parts: list[tuple[str, str | None, bytes]]) -> bytes:
+    """Encode ``(content_type, filename, body)`` parts as a multipart body with :data:`BOUNDARY`."""
+    output = io.BytesIO()
+    for content_type, filename, body in parts:
+        output.write(f"--{BOUNDARY}\r\nContent-Type: {content_type}\r\n".encode())
+        if filename:
+            output.write(f'Content-Disposition: attachment; filename="{filename}"\r\n'.encode())
+        output.write(b"\r\n" + body + b"\r\n")
+    output.write(f"--{BOUNDARY}--\r\n".encode())
+    return output.getvalue()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockServer"
+
+    def do_POST(self):
+        if urlsplit(self.path).path != API_PATH:
+            return self._send(404, "text/plain", b"Not found")
+        if not self.headers.get("x-api-key"):
+            return self._send(403, "application/json", b'{"message": "Forbidden"}')
+
+        upload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.received_bytes += len(upload)
+        config = self.server.config
+        number = next(self.server.posts)
+        if number < config.fail_first:
+            return self._send(config.fail_status, "application/json", b'{"message": "Bad gateway"}')
+        if number == 0 and config.first_delay:
+            time.sleep(config.first_delay)
+        try:
+            with zipfile.ZipFile(io.BytesIO(upload)) as archive:
+                names = archive.namelist()
+                corrupt = archive.testzip()
+        except zipfile.BadZipFile:
+            return self._send(400, "application/json", b'{"message": "Upload is not a ZIP file"}')
+        if corrupt is not None:
+            return self._send(400, "application/json", json.dumps({"message": f"Corrupt ZIP member {corrupt}"}).encode())
+
+        base_url = f"http://{self.headers.get('Host', '127.0.0.1')}"
+        verdict = dump_verdict(config, make_verdict(config, self.headers.get("caseNumber", ""), names, base_url))
+        if config.mode == JSON:
+            return self._send(200, "application/json", verdict)
+        parts = [("application/json", None, verdict)]
+        parts += [("application/zip", f"result_{i}.zip", make_zip(config, i)) for i in range(config.zips)]
+        self._send(200, f"multipart/mixed; boundary={BOUNDARY}", make_multipart(parts))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if not path.startswith(ARCHIVE_PATH):
+            return self._send(404, "text/plain", b"Not found")
+        index = int(path.removeprefix(ARCHIVE_PATH).removesuffix(".zip") or 0)
+        self._send(200, "application/zip", make_zip(self.server.config, 1000 + index))
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        config = self.server.config
+        if config.delay:
+            time.sleep(config.delay)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not config.trickle_chunk:
+            self.wfile.write(body)
+            return
+        for start in range(0, len(body), config.trickle_chunk):
+            self.wfile.write(body[start : start + config.trickle_chunk])
+            self.wfile.flush()
+            time.sleep(config.trickle_interval)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig = MockConfig(), host: str = "127.0.0.1", port: int = DEFAULT_PORT, verbose: bool = False):
+        super().__init__((host, port), MockHandler)
+        self.config = config
+        self.verbose = verbose
+        self.received_bytes = 0
+        # Numbers the uploads; next() on a count is atomic across handler threads
+        self.posts = itertools.count()
+        self._thread = None
+
+    def handle_error(self, request, client_address):
+        # Clients that cancel a submission close the connection, possibly in the middle of a response
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PATH}"
+
+    def warm_up(self) -> "MockServer":
+        """Build the result ZIPs ahead of time, so that the first response is not slowed down by it."""
+        for i in range(self.config.zips):
+            make_zip(self.config, i)
+        for i in range(self.config.referenced):
+            make_zip(self.config, 1000 + i)
+        return self
+
+    def start(self) -> "MockServer":
+        """Serve on a background thread; use port 0 to pick a free port."""
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), name="mockserver", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the FraudScanner API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--mode", choices=(JSON, MULTIPART), default=defaults.mode)
+    parser.add_argument("--zips", type=int, default=defaults.zips, help="Result ZIPs in a multipart response")
+    parser.add_argument("--images", type=int, default=defaults.images, help="Images in each result ZIP")
+    parser.add_argument("--image-size", type=int, default=defaults.image_size, help="Side length of the result images in pixels")
+    parser.add_argument("--noise", action="store_true", help="Incompressible noise images instead of flat colors")
+    parser.add_argument("--referenced", type=int, default=defaults.referenced, help="ZIPs referenced by URL in the verdict")
+    parser.add_argument("--malformed-json", action="store_true", help="Send a verdict with missing and trailing commas")
+    parser.add_argument("--delay", type=float, default=defaults.delay, help="Seconds before the response headers are sent")
+    parser.add_argument("--fail-first", type=int, default=defaults.fail_first, help="Answer the first N uploads with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=defaults.fail_status)
+    parser.add_argument("--first-delay", type=float, default=defaults.first_delay, help="Extra seconds before answering the first upload")
+    parser.add_argument("--trickle-chunk", type=int, default=defaults.trickle_chunk, help="Send the body in chunks of this many bytes")
+    parser.add_argument("--trickle-interval", type=float, default=defaults.trickle_interval, help="Seconds between trickled chunks")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        mode=args.mode,
+        zips=args.zips,
+        images=args.images,
+        image_size=args.image_size,
+        noise=args.noise,
+        referenced=args.referenced,
+        malformed_json=args.malformed_json,
+        delay=args.delay,
+        fail_first=args.fail_first,
+        fail_status=args.fail_status,
+        first_delay=args.first_delay,
+        trickle_chunk=args.trickle_chunk,
+        trickle_interval=args.trickle_interval,
+    )
+    server = MockServer(config, args.host, args.port, verbose=args.verbose)
+    print(f"Serving {config} on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Incremental parser for multipart/mixed and multipart/form-data response bodies.
+
+The parser consumes an iterable of byte chunks (e.g. ``response.iter_content()``)
+and yields each part as soon as its headers are complete. Part bodies are streamed
+from the same chunk iterator, so only about one chunk plus the delimiter length is
+buffered at any time.
+"""
+
+import re
+import tempfile
+from collections.abc import Iterable, Iterator
+
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER_SIZE = 64 * 1024
+DEFAULT_SPOOL_MAX_SIZE = 32 * 1024 * 1024
+# Lowered by fraudscanner.memory in memory-bounded mode
+SPOOL_MAX_SIZE = DEFAULT_SPOOL_MAX_SIZE
+
+_BOUNDARY_RE = re.compile(r"boundary=([^;]+)", re.IGNORECASE)
+_FILENAME_RE = re.compile(r'filename="([^"]+)"')
+_NAME_RE = re.compile(r'(?<![a-z])name="([^"]+)"')
+
+
+class MultipartError(ValueError):
+    """Raised when a multipart body is truncated or malformed."""
+
+
+def get_boundary(content_type: str) -> str | None:
+    """Return the boundary parameter of a multipart Content-Type header, if any."""
+    match = _BOUNDARY_RE.search(content_type)
+    if not match:
+        return None
+    return match.group(1).strip().strip("\"'")
+
+
+def is_multipart(content_type: str) -> bool:
+    return "multipart/form-data" in content_type or "multipart/mixed" in content_type
+
+
+class Part:
+    """A single part of a multipart body.
+
+    The body can only be consumed once, either with :meth:`iter_chunks` or :meth:`read`,
+    and only until the reader advances to the next part. :meth:`iter_chunks` yields
+    memoryviews into the reader's buffer that are only valid until the next chunk is
+    requested, so they have to be written out or copied right away.
+    """
+
+    def __init__(self, index: int, headers: dict[str, str], body: Iterator[bytes]):
+        self.index = index
+        self.headers = headers
+        self._body = body
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("content-type", "")
+
+    @property
+    def filename(self) -> str | None:
+        match = _FILENAME_RE.search(self.headers.get("content-disposition", ""))
+        return match.group(1) if match else None
+
+    @property
+    def name(self) -> str | None:
+        match = _NAME_RE.search(self.headers.get("content-disposition", ""))
+        return match.group(1) if match else None
+
+    @property
+    def is_json(self) -> bool:
+        content_type = self.content_type.lower()
+        return "application/json" in content_type or "text/json" in content_type
+
+    def iter_chunks(self) -> Iterator[memoryview]:
+        return self._body
+
+    def read(self) -> bytes:
+        body = bytearray()
+        for chunk in self._body:
+            body += chunk
+        return bytes(body)
+
+    def __repr__(self):
+        return f"<Part {self.index} {self.content_type or 'unknown'}>"
+
+
+class MultipartReader:
+    """Pull-based multipart parser over an iterable of byte chunks.
+
+    Iterating over the reader yields :class:`Part` objects. Any body data that the
+    caller did not consume is skipped when the next part is requested.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], boundary: str | bytes):
+        if isinstance(boundary, str):
+            boundary = boundary.encode("latin-1")
+        if not boundary:
+            raise MultipartError("Empty multipart boundary")
+        self._chunks = iter(chunks)
+        self._delimiter = b"\r\n--" + boundary
+        # A leading CRLF lets the first boundary line match the same delimiter as all later ones
+        self._buffer = bytearray(b"\r\n")
+        self.bytes_read = 0
+        self.parts_read = 0
+
+    def _fill(self) -> bool:
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += chunk
+                self.bytes_read += len(chunk)
+                return True
+        return False
+
+    def _find(self, needle: bytes, limit: int | None = None) -> int:
+        start = 0
+        while True:
+            idx = self._buffer.find(needle, start)
+            if idx >= 0:
+                return idx
+            if limit is not None and len(self._buffer) > limit:
+                raise MultipartError("Multipart headers exceed the maximum size")
+            # Only the tail can still hold the beginning of a match split across chunks
+            start = max(0, len(self._buffer) - len(needle) + 1)
+            if not self._fill():
+                return -1
+
+    def _ensure(self, size: int) -> bool:
+        while len(self._buffer) < size:
+            if not self._fill():
+                return False
+        return True
+
+    def _skip_preamble(self):
+        while True:
+            idx = self._buffer.find(self._delimiter)
+            if idx >= 0:
+                del self._buffer[: idx + len(self._delimiter)]
+                return
+            keep = len(self._delimiter) - 1
+            if len(self._buffer) > keep:
+                del self._buffer[:-keep]
+            if not self._fill():
+                raise MultipartError("No multipart boundary found in response body")
+
+    def _read_headers(self) -> dict[str, str]:
+        if not self._ensure(2):
+            raise MultipartError("Unexpected end of multipart body")
+        if self._buffer.startswith(b"\r\n"):
+            del self._buffer[:2]
+            return {}
+        end = self._find(b"\r\n\r\n", MAX_HEADER_SIZE)
+        if end < 0:
+            raise MultipartError("Unexpected end of multipart headers")
+        raw = bytes(self._buffer[:end]).decode("utf-8", errors="replace")
+        del self._buffer[: end + 4]
+
+        headers = {}
+        for line in raw.split("\r\n"):
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        return headers
+
+    def _view(self, end: int) -> Iterator[memoryview]:
+        # The buffer cannot be resized while a view of it exists, so the view is released before it is
+        view = memoryview(self._buffer)[:end]
+        try:
+            yield view
+        finally:
+            view.release()
+
+    def _iter_body(self) -> Iterator[memoryview]:
+        keep = len(self._delimiter) - 1
+        while True:
+            idx = self._buffer.find(self._delimiter)
+            if idx >= 0:
+                if idx:
+                    yield from self._view(idx)
+                del self._buffer[: idx + len(self._delimiter)]
+                return
+            if len(self._buffer) > keep:
+                yield from self._view(len(self._buffer) - keep)
+                del self._buffer[:-keep]
+            if not self._fill():
+                raise MultipartError("Unexpected end of multipart body")
+
+    def __iter__(self) -> Iterator[Part]:
+        self._skip_preamble()
+        index = 0
+        while True:
+            # After a delimiter either "--" (close delimiter) or transport padding plus CRLF follows
+            if not self._ensure(2):
+                raise MultipartError("Unexpected end of multipart body")
+            if self._buffer.startswith(b"--"):
+                return
+            line_end = self._find(b"\r\n", MAX_HEADER_SIZE)
+            if line_end < 0:
+                raise MultipartError("Unexpected end of multipart body")
+            del self._buffer[: line_end + 2]
+
+            index += 1
+            body = self._iter_body()
+            part = Part(index, self._read_headers(), body)
+            yield part
+            # Skip whatever the caller left unread so the next part starts at its headers
+            for _ in body:
+                pass
+            self.parts_read += 1
+
+
+def iter_parts(chunks: Iterable[bytes], boundary: str | bytes) -> Iterator[Part]:
+    """Yield the parts of a multipart body read incrementally from ``chunks``."""
+    return iter(MultipartReader(chunks, boundary))
+
+
+def spool(chunks: Iterable[bytes], max_size: int | None = None) -> tempfile.SpooledTemporaryFile:
+    """Copy ``chunks`` into a spooled temporary file and rewind it.
+
+    Bodies up to ``max_size`` bytes (by default :data:`SPOOL_MAX_SIZE`, read at call time)
+    stay in memory, larger ones roll over to disk.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE if max_size is None else max_size)
+    for chunk in chunks:
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
@@ -0,0 +1,222 @@
+"""Cheap PDF metadata for previews.
+
+The page count is read from the ``/Count`` entry of the document's root page tree node.
+It is found the way a PDF reader finds it: ``startxref`` at the end of the file points to
+the cross-reference table (or stream), whose entries give the byte offsets of the
+trailer's ``/Root`` catalog and of its ``/Pages`` node. This reads a few small objects
+at known offsets instead of parsing every page or scanning the file, so it takes the same
+time for a 50 MB scan as for a one-page letter. PDFs with a broken cross-reference, or
+whose catalog lives in a compressed object stream, fall back to PyPDF2, which is only
+imported in that case.
+"""
+
+import io
+import re
+import zlib
+
+from fraudscanner.cache import LRUCache, content_hash
+
+CACHE_ENTRIES = 4096
+# startxref and %%EOF are at the end of the file
+TAIL_SIZE = 1024
+# Bytes read at an object's offset to find its dictionary; catalogs and page tree nodes are small
+OBJECT_SIZE = 64 * 1024
+# Incremental updates chain their cross-reference sections with /Prev
+MAX_SECTIONS = 64
+
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+_OBJECT_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+_SUBSECTION_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s*[\r\n]")
+_ENTRY_RE = re.compile(rb"(\d{10}) (\d{5}) ([nf])")
+_TRAILER_RE = re.compile(rb"trailer\s*<<")
+_STREAM_RE = re.compile(rb"stream\r?\n")
+_ROOT_RE = re.compile(rb"/Root\s+(\d+)\s+\d+\s+R")
+_PAGES_RE = re.compile(rb"/Pages\s+(\d+)\s+\d+\s+R")
+_COUNT_RE = re.compile(rb"/Count\s+(\d+)(?!\s+\d+\s+R)")
+_PREV_RE = re.compile(rb"/Prev\s+(\d+)")
+_W_RE = re.compile(rb"/W\s*\[\s*(\d+)\s+(\d+)\s+(\d+)\s*\]")
+_INDEX_RE = re.compile(rb"/Index\s*\[([\d\s]*)\]")
+_SIZE_RE = re.compile(rb"/Size\s+(\d+)")
+_LENGTH_RE = re.compile(rb"/Length\s+(\d+)(?!\s+\d+\s+R)")
+_PREDICTOR_RE = re.compile(rb"/Predictor\s+(\d+)")
+_COLUMNS_RE = re.compile(rb"/Columns\s+(\d+)")
+
+_cache = LRUCache(CACHE_ENTRIES)
+
+
+class PdfInfoError(ValueError):
+    """Raised when the page count of a PDF cannot be determined."""
+
+
+class _BrokenXref(Exception):
+    pass
+
+
+def _unpredict(rows: bytes, columns: int) -> bytes:
+    """Undo the PNG predictors (None, Sub and Up) that cross-reference streams are usually encoded with."""
+    output, previous = bytearray(), bytearray(columns)
+    for start in range(0, len(rows), columns + 1):
+        kind, row = rows[start], bytearray(rows[start + 1 : start + 1 + columns])
+        if kind == 1:
+            for i in range(1, len(row)):
+                row[i] = (row[i] + row[i - 1]) & 0xFF
+        elif kind == 2:
+            for i in range(len(row)):
+                row[i] = (row[i] + previous[i]) & 0xFF
+        elif kind != 0:
+            raise _BrokenXref()
+        output += row
+        previous = row
+    return bytes(output)
+
+
+def _xref_table(data, offset: int, offsets: dict[int, int]) -> bytes:
+    """Read a classic cross-reference section at ``offset`` into ``offsets`` and return its trailer dictionary."""
+    position = offset + len(b"xref")
+    while True:
+        subsection = _SUBSECTION_RE.match(data, position)
+        if not subsection:
+            break
+        first, count = int(subsection.group(1)), int(subsection.group(2))
+        position = subsection.end()
+        for number in range(first, first + count):
+            # Entries are 20 bytes, but some writers end them with a single byte instead of two
+            while position < len(data) and data[position : position + 1] in b" \r\n":
+                position += 1
+            entry = _ENTRY_RE.match(data, position)
+            if not entry:
+                raise _BrokenXref()
+            if entry.group(3) == b"n":
+                offsets.setdefault(number, int(entry.group(1)))
+            position = entry.end()
+    trailer = _TRAILER_RE.match(data, position) or _TRAILER_RE.search(data, position, position + 64)
+    if not trailer:
+        raise _BrokenXref()
+    # The trailer ends at startxref; what follows belongs to a later revision
+    return bytes(data[trailer.start() : trailer.start() + OBJECT_SIZE]).split(b"startxref")[0]
+
+
+def _xref_stream(data, offset: int, offsets: dict[int, int]) -> bytes:
+    """Read a cross-reference stream at ``offset`` into ``offsets`` and return its dictionary."""
+    head = bytes(data[offset : offset + OBJECT_SIZE])
+    stream = _STREAM_RE.search(head)
+    widths = _W_RE.search(head)
+    if not stream or not widths or b"/XRef" not in head[: stream.start()]:
+        raise _BrokenXref()
+    dictionary = head[: stream.start()]
+    length = _LENGTH_RE.search(dictionary)
+    # Without a direct /Length, the stream must end within the bytes read
+    end = stream.end() + int(length.group(1)) if length else head.find(b"endstream", stream.end())
+    if end < 0:
+        raise _BrokenXref()
+    raw = bytes(data[offset + stream.end() : offset + end]) if end > len(head) else head[stream.end() : end]
+    if b"/FlateDecode" in dictionary:
+        try:
+            raw = zlib.decompressobj().decompress(raw)
+        except zlib.error:
+            raise _BrokenXref() from None
+    elif b"/Filter" in dictionary:
+        raise _BrokenXref()
+    widths = [int(width) for width in widths.groups()]
+    row_size = sum(widths)
+    predictor = _PREDICTOR_RE.search(dictionary)
+    if predictor and int(predictor.group(1)) >= 10:
+        columns = _COLUMNS_RE.search(dictionary)
+        raw = _unpredict(raw, int(columns.group(1)) if columns else row_size)
+
+    index = _INDEX_RE.search(dictionary)
+    if index:
+        bounds = [int(value) for value in index.group(1).split()]
+    else:
+        size = _SIZE_RE.search(dictionary)
+        if not size:
+            raise _BrokenXref()
+        bounds = [0, int(size.group(1))]
+    position = 0
+    for first, count in zip(bounds[::2], bounds[1::2]):
+        for number in range(first, first + count):
+            row = raw[position : position + row_size]
+            position += row_size
+            if len(row) < row_size:
+                raise _BrokenXref()
+            fields, field_start = [], 0
+            for width in widths:
+                fields.append(int.from_bytes(row[field_start : field_start + width], "big"))
+                field_start += width
+            # A missing type field means type 1, an object at a byte offset
+            kind = fields[0] if widths[0] else 1
+            if kind == 1:
+                offsets.setdefault(number, fields[1])
+            elif kind == 2:
+                # Compressed in an object stream, which only PyPDF2 unpacks
+                offsets.setdefault(number, -1)
+    return dictionary
+
+
+def _read_xref(data) -> tuple[dict[int, int], int]:
+    """Return the byte offsets of all objects by number, and the object number of the catalog."""
+    startxref = None
+    for startxref in _STARTXREF_RE.finditer(bytes(data[-TAIL_SIZE:])):
+        pass
+    if startxref is None:
+        raise _BrokenXref()
+    offset, offsets, root, seen = int(startxref.group(1)), {}, None, set()
+    # The newest section comes first, so its entries and its /Root win over those of earlier revisions
+    while offset is not None and offset not in seen and len(seen) < MAX_SECTIONS:
+        seen.add(offset)
+        if bytes(data[offset : offset + 4]) == b"xref":
+            dictionary = _xref_table(data, offset, offsets)
+        elif _OBJECT_RE.match(data, offset):
+            dictionary = _xref_stream(data, offset, offsets)
+        else:
+            raise _BrokenXref()
+        root_match = root is None and _ROOT_RE.search(dictionary)
+        if root_match:
+            root = int(root_match.group(1))
+        prev = _PREV_RE.search(dictionary)
+        offset = int(prev.group(1)) if prev else None
+    if root is None:
+        raise _BrokenXref()
+    return offsets, root
+
+
+def _object_body(data, offsets: dict[int, int], number: int) -> bytes:
+    offset = offsets.get(number)
+    if offset is None or offset < 0:
+        raise _BrokenXref()
+    head = bytes(data[offset : offset + OBJECT_SIZE])
+    match = _OBJECT_RE.match(head)
+    if not match or int(match.group(1)) != number:
+        raise _BrokenXref()
+    end = head.find(b"endobj", match.end())
+    return head[match.end() : end if end >= 0 else None]
+
+
+def _page_tree_count(data) -> int | None:
+    try:
+        offsets, root = _read_xref(data)
+        pages = _PAGES_RE.search(_object_body(data, offsets, root))
+        count = pages and _COUNT_RE.search(_object_body(data, offsets, int(pages.group(1))))
+    except (_BrokenXref, ValueError, IndexError):
+        return None
+    return int(count.group(1)) if count else None
+
+
+def _reader_count(data) -> int:
+    import PyPDF2
+
+    try:
+        return len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+    except Exception as e:
+        raise PdfInfoError(f"PDF could not be read: {e}") from e
+
+
+def count_pages(data) -> int:
+    """Return the number of pages of the PDF in the bytes-like ``data``, without caching."""
+    count = _page_tree_count(data)
+    return count if count is not None else _reader_count(data)
+
+
+def page_count(data) -> int:
+    """Return the number of pages of the PDF in ``data``, memoized by content hash."""
+    return _cache.get_or_compute(content_hash(data), lambda: count_pages(data))
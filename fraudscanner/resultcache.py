@@ -0,0 +1,206 @@
+"""Persistent cache of FraudScanner responses for identical submissions.
+
+Entries are keyed by a digest of the stage, the case number and the names and content
+hashes of the uploaded files. The raw response body and any ZIPs referenced by the JSON
+verdict are stored as blob files next to a SQLite index, so a repeated submission can be
+rendered again without uploading anything. Entries expire after a TTL, and the least
+recently used entries are evicted once the cache grows beyond its size limit.
+"""
+
+import contextlib
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fraudscanner.cache import content_hash
+from fraudscanner.client import Artifact
+from fraudscanner.multipart import CHUNK_SIZE
+
+DEFAULT_DIRECTORY = Path(os.getenv("FRAUDSCANNER_CACHE_DIR", Path.home() / ".cache" / "fraudscanner"))
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 1024**3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    content_type TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS referenced (
+    key TEXT NOT NULL REFERENCES entries(key) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    PRIMARY KEY (key, name)
+);
+"""
+
+
+@dataclass
+class CachedResponse:
+    key: str
+    content_type: str
+    created: float
+    body_path: Path
+    referenced: dict[str, Path] = field(default_factory=dict)
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.body_path, "rb") as body:
+            while chunk := body.read(chunk_size):
+                yield chunk
+
+    def open_referenced(self, name: str) -> Artifact | None:
+        path = self.referenced.get(name)
+        if path is None:
+            return None
+        return Artifact(f"{name}.zip", "application/zip", open(path, "rb"))
+
+
+class CacheWriter:
+    """Records a response while it is being processed and stores it on :meth:`commit`."""
+
+    def __init__(self, cache: "ResultCache", key: str, content_type: str):
+        self.cache = cache
+        self.key = key
+        self.content_type = content_type
+        self.complete = False
+        self._directory = Path(tempfile.mkdtemp(prefix=".incoming-", dir=cache.directory))
+        self._body = open(self._directory / "body", "wb")
+        self._referenced = {}
+        self._tee = None
+
+    def tee(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Pass ``chunks`` through while writing them to the cached body."""
+        self._tee = self._iter_tee(chunks)
+        return self._tee
+
+    def _iter_tee(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self._body.write(chunk)
+            yield chunk
+        self.complete = True
+
+    def add_referenced(self, name: str, artifact: Artifact):
+        blob = f"ref-{len(self._referenced)}"
+        artifact.file.seek(0)
+        with open(self._directory / blob, "wb") as target:
+            shutil.copyfileobj(artifact.file, target)
+        artifact.file.seek(0)
+        self._referenced[name] = blob
+
+    def commit(self):
+        """Store the response once the rest of its body (e.g. a multipart epilogue) has been read."""
+        if self._tee is not None:
+            for _ in self._tee:
+                pass
+        self._body.close()
+        if not self.complete:
+            self.discard()
+            return
+        self.cache._store(self.key, self.content_type, self._directory, self._referenced)
+
+    def discard(self):
+        self._body.close()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+
+class ResultCache:
+    def __init__(self, directory: Path = DEFAULT_DIRECTORY, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @staticmethod
+    def key(stage: str, case_number: str, files: Iterable[tuple[str, object]], api_key: str = "", digests: Iterable[str] | None = None) -> str:
+        """Digest of everything that determines the API's answer to a submission.
+
+        The API key is part of the digest so that users of a shared server never see each other's results.
+        ``digests`` are the :func:`~fraudscanner.cache.content_hash` of each file, if the caller has them already.
+        """
+        files = list(files)
+        digests = list(digests) if digests is not None else [content_hash(data) for _, data in files]
+        digest = hashlib.sha256()
+        for value in (stage, case_number, api_key):
+            digest.update(value.encode("utf-8") + b"\0")
+        for name, file_hash in sorted((name, file_hash) for (name, _), file_hash in zip(files, digests)):
+            digest.update(f"{name}\0{file_hash}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation, so the cache can be shared between threads
+        db = sqlite3.connect(self.directory / "index.sqlite3", timeout=30)
+        try:
+            db.execute("PRAGMA foreign_keys = ON")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _entry_directory(self, key: str) -> Path:
+        return self.directory / key
+
+    def get(self, key: str) -> CachedResponse | None:
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT content_type, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content_type, created = row
+            if created + self.ttl < now:
+                self._delete(db, key)
+                return None
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            referenced = db.execute("SELECT name, blob FROM referenced WHERE key = ?", (key,)).fetchall()
+
+        directory = self._entry_directory(key)
+        if not (directory / "body").exists():
+            self.invalidate(key)
+            return None
+        return CachedResponse(key, content_type, created, directory / "body", {name: directory / blob for name, blob in referenced})
+
+    def writer(self, key: str, content_type: str) -> CacheWriter:
+        return CacheWriter(self, key, content_type)
+
+    def _store(self, key: str, content_type: str, incoming: Path, referenced: dict[str, str]):
+        size = sum(path.stat().st_size for path in incoming.iterdir())
+        target = self._entry_directory(key)
+        now = time.time()
+        with self._connect() as db:
+            self._delete(db, key)
+            incoming.rename(target)
+            db.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?)", (key, content_type, now, now, size))
+            db.executemany("INSERT INTO referenced VALUES (?, ?, ?)", [(key, name, blob) for name, blob in referenced.items()])
+        self.evict()
+
+    def _delete(self, db: sqlite3.Connection, key: str):
+        db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        shutil.rmtree(self._entry_directory(key), ignore_errors=True)
+
+    def invalidate(self, key: str):
+        with self._connect() as db:
+            self._delete(db, key)
+
+    def evict(self):
+        """Remove expired entries, then the least recently used ones until the size limit is met."""
+        with self._connect() as db:
+            expired = db.execute("SELECT key FROM entries WHERE created < ?", (time.time() - self.ttl,)).fetchall()
+            for (key,) in expired:
+                self._delete(db, key)
+
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            for key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._delete(db, key)
+                total -= size
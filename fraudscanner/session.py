@@ -0,0 +1,156 @@
+"""Pooled HTTP sessions with keep-alive, default timeouts and a retry policy."""
+
+import contextlib
+import os
+import socket
+import threading
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+_tracking = threading.local()
+
+
+@dataclass(frozen=True)
+class SessionConfig:
+    pool_connections: int = 4
+    pool_maxsize: int = 8
+    connect_timeout: float = 10.0
+    # FraudScanner runs can take minutes for large cases
+    read_timeout: float = 300.0
+    retries: int = 3
+    backoff_factor: float = 0.5
+    status_forcelist: tuple[int, ...] = (429, 502, 503, 504)
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    @classmethod
+    def from_env(cls, prefix: str = "FRAUDSCANNER_") -> "SessionConfig":
+        """Read overrides such as ``FRAUDSCANNER_READ_TIMEOUT`` from the environment."""
+        defaults = cls()
+        values = {}
+        for name in ("pool_connections", "pool_maxsize", "connect_timeout", "read_timeout", "retries", "backoff_factor"):
+            value = os.getenv(prefix + name.upper())
+            if value:
+                values[name] = type(getattr(defaults, name))(value)
+        return cls(**values)
+
+
+class _TrackedPoolMixin:
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        callback = getattr(_tracking, "callback", None)
+        if callback is not None:
+            callback(connection)
+        return connection
+
+
+class _TrackedHTTPConnectionPool(_TrackedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _TrackedHTTPSConnectionPool(_TrackedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+@contextlib.contextmanager
+def track_connections(callback: Callable[[object], None]) -> Iterator[None]:
+    """Call ``callback`` with each connection that a request sent by this thread inside the block goes over."""
+    previous, _tracking.callback = getattr(_tracking, "callback", None), callback
+    try:
+        yield
+    finally:
+        _tracking.callback = previous
+
+
+def abort_connection(connection):
+    """Shut down the socket of ``connection`` from another thread, so a request blocked on it fails right away."""
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to requests sent without one.
+
+    Its connections can be observed with :func:`track_connections`, e.g. to abort a request
+    that is still waiting for its response.
+    """
+
+    def __init__(self, timeout: tuple[float, float], **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TrackedHTTPConnectionPool, "https": _TrackedHTTPSConnectionPool}
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+
+class SubmitHTTPAdapter(TimeoutHTTPAdapter):
+    """Adapter for the POST of a submission, which sends each request exactly once.
+
+    Submissions are retried by :class:`~fraudscanner.deadline.DeadlinePolicy` within their deadline.
+    Retrying their connections here as well would multiply the attempts and overrun the deadline.
+    """
+
+    def __init__(self, timeout: tuple[float, float], **kwargs):
+        super().__init__(timeout, max_retries=Retry(0, read=False, raise_on_status=False), **kwargs)
+
+
+def create_retry(config: SessionConfig) -> Retry:
+    # Connection failures are retried for every method because the request never reached the server.
+    # Read errors and retryable status codes are only retried for idempotent methods. The POST of a
+    # submission is sent over a SubmitHTTPAdapter without any retries instead, see mount_submit_adapter().
+    return Retry(
+        total=config.retries,
+        connect=config.retries,
+        read=config.retries,
+        status=config.retries,
+        backoff_factor=config.backoff_factor,
+        status_forcelist=config.status_forcelist,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+
+
+def create_session(config: SessionConfig | None = None) -> requests.Session:
+    """Return a session whose connections are kept alive and reused across requests."""
+    config = config or SessionConfig()
+    adapter = TimeoutHTTPAdapter(
+        config.timeout,
+        pool_connections=config.pool_connections,
+        pool_maxsize=config.pool_maxsize,
+        max_retries=create_retry(config),
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def mount_submit_adapter(session: requests.Session, url: str):
+    """Send POSTs to ``url`` over a :class:`SubmitHTTPAdapter` with the timeout and pool size of the session's adapter."""
+    current = session.get_adapter(url)
+    if isinstance(current, SubmitHTTPAdapter):
+        return
+    session.mount(
+        url,
+        SubmitHTTPAdapter(
+            getattr(current, "timeout", None),
+            pool_connections=getattr(current, "_pool_connections", SessionConfig.pool_connections),
+            pool_maxsize=getattr(current, "_pool_maxsize", SessionConfig.pool_maxsize),
+        ),
+    )
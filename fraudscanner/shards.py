@@ -0,0 +1,53 @@
+"""Splitting large cases into size-bounded sub-requests and merging their verdicts.
+
+All sub-requests ("shards") of a case are sent with the same case number. Their JSON
+verdicts are merged into one: objects are merged key by key, lists are concatenated,
+and scalars on which the shards disagree become a list with one value per shard.
+"""
+
+from collections.abc import Sequence
+
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+
+def _size(data) -> int:
+    return memoryview(data).nbytes
+
+
+def plan_shards(files: Sequence[tuple[str, object]], max_bytes: int = DEFAULT_MAX_BYTES) -> list[list[tuple[str, object]]]:
+    """Group ``(name, buffer)`` pairs into shards of at most ``max_bytes`` each, keeping their order.
+
+    A single file larger than ``max_bytes`` is sent on its own.
+    """
+    shards = []
+    current, current_size = [], 0
+    for name, data in files:
+        size = _size(data)
+        if current and current_size + size > max_bytes:
+            shards.append(current)
+            current, current_size = [], 0
+        current.append((name, data))
+        current_size += size
+    if current:
+        shards.append(current)
+    return shards
+
+
+def merge_verdicts(verdicts: Sequence):
+    """Merge the JSON verdicts of all shards of a case into one."""
+    verdicts = [verdict for verdict in verdicts if verdict is not None]
+    return _merge(verdicts) if verdicts else None
+
+
+def _merge(values: list):
+    if len(values) == 1:
+        return values[0]
+    if all(isinstance(value, dict) for value in values):
+        keys = dict.fromkeys(key for value in values for key in value)
+        return {key: _merge([value[key] for value in values if key in value]) for key in keys}
+    if all(isinstance(value, list) for value in values):
+        return [item for value in values for item in value]
+    if all(value == values[0] for value in values):
+        return values[0]
+    # Values that differ between shards are kept side by side, e.g. one score per shard
+    return values
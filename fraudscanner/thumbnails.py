@@ -0,0 +1,41 @@
+"""Small, cached preview thumbnails for uploaded and returned images.
+
+Pillow is only imported once the first thumbnail is made, so that importing the client
+and gallery modules stays cheap for scripts that never show a preview.
+"""
+
+import io
+
+from fraudscanner.cache import LRUCache, content_hash
+
+# Twice the 300px preview width, so thumbnails stay sharp on high-DPI screens
+THUMBNAIL_SIZE = (600, 600)
+CACHE_ENTRIES = 1024
+
+_cache = LRUCache(CACHE_ENTRIES)
+
+
+def make_thumbnail(data, size: tuple[int, int] = THUMBNAIL_SIZE) -> bytes:
+    """Decode an image at reduced size and return it re-encoded as a small JPEG or PNG."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        # For JPEGs this decodes directly at 1/2, 1/4 or 1/8 scale instead of at full resolution
+        image.draft("RGB", size)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(output, "PNG", optimize=True)
+        else:
+            image.convert("RGB").save(output, "JPEG", quality=85)
+    return output.getvalue()
+
+
+def get_thumbnail(data, size: tuple[int, int] = THUMBNAIL_SIZE, digest: str | None = None) -> bytes:
+    """Return a thumbnail of ``data``, memoized by content hash across all sessions.
+
+    ``digest`` is the :func:`~fraudscanner.cache.content_hash` of ``data``, if the caller has it already.
+    """
+    return _cache.get_or_compute((digest or content_hash(data), size), lambda: make_thumbnail(data, size))
@@ -1,34 +1,442 @@
-import io
+import contextlib
+import dataclasses
+import json
 import os
-import tempfile
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
-import PyPDF2
-import requests
 import streamlit as st
 from PIL import Image
 
-# API_URL = "https://api.vaarhaft.com/v2/fraudscanner"
+from fraudscanner import jobs, memory, multipart, session, thumbnails
+from fraudscanner.artifacts import ArtifactProcessor, ParsedResult
+from fraudscanner.cache import content_hash
+from fraudscanner.client import IMAGE_EXTENSIONS, STAGES, ApiError, FraudScannerClient, parse_verdict
+from fraudscanner.compare import COMPARED_PHASES, Comparison
+from fraudscanner.deadline import DeadlineExceeded, DeadlinePolicy
+from fraudscanner.gallery import IMAGE, PDF
+from fraudscanner.jobs import ShardedJob, SubmissionJob
+from fraudscanner.metrics import MetricsLog
+from fraudscanner.preflight import PreflightChecker
+from fraudscanner.resultcache import ResultCache
+
 API_KEY = os.getenv("API_KEY")
 
+
+# --- Rendering helpers ---
+
+JOB_STATUS_LABELS = {
+    jobs.QUEUED: "Wartet",
+    jobs.UPLOADING: "Upload läuft",
+    jobs.DOWNLOADING: "Antwort wird empfangen",
+    jobs.DONE: "Fertig",
+    jobs.FAILED: "Fehlgeschlagen",
+    jobs.CANCELLED: "Abgebrochen",
+}
+
+
+def format_size(size):
+    if size > 1_000_000:
+        return f"{size / 1_000_000:.2f} mb"
+    elif size > 1_000:
+        return f"{size / 1000:.1f} kb"
+    return f"{size} bytes"
+
+
+GALLERY_COLUMNS = 3
+
+
+def render_gallery_item(gallery, preview, key):
+    """Show the prepared preview of one gallery member, with its full resolution on demand."""
+    file_name = preview.name
+    if preview.error is not None:
+        st.warning(f"Keine Vorschau für {file_name} verfügbar: {preview.error}")
+    elif preview.kind == IMAGE:
+        st.image(preview.thumbnail, caption=file_name, width=300)
+        # The member is only read and decoded at full resolution while the toggle is on
+        if st.toggle("Originalgröße", key=f"{key}-full"):
+            data = gallery.read(file_name)
+            st.image(data, caption=file_name)
+            st.download_button(
+                f"Datei herunterladen: {file_name}",
+                data=data,
+                file_name=file_name,
+                on_click="ignore",
+                key=f"{key}-download",
+            )
+    else:
+        st.image("resources/pdf-logo.png", caption=file_name, width=300)
+        st.write(f"PDF mit {preview.pages} Seiten")
+        # Decompressed only when the download is clicked, not on every rerun
+        st.download_button(
+            f"Datei herunterladen: {file_name}",
+            data=lambda file_name=file_name: gallery.read(file_name),
+            file_name=file_name,
+            mime="application/pdf",
+            on_click="ignore",
+            key=f"{key}-download",
+        )
+
+
+def render_zip(title, download_label, zip_artifact, key, parsed):
+    """Show a result ZIP, whether it was a response part, the whole response or referenced by the verdict.
+
+    The images and PDFs are shown page by page, and the members of the shown page are decoded in parallel.
+    The index and the previews are kept in ``parsed``, so reruns decode only pages not shown before.
+    """
+    key = f"{key}-{zip_artifact.name}"
+    st.subheader(title)
+    try:
+        gallery = parsed.gallery(zip_artifact)
+    except zipfile.BadZipFile:
+        st.warning("Die Zip-Datei konnte nicht geöffnet werden")
+        return
+
+    st.download_button(
+        download_label,
+        # Read from the spooled file only when clicked, instead of copying the ZIP into every rerun
+        data=zip_artifact.read_all,
+        file_name=zip_artifact.name,
+        on_click="ignore",
+        key=f"{key}-download",
+    )
+    images, pdfs = len(gallery.by_kind[IMAGE]), len(gallery.by_kind[PDF])
+    st.write(f"Inhalte: {images} Bilder, {pdfs} PDFs")
+    if gallery.others:
+        st.write("Weitere Dateien: " + ", ".join(info.filename for info in gallery.others))
+    if not gallery.items:
+        return
+
+    page = 1
+    if gallery.page_count > 1:
+        page = st.number_input(f"Seite (von {gallery.page_count})", min_value=1, max_value=gallery.page_count, key=f"{key}-page")
+
+    previews = parsed.previews(zip_artifact, gallery.page(page))
+    columns = st.columns(GALLERY_COLUMNS)
+    for i, preview in enumerate(previews):
+        with columns[i % GALLERY_COLUMNS]:
+            render_gallery_item(gallery, preview, f"{key}-{preview.name}")
+    st.write("---")
+
+
+@contextlib.contextmanager
+def record_render_time(render_times, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        render_times[name] = time.perf_counter() - started
+
+
+def render_response(content_type, artifacts, referenced, key, parsed, render_times=None):
+    """Render the artifacts of a successful response and return the JSON verdict.
+
+    ``parsed`` holds what was parsed from the response in earlier reruns. ``referenced`` maps the names of ZIPs referenced in the verdict to their artifacts, or to the
+    exception their download failed with, in the order their downloads finished.
+    ``key`` keeps the widgets of several rendered responses apart.
+    The render time of each artifact is stored in ``render_times`` by artifact name.
+    """
+    render_times = {} if render_times is None else render_times
+    st.success("Anfrage erfolgreich.")
+    json_data = None
+
+    if multipart.is_multipart(content_type):
+        # Handle multipart response (JSON + zip files)
+        st.write("Multipart-Response erhalten")
+        boundary = multipart.get_boundary(content_type)
+
+        try:
+            for artifact in artifacts:
+                with record_render_time(render_times, artifact.name):
+                    # The first part holding JSON is the verdict, the same part the background job picked
+                    part_json = parse_verdict(artifact, parsed.json) if json_data is None else None
+                    if part_json is not None:
+                        json_data = part_json
+                        st.subheader("JSON-Antwort")
+                        st.json(json_data)
+
+                    # Check if this part is a zip file
+                    elif artifact.is_zip:
+                        render_zip(f"Inhalte der Zip-Datei: {artifact.name}", f"Zip-Datei herunterladen: {artifact.name}", artifact, key, parsed)
+
+                    elif artifact.is_json and json_data is None:
+                        st.warning("Fehler beim Parsen von JSON")
+
+                    # Without a boundary the entire content is one artifact, which held no JSON either
+                    elif not boundary:
+                        st.warning("Die Antwort enthält keine gültige Zip-Datei")
+                        st.download_button(
+                            "Stattdessen rohe Antwort herunterladen",
+                            data=artifact.read_all,
+                            file_name="response.bin",
+                            on_click="ignore",
+                            key=f"{key}-raw",
+                        )
+
+            if not json_data:
+                st.warning("JSON Inhalte der Antwort konnten nicht korrekt geparsed werden")
+        except Exception as e:
+            st.warning(f"Die Antwort konnte nicht verarbeitet werden: {e}")
+
+        # ZIPs referenced in the JSON data, the first finished download first
+        for name, zip_artifact in referenced.items():
+            if isinstance(zip_artifact, Exception):
+                st.subheader(f"Zip-Datei: {name}")
+                st.error(f"Fehler beim Herunterladen oder Verarbeiten der Zip-Datei: {zip_artifact}")
+                continue
+            with record_render_time(render_times, zip_artifact.name):
+                render_zip(f"Zip-Datei: {name}", f"Download {name}", zip_artifact, key, parsed)
+    else:
+        # Handle JSON-only response
+        for artifact in artifacts:
+            with record_render_time(render_times, artifact.name):
+                json_data = parse_verdict(artifact, parsed.json)
+                if json_data is not None:
+                    st.subheader("JSON-Antwort")
+                    st.json(json_data)
+                else:
+                    st.error("JSON-Antwort konnte nicht korrekt geparsed werden")
+                    st.text(artifact.read().decode("utf-8", errors="replace"))
+
+    return json_data
+
+
+def render_job_progress(job):
+    """Show the live progress of a running background submission."""
+    progress = job.progress
+    st.write(f"**Fall {job.case_number}** ({job.stage}): {JOB_STATUS_LABELS[job.status]}")
+    # Aborts the upload or download right away, the job then finishes as cancelled
+    if st.button("Abbrechen", key=f"{job.id}-cancel"):
+        job.cancel()
+    if progress.upload_total:
+        uploaded = min(job.uploaded, progress.upload_total)
+        st.progress(uploaded / progress.upload_total, text=f"Upload: {format_size(uploaded)} von {format_size(progress.upload_total)}")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Zeit bis zum ersten Byte", f"{progress.ttfb:.1f} s" if progress.ttfb is not None else "–")
+    col2.metric("Empfangen", format_size(progress.downloaded))
+    col3.metric("Verarbeitete Teile", progress.parts)
+    if isinstance(job, ShardedJob):
+        render_shard_status(job)
+    if progress.referenced_total:
+        # Referenced ZIPs are downloaded concurrently and listed as they finish
+        referenced = dict(job.referenced)
+        st.progress(len(referenced) / progress.referenced_total, text=f"Referenzierte Zip-Dateien: {len(referenced)} von {progress.referenced_total}")
+        for name, artifact in referenced.items():
+            st.write(f"- {name}: {'fehlgeschlagen' if isinstance(artifact, Exception) else 'heruntergeladen'}")
+    # The verdict is available before the remaining result ZIPs have arrived
+    if job.json is not None:
+        st.json(job.json, expanded=False)
+
+
+def render_shard_status(job):
+    """List the status of each sub-request of a case that was split into shards."""
+    for index, shard in enumerate(job.shards, 1):
+        line = f"- Teil {index} von {len(job.shards)}: {JOB_STATUS_LABELS[shard.status]}, Upload {format_size(shard.progress.upload_total)}"
+        if shard.elapsed is not None:
+            line += f" in {shard.elapsed:.1f} s"
+        if shard.error is not None:
+            line += f" ({shard.error})"
+        st.write(line)
+
+
+def format_seconds(seconds):
+    return f"{seconds:.2f} s" if seconds is not None else "–"
+
+
+def format_throughput(bytes_per_second):
+    return f"{format_size(bytes_per_second)}/s" if bytes_per_second else "–"
+
+
+def render_diagnostics(metrics, render_times):
+    """Show where the time of a submission went, phase by phase."""
+    rows = [
+        ("ZIP-Erstellung", metrics.zip_build, None, None),
+        ("Upload", metrics.upload, metrics.upload_bytes, metrics.upload_throughput),
+        ("Serververarbeitung", metrics.server, None, None),
+        ("Zeit bis zum ersten Byte", metrics.ttfb, None, None),
+        ("Download", metrics.download, metrics.download_bytes, metrics.download_throughput),
+        ("Parsen", metrics.parse, None, None),
+        ("Referenzierte Zip-Dateien", metrics.referenced, metrics.referenced_bytes or None, None),
+        *((f"Anzeige: {name}", seconds, None, None) for name, seconds in render_times.items()),
+        ("Gesamt", metrics.total, None, None),
+    ]
+    with st.popover("Diagnose"):
+        st.table(
+            [
+                {"Phase": phase, "Dauer": format_seconds(seconds), "Daten": format_size(size) if size else "–", "Durchsatz": format_throughput(throughput)}
+                for phase, seconds, size, throughput in rows
+            ]
+        )
+
+
+def render_job_result(job):
+    """Show the results of a finished background submission and return the render time of each artifact."""
+    render_times = {}
+    if job.status == jobs.CANCELLED:
+        st.info("Die Anfrage wurde abgebrochen.")
+        return render_times
+    if job.status == jobs.FAILED:
+        if isinstance(job.error, ApiError):
+            st.error(f"Die Anfrage schlug mit Statuscode {job.error.status_code} fehl.")
+            st.text(job.error.text)
+        elif isinstance(job.error, DeadlineExceeded):
+            st.error(f"Zeitlimit überschritten: {job.error}")
+        else:
+            st.error(f"Die Anfrage konnte nicht gesendet werden: {job.error}")
+        render_diagnostics(job.metrics, render_times)
+        return render_times
+
+    if isinstance(job, ShardedJob):
+        failed = sum(shard.status == jobs.FAILED for shard in job.shards)
+        if failed:
+            st.warning(f"{failed} von {len(job.shards)} Teilanfragen sind fehlgeschlagen, das Ergebnis ist unvollständig.")
+        render_shard_status(job)
+    if job.from_cache:
+        # An identical submission was answered before, the API was not contacted again
+        st.info(f"Ergebnis aus dem lokalen Cache vom {datetime.fromtimestamp(job.cached_at):%d.%m.%Y %H:%M} Uhr.")
+    else:
+        retries = f", {job.attempts} Sendeversuche" if job.attempts > 1 else ""
+        st.caption(f"Upload {format_size(job.progress.upload_total)}, Antwort {format_size(job.progress.downloaded)} in {job.elapsed:.1f} s{retries}")
+    render_response(job.content_type, job.artifacts, job.referenced, key=job.id, parsed=get_parsed_result(job), render_times=render_times)
+    render_diagnostics(job.metrics, render_times)
+    return render_times
+
+
+PHASE_LABELS = {
+    "zip_build": "ZIP-Erstellung",
+    "upload": "Upload",
+    "server": "Serververarbeitung",
+    "ttfb": "Zeit bis zum ersten Byte",
+    "download": "Download",
+    "parse": "Parsen",
+    "referenced": "Referenzierte Zip-Dateien",
+    "total": "Gesamt",
+}
+
+
+def render_comparison(comparison):
+    """Show the latency percentiles and response sizes of the compared stages side by side, and how their verdicts differ."""
+    if comparison.error is not None:
+        st.error(f"Der Vergleich wurde abgebrochen: {comparison.error}")
+    summary = comparison.summary()
+    rows = []
+    for phase in COMPARED_PHASES:
+        cells = {stage: summary[stage].get(phase) for stage in comparison.stages}
+        if any(cells.values()):
+            rows.append({"Phase": PHASE_LABELS[phase], **{stage: f"{format_seconds(cell['p50'])} / {format_seconds(cell['p95'])}" if cell else "–" for stage, cell in cells.items()}})
+    for name, label in (("upload_bytes", "Upload"), ("download_bytes", "Antwort"), ("referenced_bytes", "Referenzierte Zip-Dateien")):
+        sizes = {stage: summary[stage].get(name, {}).get("p50") for stage in comparison.stages}
+        rows.append({"Phase": f"Größe: {label}", **{stage: format_size(size) if size else "–" for stage, size in sizes.items()}})
+    rows.append({"Phase": "Erfolgreich (fehlgeschlagen)", **{stage: f"{summary[stage]['runs']['count']} ({summary[stage]['runs']['failed']})" for stage in comparison.stages}})
+    st.caption("Dauer als Median / 95. Perzentil, Größen als Median")
+    st.table(rows)
+
+    for run in comparison.runs:
+        if not run.ok:
+            st.warning(f"{run.stage}, Durchgang {run.round + 1}: {run.error}")
+    reference = comparison.stages[0]
+    for stage, differences in comparison.verdict_differences().items():
+        if not differences:
+            st.success(f"Die JSON-Antwort von {stage} stimmt mit {reference} überein.")
+            continue
+        st.warning(f"Die JSON-Antwort von {stage} weicht an {len(differences)} Stellen von {reference} ab:")
+        st.table([{"Pfad": path, reference: json.dumps(expected, ensure_ascii=False), stage: json.dumps(actual, ensure_ascii=False)} for path, expected, actual in differences])
+
+
+def get_upload_digests(uploaded_files):
+    """Return the content hash of each upload, computed once per file instead of on every rerun."""
+    known = st.session_state.upload_digests
+    # Only the current uploads are kept, so removed files do not pile up
+    st.session_state.upload_digests = {
+        uploaded_file.file_id: known.get(uploaded_file.file_id) or content_hash(uploaded_file.getvalue()) for uploaded_file in uploaded_files
+    }
+    return [st.session_state.upload_digests[uploaded_file.file_id] for uploaded_file in uploaded_files]
+
+
+def get_parsed_result(job):
+    """Return the parsed form of a finished job's response, kept in the session across reruns."""
+    if job.id not in st.session_state.parsed_results:
+        st.session_state.parsed_results[job.id] = ParsedResult(get_artifact_processor())
+    return st.session_state.parsed_results[job.id]
+
+
 # --- Streamlit UI ---
 
 st.title("VAARHAFT API Demo")
 
 stage = st.selectbox(
     "Stage",
-    ("Production", "Dev", "Local"),
+    tuple(STAGES),
 )
 
-match stage:
-    case "Production":
-        API_URL = "https://api.vaarhaft.com/v2/fraudscanner"
-    case "Dev":
-        API_URL = "https://0nx6soggmd.execute-api.eu-central-1.amazonaws.com/dev/v2/fraudscanner"
-    case "Local":
-        API_URL = "http://127.0.0.1:9999/fraudScanner_v2"
-    case _:
-        st.error("Ungültige Stage ausgewählt. Bitte wählen Sie Prod, Dev oder Local.")
+API_URL = STAGES.get(stage)
+if API_URL is None:
+    st.error("Ungültige Stage ausgewählt. Bitte wählen Sie Prod, Dev oder Local.")
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session(stage):
+    # One pooled keep-alive session per stage, shared across reruns and browser sessions
+    return session.create_session(session.SessionConfig.from_env())
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    # Results of identical submissions are shared across reruns, sessions and restarts
+    return ResultCache()
+
+
+@st.cache_resource(show_spinner=False)
+def get_executor():
+    # Worker threads for background submissions of all sessions
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="fraudscanner")
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_log():
+    # Timings of all submissions, appended to one JSONL file per server
+    return MetricsLog()
+
+
+@st.cache_resource(show_spinner=False)
+def get_artifact_processor():
+    # Decodes result previews for all sessions, with one worker per core
+    return ArtifactProcessor()
+
+
+@st.cache_resource(show_spinner=False)
+def get_preflight_checker():
+    # Checks uploads of all sessions, with one worker process per core
+    return PreflightChecker()
+
+
+@st.cache_resource(show_spinner=False)
+def configure_memory_limit():
+    # Applied once per server process, before any response is received
+    return memory.configure_from_env()
+
+
+configure_memory_limit()
+http_session = get_http_session(stage)
+result_cache = get_result_cache()
+
+# Background submissions of this browser session, by job id
+if "jobs" not in st.session_state:
+    st.session_state.jobs = {}
+# Parsed verdicts, ZIP indexes and previews of the finished jobs, so reruns do not parse them again
+if "parsed_results" not in st.session_state:
+    st.session_state.parsed_results = {}
+# Stage comparisons of this browser session, by id
+if "comparisons" not in st.session_state:
+    st.session_state.comparisons = {}
+# Ids of the jobs whose timings have been written to the metrics log
+if "logged_metrics" not in st.session_state:
+    st.session_state.logged_metrics = set()
+# Content hashes of the uploaded files by file id, the keys of the preflight and thumbnail caches
+if "upload_digests" not in st.session_state:
+    st.session_state.upload_digests = {}
 
 
 # Custom headers input
@@ -67,501 +475,203 @@ custom_headers = {}
 #         if ":" in line:
 #             key, value = line.split(":", 1)
 #             custom_headers[key.strip()] = value.strip()
-custom_headers["x-api-key"] = API_KEY
-custom_headers["caseNumber"] = case_nr
-# Don't set Content-Type for file uploads as it will be set automatically by requests
+# Authorization, x-api-key, caseNumber and Content-Type are set by the client
+
+fraud_scanner = FraudScannerClient(API_URL, API_KEY, http_session=http_session)
 
 # Allow multiple files to be uploaded
 uploaded_files = st.file_uploader("Dateien auswählen", type=["jpg", "jpeg", "png", "heic", "webp", "pdf"], accept_multiple_files=True)
 # Preview uploaded files
 if uploaded_files:
+    upload_digests = get_upload_digests(uploaded_files)
+    # All files are checked before anything is sent, so a broken case costs no upload
+    # getvalue() returns the uploaded bytes themselves, getbuffer() would copy them
+    preflight_reports = get_preflight_checker().check(((uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files), upload_digests)
+    failed_reports = [report for report in preflight_reports if not report.ok]
+
     st.subheader("Vorschau der einzureichenden Dateien")
 
-    for i, uploaded_file in enumerate(uploaded_files):
+    for i, (uploaded_file, report, digest) in enumerate(zip(uploaded_files, preflight_reports, upload_digests)):
         col1, col2 = st.columns([1, 3])
-        if uploaded_file.name.lower().endswith(".pdf"):
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
 
         with col1:
             st.write(f"**Dateiname:** {uploaded_file.name}")
-            if uploaded_file.size > 1_000_000:
-                size_str = f"{uploaded_file.size / 1_000_000:.2f} mb"
-            elif uploaded_file.size > 1_000:
-                size_str = f"{uploaded_file.size / 1000:.1f} kb"
-            else:
-                size_str = f"{uploaded_file.size} bytes"
-            st.write(f"**Größe:** {size_str}")
+            st.write(f"**Größe:** {format_size(uploaded_file.size)}")
             if uploaded_file.name.lower().endswith(".pdf"):
-                st.write(f"**Seiten:** {len(pdf_reader.pages)}")
+                st.write(f"**Seiten:** {report.pages if report.pages is not None else 'unbekannt'}")
 
         with col2:
             # Preview based on file type
-            if uploaded_file.name.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".heic")):
-                image = Image.open(uploaded_file)
-                st.image(image, caption=uploaded_file.name, width=300)
-                # Reset file pointer after reading
-                uploaded_file.seek(0)
+            if not report.ok:
+                st.error("Datei fehlerhaft: " + "; ".join(report.problems))
+            elif uploaded_file.name.lower().endswith(IMAGE_EXTENSIONS):
+                # Thumbnails are cached by content hash, so reruns neither decode nor send the full image again
+                try:
+                    st.image(thumbnails.get_thumbnail(uploaded_file.getvalue(), digest=digest), caption=uploaded_file.name, width=300)
+                except Exception:
+                    # E.g. HEIC without a Pillow plugin; the file itself passed the checks
+                    st.info(f"Keine Vorschau für {report.kind}-Dateien verfügbar, die Datei ist gültig.")
             elif uploaded_file.name.lower().endswith(".pdf"):
                 try:
                     image = Image.open("resources/pdf-logo.png")
                     st.image(image, caption=uploaded_file.name, width=300)
-                    # Reset file pointer after reading
-                    uploaded_file.seek(0)
                 except Exception as e:
                     st.error(f"Fehler bei der PDF Vorschau: {e}")
             if i != len(uploaded_files) - 1:
                 st.write("---")
 
-    st.info("Bereit zum Upload!")
+    if failed_reports:
+        st.error(
+            f"{len(failed_reports)} von {len(preflight_reports)} Dateien sind fehlerhaft:\n\n"
+            + "\n".join(f"- **{report.name}:** {'; '.join(report.problems)}" for report in failed_reports)
+        )
+        send_anyway = st.checkbox("Trotzdem senden", value=False, help="Sendet den Fall auch mit fehlerhaften Dateien an die API.")
+    else:
+        send_anyway = True
+        st.info("Bereit zum Upload!")
+
+    force_resubmit = st.checkbox(
+        "Erneut senden",
+        value=False,
+        help="Ignoriert ein zwischengespeichertes Ergebnis für dieselben Dateien und dieselbe Fallnummer.",
+    )
+
+    split_case = st.checkbox(
+        "Große Fälle aufteilen",
+        value=False,
+        help="Sendet die Dateien in mehreren parallelen Teilanfragen mit derselben Fallnummer und führt die Ergebnisse zusammen.",
+    )
+    max_shard_mb = st.number_input("Maximale Größe je Teilanfrage (MB)", min_value=1, value=20, disabled=not split_case)
+
+    with st.expander("Zeitlimits und Wiederholungen"):
+        default_policy = DeadlinePolicy.from_env()
+        total_timeout = st.number_input("Zeitlimit für die gesamte Anfrage (s, 0 = keins)", min_value=0, value=int(default_policy.total_timeout))
+        retries = st.number_input(
+            "Wiederholungen bei vorübergehenden Fehlern",
+            min_value=0,
+            max_value=10,
+            value=default_policy.retries,
+            help="Bei Verbindungsfehlern und den Statuscodes 429, 502, 503 und 504 wird die Anfrage mit zufällig gestreuter Wartezeit erneut gesendet.",
+        )
+        hedge_after = st.number_input(
+            "Zweite Anfrage senden nach (s, 0 = nie)",
+            min_value=0.0,
+            value=float(default_policy.hedge_after),
+            help="Sendet den Fall mit derselben Fallnummer ein zweites Mal, wenn bis dahin keine Antwort eingetroffen ist. Die schnellere Antwort wird verwendet.",
+        )
+        policy = dataclasses.replace(default_policy, total_timeout=float(total_timeout), retries=int(retries), hedge_after=float(hedge_after))
 
     # Button to trigger upload & processing
     if st.button("Anfrage an die VAARHAFT API senden"):
         if not uploaded_files:
             st.error("Bitte mindestens eine Datei auswählen, bevor Sie die Anfrage senden.")
+        elif not send_anyway:
+            st.error("Bitte ersetzen Sie die fehlerhaften Dateien oder wählen Sie \"Trotzdem senden\".")
         else:
-            with st.spinner("Dateien werden verarbeitet und hochgeladen..."):
-                # Create a temporary zip file containing all uploaded files
-                with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as temp_zip_file:
-                    with zipfile.ZipFile(temp_zip_file.name, "w") as zip_file:
-                        for uploaded_file in uploaded_files:
-                            # Write each file to the zip
-                            zip_file.writestr(uploaded_file.name, uploaded_file.getvalue())
-
-                # Prepare headers
-                headers = {"Authorization": f"Bearer {API_KEY}"}
-                # if not use_default_headers and custom_headers:
-                #     headers.update(custom_headers)
-                headers.update(custom_headers)
-
-                # Open the zip file and send it to the API
-                with open(temp_zip_file.name, "rb") as f:
-                    files = {"file": (os.path.basename(temp_zip_file.name), f, "application/zip")}
-
-                    # Send POST request to API
-                    response = requests.post(API_URL, files=files, headers=headers)
-
-                # Clean up the temporary file
-                os.unlink(temp_zip_file.name)
-
-                # Process the response
-                if response.status_code == 200:
-                    st.success("Anfrage erfolgreich.")
-
-                    # Check if response is multipart or JSON
-                    content_type = response.headers.get("Content-Type", "")
-
-                    if "multipart/form-data" in content_type or "multipart/mixed" in content_type:
-                        # Handle multipart response (JSON + zip files)
-                        st.write("Multipart-Response erhalten")
-
-                        # First try to extract JSON data
-                        json_data = None
-                        try:
-                            # Try to parse the response content as text first
-                            content_str = response.text
-
-                            # Try to find JSON part in the multipart response
-                            import re
-
-                            # Look for Content-Type: application/json header followed by JSON content
-                            json_header_match = re.search(
-                                r"Content-Type:\s*application/json.*?\r\n\r\n(.*?)(?:\r\n--|--%)", content_str, re.DOTALL | re.IGNORECASE
-                            )
-
-                            if json_header_match:
-                                potential_json = json_header_match.group(1).strip()
-
-                                # Preprocess the JSON text to fix formatting issues
-                                processed_json = potential_json
-
-                                # Check if we need to add commas (if the JSON is formatted with newlines instead of commas)
-                                if "{\n" in processed_json or "}\n" in processed_json:
-                                    # Split by newlines and filter out empty lines
-                                    lines = [line.strip() for line in processed_json.split("\n") if line.strip()]
-
-                                    # Process each line
-                                    for line_idx in range(len(lines) - 1):
-                                        # If this line ends with a value (not { or [) and next line starts with a key (not } or ])
-                                        if (
-                                            lines[line_idx].endswith('"')
-                                            or lines[line_idx].endswith("}")
-                                            or lines[line_idx].endswith("]")
-                                            or lines[line_idx].endswith("true")
-                                            or lines[line_idx].endswith("false")
-                                            or lines[line_idx].endswith("null")
-                                            or any(lines[line_idx].endswith(str(n)) for n in range(10))
-                                        ):
-                                            if lines[line_idx + 1].strip().startswith('"') or lines[line_idx + 1].strip().startswith("}"):
-                                                # Add a comma if needed
-                                                if not lines[line_idx].endswith(","):
-                                                    lines[line_idx] = lines[line_idx] + ","
-
-                                    # Rejoin the lines
-                                    processed_json = "\n".join(lines)
-
-                                try:
-                                    # Try to parse with the original text first
-                                    import json
-
-                                    try:
-                                        json_data = json.loads(potential_json)
-                                    except json.JSONDecodeError:
-                                        # If that fails, try with the processed text
-                                        try:
-                                            # Remove any trailing commas before closing braces or brackets
-                                            processed_json = re.sub(r",\s*}", "}", processed_json)
-                                            processed_json = re.sub(r",\s*]", "]", processed_json)
-
-                                            # Try to parse the processed text
-                                            json_data = json.loads(processed_json)
-                                        except json.JSONDecodeError:
-                                            # If still failing, try a more aggressive approach: convert to a single line
-                                            single_line = re.sub(r"\n\s*", " ", processed_json)
-                                            # Add missing commas between key-value pairs
-                                            single_line = re.sub(r'"\s+("|\}|\])', '", \1', single_line)
-                                            # Remove any trailing commas before closing braces or brackets
-                                            single_line = re.sub(r",\s*}", "}", single_line)
-                                            single_line = re.sub(r",\s*]", "]", single_line)
-
-                                            json_data = json.loads(single_line)
-
-                                    st.subheader("JSON-Antwort")
-                                    st.json(json_data)
-                                except json.JSONDecodeError:
-                                    # Continue to next approach if this fails
-                                    pass
-
-                            # If the above approach failed, fall back to the original regex approach
-                            if not json_data:
-                                # Look for JSON-like content (starting with { and ending with })
-                                json_match = re.search(r"({.*})", content_str, re.DOTALL)
-                                if json_match:
-                                    potential_json = json_match.group(1)
-                                    try:
-                                        import json
-
-                                        json_data = json.loads(potential_json)
-                                        st.subheader("JSON-Antwort")
-                                        st.json(json_data)
-                                    except json.JSONDecodeError:
-                                        # Continue to next approach if this fails
-                                        pass
-
-                            # If regex approach failed, try direct parsing as fallback
-                            if not json_data:
-                                try:
-                                    json_data = response.json()
-                                    st.subheader("JSON-Antwort")
-                                    st.json(json_data)
-                                except Exception:
-                                    st.warning("JSON Inhalte der Antwort konnten nicht korrekt geparsed werden")
-                        except Exception:
-                            st.warning("Fehler bei der Verarbeitung der Multipart-Response")
-
-                        # Check if there are any zip files in the response
-                        # This assumes the API returns zip files as part of the JSON response
-                        # with URLs or base64 encoded content
-
-                        # Try to extract binary parts from multipart response
-                        try:
-                            # Check if we can find boundary in content-type header
-                            import re
-
-                            boundary_match = re.search(r"boundary=([^;]+)", content_type)
-
-                            if boundary_match:
-                                boundary = boundary_match.group(1).strip("\"'")
-
-                                # Split the content by boundary
-                                parts = response.content.split(f"--{boundary}".encode())
-
-                                # Process each part
-                                for i, part in enumerate(parts):
-                                    if i == 0 or not part or part.startswith(b"--"):  # Skip empty parts or end marker
-                                        continue
-
-                                    # Try to determine if this part is binary (zip) or text
-                                    # Look for Content-Type header in this part
-                                    part_header_end = part.find(b"\r\n\r\n")
-                                    if part_header_end > 0:
-                                        part_header = part[:part_header_end].decode("utf-8", errors="ignore")
-                                        part_body = part[part_header_end + 4 :]  # Skip the \r\n\r\n
-
-                                        # Check if this part contains JSON
-                                        if "application/json" in part_header.lower() or "text/json" in part_header.lower():
-                                            try:
-                                                part_text = part_body.decode("utf-8", errors="ignore")
-                                                import json
-
-                                                # Preprocess the JSON text to fix formatting issues
-                                                # Replace newlines between key-value pairs with commas
-                                                processed_text = part_text.strip()
-
-                                                # Check if we need to add commas (if the JSON is formatted with newlines instead of commas)
-                                                if "{\n" in processed_text or "}\n" in processed_text:
-                                                    # Split by newlines and filter out empty lines
-                                                    lines = [line.strip() for line in processed_text.split("\n") if line.strip()]
-
-                                                    # Process each line
-                                                    for line_idx in range(len(lines) - 1):
-                                                        # If this line ends with a value (not { or [) and next line starts with a key (not } or ])
-                                                        if (
-                                                            lines[line_idx].endswith('"')
-                                                            or lines[line_idx].endswith("}")
-                                                            or lines[line_idx].endswith("]")
-                                                            or lines[line_idx].endswith("true")
-                                                            or lines[line_idx].endswith("false")
-                                                            or lines[line_idx].endswith("null")
-                                                            or any(lines[line_idx].endswith(str(n)) for n in range(10))
-                                                        ):
-                                                            if lines[line_idx + 1].strip().startswith('"') or lines[line_idx + 1].strip().startswith(
-                                                                "}"
-                                                            ):
-                                                                # Add a comma if needed
-                                                                if not lines[line_idx].endswith(","):
-                                                                    lines[line_idx] = lines[line_idx] + ","
-
-                                                    # Rejoin the lines
-                                                    processed_text = "\n".join(lines)
-
-                                                # Try to parse with the original text first
-                                                try:
-                                                    part_json = json.loads(part_text)
-                                                except json.JSONDecodeError:
-                                                    # If that fails, try with the processed text
-                                                    try:
-                                                        # Remove any trailing commas before closing braces or brackets
-                                                        processed_text = re.sub(r",\s*}", "}", processed_text)
-                                                        processed_text = re.sub(r",\s*]", "]", processed_text)
-
-                                                        # Try to parse the processed text
-                                                        part_json = json.loads(processed_text)
-                                                    except json.JSONDecodeError:
-                                                        # If still failing, try a more aggressive approach: convert to a single line
-                                                        try:
-                                                            # Convert to a single line and fix common issues
-                                                            single_line = re.sub(r"\n\s*", " ", processed_text)
-                                                            # Add missing commas between key-value pairs
-                                                            single_line = re.sub(r'"\s+("|\}|\])', '", \1', single_line)
-                                                            # Remove any trailing commas before closing braces or brackets
-                                                            single_line = re.sub(r",\s*}", "}", single_line)
-                                                            single_line = re.sub(r",\s*]", "]", single_line)
-
-                                                            part_json = json.loads(single_line)
-                                                        except json.JSONDecodeError as e:
-                                                            raise e
-
-                                                # Store this as our json_data if we haven't found any yet
-                                                if not json_data:
-                                                    json_data = part_json
-                                                    st.subheader("JSON-Antwort")
-                                                    st.json(part_json)
-                                            except Exception:
-                                                st.warning("Fehler beim Parsen von JSON")
-
-                                        # Check if this part is a zip file
-                                        elif b"PK\x03\x04" in part_body[:10]:  # ZIP file signature
-                                            try:
-                                                with zipfile.ZipFile(io.BytesIO(part_body)) as zip_ref:
-                                                    # Use a unique subheader for each zip file
-                                                    zip_filename = f"FraudScanner_part{i}.zip"
-
-                                                    # Try to extract a more meaningful name from the Content-Disposition header if available
-                                                    content_disp_match = re.search(r'filename="([^"]+)"', part_header)
-                                                    if content_disp_match:
-                                                        zip_filename = content_disp_match.group(1)
-
-                                                    st.subheader(f"Inhalte der Zip-Datei: {zip_filename}")
-                                                    st.download_button(
-                                                        f"Zip-Datei herunterladen: {zip_filename}",
-                                                        data=part_body,
-                                                        file_name=zip_filename,
-                                                        on_click="ignore",
-                                                    )
-
-                                                    # Preview zip contents
-                                                    file_list = zip_ref.namelist()
-                                                    st.write("Inhalte:")
-                                                    for file_name in file_list:
-                                                        st.write(f"- {file_name}")
-
-                                                        # Preview images in the zip
-                                                        if file_name.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".heic")):
-                                                            with zip_ref.open(file_name) as file:
-                                                                image = Image.open(file)
-                                                                st.image(image, caption=file_name, width=300)
-                                                        # Preview PDFs in the zip
-                                                        elif file_name.lower().endswith(".pdf"):
-                                                            try:
-                                                                with zip_ref.open(file_name) as file:
-                                                                    image = Image.open("resources/pdf-logo.png")
-                                                                    st.image(image, caption=file_name, width=300)
-                                                                    # Create a temporary file to save the PDF
-                                                                    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_pdf:
-                                                                        temp_pdf.write(file.read())
-                                                                        temp_pdf_path = temp_pdf.name
-
-                                                                    # Read the PDF to get page count
-                                                                    pdf_reader = PyPDF2.PdfReader(temp_pdf_path)
-                                                                    st.write(f"PDF mit {len(pdf_reader.pages)} Seiten")
-
-                                                                    # Provide a download button for the PDF
-                                                                    with open(temp_pdf_path, "rb") as pdf_file:
-                                                                        pdf_bytes = pdf_file.read()
-                                                                        st.download_button(
-                                                                            f"Datei herunterladen: {file_name}",
-                                                                            data=pdf_bytes,
-                                                                            file_name=file_name,
-                                                                            mime="application/pdf",
-                                                                            on_click="ignore",
-                                                                        )
-
-                                                                    # Clean up the temporary file
-                                                                    os.unlink(temp_pdf_path)
-                                                            except Exception as e:
-                                                                st.warning(f"Fehler beim Anzeigen der PDF-Datei: {e}")
-                                                    st.write("---")
-                                            except zipfile.BadZipFile:
-                                                st.warning("Die Zip-Datei konnte nicht geöffnet werden")
-
-                            # Fallback: If we couldn't parse multipart properly, try the entire content as a zip
-                            if not boundary_match and response.content and not json_data:
-                                try:
-                                    # Try to treat the entire response as a zip file
-                                    with zipfile.ZipFile(io.BytesIO(response.content)) as zip_ref:
-                                        st.subheader("Inhalte der Zip-Datei")
-                                        st.download_button(
-                                            "Zip-Datei herunterladen",
-                                            data=response.content,
-                                            file_name="FraudScanner.zip",
-                                            on_click="ignore",
-                                        )
-
-                                        # Preview zip contents
-                                        file_list = zip_ref.namelist()
-                                        st.write("Inhalte:")
-                                        for file_name in file_list:
-                                            st.write(f"- {file_name}")
-
-                                            # Preview images in the zip
-                                            if file_name.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".heic")):
-                                                with zip_ref.open(file_name) as file:
-                                                    image = Image.open(file)
-                                                    st.image(image, caption=file_name, width=300)
-                                            # Preview PDFs in the zip
-                                            elif file_name.lower().endswith(".pdf"):
-                                                try:
-                                                    with zip_ref.open(file_name) as file:
-                                                        # Create a temporary file to save the PDF
-                                                        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_pdf:
-                                                            temp_pdf.write(file.read())
-                                                            temp_pdf_path = temp_pdf.name
-
-                                                        # Read the PDF to get page count
-                                                        pdf_reader = PyPDF2.PdfReader(temp_pdf_path)
-                                                        st.write(f"PDF with {len(pdf_reader.pages)} pages")
-
-                                                        # Provide a download button for the PDF
-                                                        with open(temp_pdf_path, "rb") as pdf_file:
-                                                            pdf_bytes = pdf_file.read()
-                                                            st.download_button(
-                                                                f"Download {file_name}",
-                                                                data=pdf_bytes,
-                                                                file_name=file_name,
-                                                                mime="application/pdf",
-                                                                on_click="ignore",
-                                                            )
-
-                                                        # Clean up the temporary file
-                                                        os.unlink(temp_pdf_path)
-                                                except Exception as e:
-                                                    st.warning(f"Fehler beim Anzeigen der PDF-Datei: {e}")
-                                            st.write("---")
-                                except zipfile.BadZipFile:
-                                    st.warning("Die Antwort enthält keine gültige Zip-Datei")
-                                    st.download_button(
-                                        "Stattdessen rohe Antwort herunterladen",
-                                        data=response.content,
-                                        file_name="response.bin",
-                                        on_click="ignore",
-                                    )
-                        except Exception:
-                            st.warning("Die Antwort konnte nicht verarbeitet werden")
-                            st.download_button(
-                                "Rohe Antwort herunterladen",
-                                data=response.content,
-                                file_name="response.bin",
-                                on_click="ignore",
-                            )
-
-                        # If JSON data contains references to zip files
-                        if json_data:
-                            # Check for common patterns in JSON that might indicate zip files
-                            for key, value in json_data.items():
-                                if isinstance(value, str) and value.endswith(".zip"):
-                                    # This could be a URL to a zip file
-                                    st.subheader(f"Zip-Datei: {key}")
-                                    try:
-                                        zip_response = requests.get(value, headers=headers)
-                                        if zip_response.status_code == 200:
-                                            st.download_button(
-                                                f"Download {key}",
-                                                data=zip_response.content,
-                                                file_name=f"{key}.zip",
-                                                on_click="ignore",
-                                            )
-
-                                            # Preview zip contents
-                                            with zipfile.ZipFile(io.BytesIO(zip_response.content)) as zip_ref:
-                                                file_list = zip_ref.namelist()
-                                                st.write("Inhalte:")
-                                                for file_name in file_list:
-                                                    st.write(f"- {file_name}")
-
-                                                    # Preview images in the zip
-                                                    if file_name.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".heic")):
-                                                        with zip_ref.open(file_name) as file:
-                                                            image = Image.open(file)
-                                                            st.image(image, caption=file_name, width=300)
-                                                    # Preview PDFs in the zip
-                                                    elif file_name.lower().endswith(".pdf"):
-                                                        try:
-                                                            with zip_ref.open(file_name) as file:
-                                                                # Create a temporary file to save the PDF
-                                                                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_pdf:
-                                                                    temp_pdf.write(file.read())
-                                                                    temp_pdf_path = temp_pdf.name
-
-                                                                # Read the PDF to get page count
-                                                                pdf_reader = PyPDF2.PdfReader(temp_pdf_path)
-                                                                st.write(f"PDF with {len(pdf_reader.pages)} pages")
-
-                                                                # Provide a download button for the PDF
-                                                                with open(temp_pdf_path, "rb") as pdf_file:
-                                                                    pdf_bytes = pdf_file.read()
-                                                                    st.download_button(
-                                                                        f"Download {file_name}",
-                                                                        data=pdf_bytes,
-                                                                        file_name=file_name,
-                                                                        mime="application/pdf",
-                                                                        on_click="ignore",
-                                                                    )
-                                                                # Clean up the temporary file
-                                                                os.unlink(temp_pdf_path)
-                                                        except Exception as e:
-                                                            st.warning(f"Fehler beim Anzeigen der PDF-Datei: {e}")
-                                                    st.write("---")
-                                    except Exception as e:
-                                        st.error(f"Fehler beim Herunterladen oder Verarbeiten der Zip-Datei: {e}")
-                    else:
-                        # Handle JSON-only response
-                        try:
-                            json_data = response.json()
-                            st.subheader("JSON-Antwort")
-                            st.json(json_data)
-                        except:
-                            st.error("JSON-Antwort konnte nicht korrekt geparsed werden")
-                            st.text(response.text)
-                else:
-                    st.error(f"Die Anfrage schlug mit Statuscode {response.status_code} fehl.")
-                    st.text(response.text)
+            # The submission runs in the background, so further cases can be sent while it is in flight
+            files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+            # The result cache keys reuse the hashes of the uploads; shards keep the bytes objects of their files
+            digests_by_data = {id(data): digest for (_, data), digest in zip(files, upload_digests)}
+            max_shard_bytes = max_shard_mb * 1024 * 1024
+            if split_case and sum(uploaded_file.size for uploaded_file in uploaded_files) > max_shard_bytes:
+                job = ShardedJob(
+                    fraud_scanner,
+                    files,
+                    case_nr,
+                    stage,
+                    max_bytes=max_shard_bytes,
+                    cache=result_cache,
+                    cache_key_for=lambda shard_files: ResultCache.key(stage, case_nr, shard_files, API_KEY, [digests_by_data[id(data)] for _, data in shard_files]),
+                    force=force_resubmit,
+                    extra_headers=custom_headers,
+                    policy=policy,
+                )
+            else:
+                job = SubmissionJob(
+                    fraud_scanner,
+                    files,
+                    case_nr,
+                    stage,
+                    cache=result_cache,
+                    cache_key=ResultCache.key(stage, case_nr, files, API_KEY, upload_digests),
+                    force=force_resubmit,
+                    extra_headers=custom_headers,
+                    policy=policy,
+                )
+            st.session_state.jobs[job.id] = job.start(get_executor())
+
+    with st.expander("Stages vergleichen"):
+        compare_stages = st.multiselect(
+            "Stages",
+            tuple(STAGES),
+            help="Sendet den Fall gleichzeitig an alle ausgewählten Stages. Die erste Stage ist die Referenz für den Vergleich der JSON-Antworten.",
+        )
+        compare_repeat = st.number_input("Durchgänge", min_value=1, max_value=100, value=5)
+        if st.button("Vergleich starten", disabled=len(compare_stages) < 2 or not send_anyway):
+            # Every stage gets its own pooled session, and the result cache is bypassed so that every round reaches the API
+            clients = {compare_stage: FraudScannerClient(STAGES[compare_stage], API_KEY, http_session=get_http_session(compare_stage)) for compare_stage in compare_stages}
+            files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+            comparison = Comparison(clients, files, case_nr, compare_repeat)
+            st.session_state.comparisons[comparison.id] = comparison.start(get_executor())
+
+# --- Submissions of this session ---
+
+if st.session_state.jobs:
+    st.subheader("Anfragen")
+
+    running_jobs = [job for job in st.session_state.jobs.values() if not job.done]
+
+    @st.fragment(run_every=1.0 if running_jobs else None)
+    def poll_running_jobs():
+        for job in running_jobs:
+            render_job_progress(job)
+        # Rerun the whole script once a job has finished, so its results are rendered
+        if any(job.done for job in running_jobs):
+            st.rerun()
+
+    poll_running_jobs()
+
+    finished_jobs = [job for job in st.session_state.jobs.values() if job.done]
+    for job in reversed(finished_jobs):
+        with st.expander(f"Fall {job.case_number} ({job.stage})", expanded=job is finished_jobs[-1]):
+            render_times = render_job_result(job)
+            # Each submission is logged once, with the render times of its first rendering
+            if job.id not in st.session_state.logged_metrics:
+                st.session_state.logged_metrics.add(job.id)
+                job.metrics.render = render_times
+                try:
+                    get_metrics_log().append(job.metrics)
+                except OSError as e:
+                    st.warning(f"Metriken konnten nicht gespeichert werden: {e}")
+            if st.button("Ergebnis entfernen", key=f"{job.id}-remove"):
+                if job.id in st.session_state.parsed_results:
+                    st.session_state.parsed_results.pop(job.id).close()
+                job.close()
+                del st.session_state.jobs[job.id]
+                st.rerun()
+
+# --- Stage comparisons of this session ---
+
+if st.session_state.comparisons:
+    st.subheader("Stage-Vergleiche")
+
+    running_comparisons = [comparison for comparison in st.session_state.comparisons.values() if not comparison.done]
+
+    @st.fragment(run_every=1.0 if running_comparisons else None)
+    def poll_running_comparisons():
+        for comparison in running_comparisons:
+            st.progress(
+                len(comparison.runs) / comparison.total,
+                text=f"Fall {comparison.case_number}: {len(comparison.runs)} von {comparison.total} Anfragen an {', '.join(comparison.stages)}",
+            )
+        if any(comparison.done for comparison in running_comparisons):
+            st.rerun()
+
+    poll_running_comparisons()
+
+    for comparison in reversed([comparison for comparison in st.session_state.comparisons.values() if comparison.done]):
+        with st.expander(f"Fall {comparison.case_number}: {' / '.join(comparison.stages)} ({comparison.repeat} Durchgänge)", expanded=True):
+            render_comparison(comparison)
+            if st.button("Vergleich entfernen", key=f"{comparison.id}-remove"):
+                del st.session_state.comparisons[comparison.id]
+                st.rerun()
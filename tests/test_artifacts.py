@@ -0,0 +1,94 @@
+import io
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import PyPDF2
+import pytest
+from PIL import Image
+
+from fraudscanner.artifacts import ArtifactProcessor, ParsedResult
+from fraudscanner.client import Artifact
+from fraudscanner.gallery import IMAGE, OTHER, PDF
+
+
+def _make_pdf(pages: int) -> bytes:
+    writer = PyPDF2.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(100, 100)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def _make_artifact() -> Artifact:
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(8):
+            image = io.BytesIO()
+            Image.new("RGB", (400 + i, 300), "blue").save(image, "JPEG")
+            archive.writestr(f"image_{i}.jpg", image.getvalue())
+        archive.writestr("report.pdf", _make_pdf(3))
+        archive.writestr("broken.png", b"not an image")
+        archive.writestr("notes.txt", b"text")
+    return Artifact("result.zip", "application/zip", output)
+
+
+def test_index_sorts_members_by_kind():
+    processor = ArtifactProcessor(max_workers=2)
+    with processor.index(_make_artifact()) as gallery:
+        assert [len(gallery.by_kind[kind]) for kind in (IMAGE, PDF, OTHER)] == [9, 1, 1]
+        assert len(gallery.items) == 10
+    processor.shutdown()
+
+
+def test_previews_are_prepared_in_parallel_and_in_order():
+    threads = set()
+    executor = ThreadPoolExecutor(max_workers=4)
+    processor = ArtifactProcessor(executor)
+    gallery = processor.index(_make_artifact(), page_size=20)
+
+    original_preview = gallery.preview
+    gallery.preview = lambda *args: threads.add(threading.get_ident()) or original_preview(*args)
+    previews = processor.previews(gallery, gallery.page(1), (50, 50))
+
+    assert [preview.name for preview in previews] == [info.filename for info in gallery.items]
+    assert len(threads) > 1
+    assert all(preview.thumbnail for preview in previews[:8])
+    assert previews[8].pages == 3
+    assert previews[9].error is not None
+    executor.shutdown()
+
+
+def test_parsed_result_prepares_each_preview_once():
+    processor = ArtifactProcessor(max_workers=2)
+    prepared = []
+    original_previews = processor.previews
+    processor.previews = lambda gallery, members, size: prepared.extend(members) or original_previews(gallery, members, size)
+    parsed = ParsedResult(processor)
+    artifact = _make_artifact()
+
+    gallery = parsed.gallery(artifact)
+    first = parsed.previews(artifact, gallery.items[:4])
+    again = parsed.previews(artifact, gallery.items[2:6])
+    assert parsed.gallery(artifact) is gallery
+    assert again[:2] == first[2:]
+    assert len(prepared) == 6
+
+    # Nothing is read from the artifact once it has been parsed
+    artifact.file = None
+    assert parsed.previews(artifact, gallery.items[:6])[0] is first[0]
+    parsed.close()
+    processor.shutdown()
+
+
+def test_parsed_result_memoizes_json_and_errors():
+    parsed = ParsedResult(ArtifactProcessor(max_workers=1))
+    verdict = Artifact("verdict.json", "application/json", io.BytesIO(b'{"score": 1,}'))
+    broken = Artifact("broken.zip", "application/zip", io.BytesIO(b"PK\x03\x04 truncated"))
+    assert parsed.json(verdict) == {"score": 1}
+    verdict.file = None
+    assert parsed.json(verdict) == {"score": 1}
+    for _ in range(2):
+        with pytest.raises(zipfile.BadZipFile):
+            parsed.gallery(broken)
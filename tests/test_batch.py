@@ -0,0 +1,89 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fraudscanner import batch
+from fraudscanner.batch import Case, RateLimiter, load_cases, run_batch, unique_name
+from fraudscanner.client import FraudScannerClient
+from fraudscanner.mockserver import MockConfig, MockServer, make_image
+from fraudscanner.preflight import PreflightChecker
+
+
+def _case(folder, *names):
+    folder.mkdir(parents=True)
+    for name in names:
+        (folder / name).write_bytes(make_image(16, False))
+    return folder
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    limiter = RateLimiter(per_minute=600)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: limiter.acquire(), range(4)))
+    assert time.monotonic() - started >= 0.29
+
+    unlimited = RateLimiter(None)
+    started = time.monotonic()
+    for _ in range(100):
+        unlimited.acquire()
+    assert time.monotonic() - started < 0.05
+
+
+def test_load_cases_from_folders(tmp_path):
+    _case(tmp_path / "Case 2", "b.pdf", "a.jpg")
+    _case(tmp_path / "Case 1", "c.png")
+    (tmp_path / "Case 1" / "notes.txt").write_text("ignored")
+    (tmp_path / "loose.jpg").write_bytes(b"not a case")
+    cases = list(load_cases(tmp_path))
+    assert [(case.case_number, [path.name for path in case.files]) for case in cases] == [("Case 1", ["c.png"]), ("Case 2", ["a.jpg", "b.pdf"])]
+
+
+def test_manifest_paths_are_relative_to_the_manifest(tmp_path, monkeypatch):
+    _case(tmp_path / "data" / "folder", "a.jpg")
+    _case(tmp_path / "data" / "single", "b.jpg", "c.jpg")
+    manifest = tmp_path / "data" / "cases.jsonl"
+    manifest.write_text(json.dumps({"caseNumber": 7, "path": "folder"}) + "\n\n" + json.dumps({"caseNumber": "X", "files": ["single/c.jpg"]}) + "\n")
+    monkeypatch.chdir(tmp_path)
+    cases = list(load_cases(manifest))
+    assert cases == [Case("7", [tmp_path / "data" / "folder" / "a.jpg"]), Case("X", [tmp_path / "data" / "single" / "c.jpg"])]
+
+
+def test_unique_name():
+    taken = set()
+    assert [unique_name(name, taken) for name in ["Case_1", "case_1", "Case_1", "result.zip", "result.zip"]] == ["Case_1", "case_1_2", "Case_1_3", "result.zip", "result_2.zip"]
+
+
+def test_run_batch_records_and_colliding_case_names(tmp_path):
+    cases = [Case("Case 1", [_case(tmp_path / "a", "a.jpg") / "a.jpg"]), Case("Case/1", [_case(tmp_path / "b", "b.jpg") / "b.jpg"]), Case("Empty", [])]
+    out = tmp_path / "out"
+    with MockServer(MockConfig(zips=1, images=1, image_size=16), port=0) as server:
+        records = {record["caseNumber"]: record for record in run_batch(FraudScannerClient(server.url, "key"), cases, out, workers=2)}
+
+    assert records["Case 1"]["status"] == records["Case/1"]["status"] == "ok"
+    assert records["Case 1"]["json"]["caseNumber"] == "Case 1"
+    assert {records["Case 1"]["artifacts"][0], records["Case/1"]["artifacts"][0]} == {"Case_1/result_0.zip", "Case_1_2/result_0.zip"}
+    assert records["Empty"]["status"] == "error" and "no supported files" in records["Empty"]["error"]
+    assert sorted(path.name for path in out.iterdir()) == ["Case_1", "Case_1_2"]
+
+
+def test_cases_failing_the_preflight_checks_are_not_sent(tmp_path):
+    folder = _case(tmp_path / "Case 1", "a.jpg", "b.pdf")
+    checker = PreflightChecker()
+    with MockServer(MockConfig(zips=0), port=0) as server:
+        [record] = run_batch(FraudScannerClient(server.url, "key"), [Case("Case 1", [folder / "a.jpg", folder / "b.pdf"])], tmp_path / "out", checker=checker)
+        assert next(server.posts) == 0
+    checker.shutdown()
+    assert record["status"] == "error" and "1 of 2 files failed the checks" in record["error"]
+    assert record["preflight"] == {"b.pdf": ["content is JPEG, not PDF as the extension says"]}
+
+
+def test_main_writes_results_and_fails_on_errors(tmp_path, monkeypatch):
+    _case(tmp_path / "cases" / "Case 1", "a.jpg")
+    (tmp_path / "cases" / "Case 2").mkdir()
+    with MockServer(MockConfig(zips=0), port=0) as server:
+        monkeypatch.setitem(batch.STAGES, "Local", server.url)
+        code = batch.main([str(tmp_path / "cases"), "--stage", "Local", "--api-key", "key", "--out", str(tmp_path / "out")])
+    assert code == 1
+    records = [json.loads(line) for line in (tmp_path / "out" / "results.jsonl").read_text().splitlines()]
+    assert sorted((record["caseNumber"], record["status"]) for record in records) == [("Case 1", "ok"), ("Case 2", "error")]
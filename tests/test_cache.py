@@ -0,0 +1,78 @@
+import io
+
+from PIL import Image
+
+from fraudscanner import thumbnails
+from fraudscanner.cache import LRUCache, content_hash
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_lru_evicts_by_byte_size():
+    cache = LRUCache(100, max_bytes=10)
+    for key in "abc":
+        cache.put(key, b"x" * 4)
+    assert len(cache) == 2 and cache.size == 8
+    assert cache.get("a") is None
+    # Replacing a value accounts for its new size only
+    cache.put("b", b"x" * 6)
+    assert len(cache) == 2 and cache.size == 10
+    # An entry larger than the whole budget is kept on its own
+    cache.put("d", b"x" * 20)
+    assert len(cache) == 1 and cache.size == 20
+
+
+def test_resize_applies_new_bounds_to_existing_entries():
+    cache = LRUCache(10)
+    for key in "abcd":
+        cache.put(key, b"x" * 4)
+    cache.resize(10, max_bytes=8)
+    assert [cache.get(key) is not None for key in "abcd"] == [False, False, True, True]
+    cache.resize(1)
+    assert len(cache) == 1 and cache.get("d") is not None
+
+
+def test_get_or_compute_computes_once():
+    cache = LRUCache(4)
+    calls = []
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "v") == "v"
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "w") == "v"
+    assert len(calls) == 1
+
+
+def test_thumbnails_are_keyed_by_content_and_size(monkeypatch):
+    thumbnails._cache.clear()
+    made = []
+    make_thumbnail = thumbnails.make_thumbnail
+    monkeypatch.setattr(thumbnails, "make_thumbnail", lambda data, size: made.append(size) or make_thumbnail(data, size))
+    image = io.BytesIO()
+    Image.new("RGB", (400, 300), "red").save(image, "JPEG")
+    data = image.getvalue()
+
+    first = thumbnails.get_thumbnail(data, (100, 100))
+    # The same content from another buffer hits the cache
+    assert thumbnails.get_thumbnail(memoryview(bytearray(data)), (100, 100)) is first
+    thumbnails.get_thumbnail(data, (50, 50))
+    assert made == [(100, 100), (50, 50)]
+    assert thumbnails._cache.get((content_hash(data), (50, 50))) is not None
+    with Image.open(io.BytesIO(first)) as thumbnail:
+        assert max(thumbnail.size) == 100
+
+
+def test_thumbnails_use_given_digest(monkeypatch):
+    thumbnails._cache.clear()
+    image = io.BytesIO()
+    Image.new("RGB", (400, 300), "red").save(image, "JPEG")
+    digest = content_hash(image.getvalue())
+    monkeypatch.setattr(thumbnails, "content_hash", None)
+    thumbnail = thumbnails.get_thumbnail(image.getvalue(), (100, 100), digest=digest)
+    assert thumbnails._cache.get((digest, (100, 100))) is thumbnail
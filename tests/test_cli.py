@@ -0,0 +1,52 @@
+import json
+import subprocess
+import sys
+
+from fraudscanner import cli
+from fraudscanner.mockserver import JSON, MockConfig, MockServer, make_image
+
+
+def test_cli_does_not_import_heavy_modules():
+    code = "import sys, fraudscanner.cli; print(sorted(m for m in ('streamlit', 'PIL', 'PyPDF2') if m in sys.modules))"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip() == "[]"
+
+
+def test_submit_prints_verdict_and_saves_results(tmp_path, capsys):
+    case = tmp_path / "case"
+    case.mkdir()
+    (case / "a.jpg").write_bytes(make_image(16, False))
+    (case / "notes.txt").write_text("not sent")
+    with MockServer(MockConfig(zips=1, images=2, image_size=32), port=0) as server:
+        code = cli.main([str(case), "--case-number", "Case 1", "--api-url", server.url, "--api-key", "key", "--out", str(tmp_path / "out"), "--previews", str(tmp_path / "previews")])
+    assert code == 0
+    verdict = json.loads(capsys.readouterr().out)
+    assert verdict["caseNumber"] == "Case 1"
+    assert [image["name"] for image in verdict["images"]] == ["a.jpg"]
+    assert [path.name for path in (tmp_path / "out" / "Case_1").iterdir()] == ["result_0.zip"]
+    assert len(list((tmp_path / "previews").iterdir())) == 2
+
+
+def test_paths_from_stdin_and_api_errors(tmp_path, monkeypatch, capsys):
+    photo = tmp_path / "a.jpg"
+    photo.write_bytes(b"jpeg")
+    monkeypatch.setattr(sys, "stdin", [f"{photo}\n", "\n"])
+    assert cli.collect_files(["-"]) == [photo]
+
+    with MockServer(MockConfig(mode=JSON), port=0) as server:
+        # The mock server rejects uploads without an API key
+        monkeypatch.setattr("fraudscanner.client.FraudScannerClient.headers", lambda self, case_number: {})
+        assert cli.main([str(photo), "--case-number", "Case 2", "--api-url", server.url, "--api-key", "key", "--no-preflight"]) == 1
+    assert "status code 403" in capsys.readouterr().err
+
+
+def test_broken_files_are_reported_before_sending(tmp_path, capsys):
+    (tmp_path / "a.jpg").write_bytes(make_image(16, False))
+    (tmp_path / "b.jpg").write_bytes(b"jpeg")
+    (tmp_path / "c.pdf").write_bytes(b"%PDF-1.4\n1 0 obj")
+    with MockServer(MockConfig(mode=JSON), port=0) as server:
+        assert cli.main([str(tmp_path), "--case-number", "Case 3", "--api-url", server.url, "--api-key", "key"]) == 1
+        assert next(server.posts) == 0
+    err = capsys.readouterr().err
+    assert "b.jpg: content is not a JPEG file" in err
+    assert "c.pdf: PDF is truncated" in err
+    assert "2 of 3 files failed the checks" in err
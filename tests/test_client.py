@@ -0,0 +1,58 @@
+import io
+import time
+
+from fraudscanner.client import ApiError, Artifact, FraudScannerClient, parse_artifacts, parse_verdict
+from fraudscanner.mockserver import BOUNDARY, make_multipart
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: bytes):
+        self.status_code = status_code
+        self.headers = {"Content-Type": "application/zip"}
+        self.text = body.decode()
+        self._body = body
+
+    def iter_content(self, chunk_size):
+        yield self._body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeSession:
+    """Answers ``https://host/<delay>/<status>.zip`` after ``delay`` seconds."""
+
+    def get(self, url, headers, stream):
+        delay, status = url.rsplit("/", 2)[-2:]
+        time.sleep(float(delay))
+        return FakeResponse(int(status.removesuffix(".zip")), f"PK\x03\x04{url}".encode())
+
+
+def test_download_all_yields_archives_as_they_finish():
+    client = FraudScannerClient("https://host/api", "key", http_session=FakeSession())
+    archives = [("slow", "https://host/0.3/200.zip"), ("failed", "https://host/0.1/404.zip"), ("fast", "https://host/0.0/200.zip")]
+
+    started = time.perf_counter()
+    results = list(client.download_all(archives, "Case 1"))
+    elapsed = time.perf_counter() - started
+
+    assert [key for key, _ in results] == ["fast", "failed", "slow"]
+    assert isinstance(results[1][1], ApiError) and results[1][1].status_code == 404
+    assert results[2][1].name == "slow.zip" and results[2][1].read().endswith(b"0.3/200.zip")
+    # Limited by the slowest download instead of the sum of all of them
+    assert elapsed < 0.38
+
+
+def test_verdict_is_the_first_part_holding_json():
+    body = make_multipart([("text/plain", None, b"OK"), ("text/plain", None, b'{"verdict": "ok",}'), ("application/zip", "r.zip", b"PK\x03\x04{}")])
+    artifacts = list(parse_artifacts(f"multipart/mixed; boundary={BOUNDARY}", [body]))
+    assert [parse_verdict(artifact) for artifact in artifacts] == [None, {"verdict": "ok"}, None]
+    # A JSON part is the verdict even if it is not an object
+    assert parse_verdict(Artifact("v.json", "application/json", io.BytesIO(b"42"))) == 42
+
+    # Without a boundary the verdict is found within the whole body
+    (artifact,) = parse_artifacts("multipart/mixed", [body.replace(b"OK", b"")])
+    assert parse_verdict(artifact) == {"verdict": "ok"}
@@ -0,0 +1,45 @@
+from fraudscanner.client import FraudScannerClient
+from fraudscanner.compare import Comparison, diff_verdicts, main
+from fraudscanner.mockserver import JSON, MockConfig, MockServer
+
+FILES = [("a.jpg", b"jpeg")]
+
+
+def test_diff_verdicts():
+    expected = {"score": 0.1, "images": [{"name": "a.jpg", "edited": False}], "verdict": "ok"}
+    actual = {"score": 0.2, "images": [{"name": "a.jpg", "edited": True}, {"name": "b.jpg"}], "verdict": "ok", "report": "url"}
+    assert diff_verdicts(expected, actual) == [
+        ("score", 0.1, 0.2),
+        ("images[0].edited", False, True),
+        ("images[1]", None, {"name": "b.jpg"}),
+        ("report", None, "url"),
+    ]
+    assert diff_verdicts(expected, expected) == []
+
+
+def test_stages_are_compared_side_by_side():
+    with MockServer(MockConfig(mode=JSON), port=0) as fast, MockServer(MockConfig(mode=JSON, delay=0.05, referenced=1), port=0) as slow:
+        clients = {"Production": FraudScannerClient(fast.url, "key"), "Dev": FraudScannerClient(slow.url, "key")}
+        comparison = Comparison(clients, FILES, "Case 1", repeat=3).run()
+
+    assert comparison.done and comparison.error is None
+    assert len(comparison.runs) == comparison.total == 6
+    summary = comparison.summary()
+    assert summary["Production"]["runs"] == {"count": 3, "failed": 0}
+    assert summary["Dev"]["total"]["p50"] > summary["Production"]["total"]["p50"]
+    assert summary["Dev"]["total"]["p95"] >= summary["Dev"]["total"]["p50"]
+    assert summary["Dev"]["download_bytes"]["p50"] > summary["Production"]["download_bytes"]["p50"]
+    (difference,) = comparison.verdict_differences()["Dev"]
+    assert difference[0] == "report_0"
+
+
+def test_command_line_fails_on_errors_and_regressions(tmp_path, capsys):
+    photo = tmp_path / "a.jpg"
+    photo.write_bytes(b"jpeg")
+    with MockServer(MockConfig(mode=JSON), port=0) as fast, MockServer(MockConfig(mode=JSON, delay=0.1), port=0) as slow:
+        args = [str(photo), "--case-number", "Case 2", "--stages", "Production", "Dev", "--repeat", "2", "--api-key", "key", "--url", f"Production={fast.url}"]
+        assert main([*args, "--url", f"Dev={fast.url}", "--out", str(tmp_path / "compare.jsonl")]) == 0
+        assert "Verdict Dev vs Production: no differences" in capsys.readouterr().out
+        assert main([*args, "--url", f"Dev={slow.url}", "--max-ratio", "1.5"]) == 1
+        assert "slower than Production" in capsys.readouterr().err
+    assert (tmp_path / "compare.jsonl").read_text().count("\n") == 1
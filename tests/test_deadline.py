@@ -0,0 +1,138 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fraudscanner import encoder, jobs
+from fraudscanner.client import ApiError, FraudScannerClient
+from fraudscanner.deadline import Deadline, DeadlineExceeded, DeadlinePolicy
+from fraudscanner.encoder import CompressionPolicy
+from fraudscanner.jobs import SubmissionJob
+from fraudscanner.mockserver import JSON, MockConfig, MockServer
+
+FILES = [("a.jpg", b"jpeg" * 1000)]
+FAST_RETRIES = DeadlinePolicy(retries=2, retry_backoff=0.01)
+
+
+def _wait(job, timeout=5.0):
+    started = time.monotonic()
+    while not job.done and time.monotonic() - started < timeout:
+        time.sleep(0.01)
+    return time.monotonic() - started
+
+
+def test_retry_delay_has_full_jitter_and_honors_retry_after():
+    policy = DeadlinePolicy(retry_backoff=1.0, max_retry_backoff=4.0)
+    rng = random.Random(0)
+    delays = [policy.retry_delay(attempt, rng=rng) for attempt in range(10) for _ in range(20)]
+    assert 0 <= min(delays) and max(delays) <= 4.0
+    assert len(set(delays)) == len(delays)
+    assert policy.retry_delay(0, retry_after=7, rng=rng) == 7
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv("FRAUDSCANNER_HEDGE_AFTER", "2.5")
+    monkeypatch.setenv("FRAUDSCANNER_SUBMIT_RETRIES", "5")
+    # Retries of the session do not change those of the submission
+    monkeypatch.setenv("FRAUDSCANNER_RETRIES", "7")
+    policy = DeadlinePolicy.from_env()
+    assert (policy.hedge_after, policy.retries, policy.total_timeout) == (2.5, 5, DeadlinePolicy().total_timeout)
+    assert Deadline().policy == policy
+
+
+def test_retryable_status_codes_are_retried():
+    with MockServer(MockConfig(mode=JSON, fail_first=2), port=0) as server:
+        result = FraudScannerClient(server.url, "key").submit(FILES, "Case 1", deadline=Deadline(FAST_RETRIES))
+        assert result.json["caseNumber"] == "Case 1"
+        assert next(server.posts) == 3
+
+    with MockServer(MockConfig(mode=JSON, fail_first=3), port=0) as server:
+        with pytest.raises(ApiError) as error:
+            FraudScannerClient(server.url, "key").submit(FILES, "Case 2", deadline=Deadline(FAST_RETRIES))
+    assert error.value.status_code == 502
+
+
+def test_other_errors_are_not_retried():
+    with MockServer(MockConfig(mode=JSON, fail_first=1, fail_status=400), port=0) as server:
+        with pytest.raises(ApiError):
+            FraudScannerClient(server.url, "key").submit(FILES, "Case 3", deadline=Deadline(FAST_RETRIES))
+        assert next(server.posts) == 1
+
+
+def test_slow_submission_is_hedged():
+    with MockServer(MockConfig(mode=JSON, first_delay=3.0), port=0) as server:
+        job = SubmissionJob(FraudScannerClient(server.url, "key"), FILES, "Case 4", "Local", policy=DeadlinePolicy(hedge_after=0.2))
+        started = time.monotonic()
+        job.run()
+    assert job.status == jobs.DONE
+    assert job.attempts == 2
+    assert time.monotonic() - started < 2.0
+
+
+def test_response_deadline_is_enforced():
+    with MockServer(MockConfig(mode=JSON, delay=2.0), port=0) as server:
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded) as error:
+            FraudScannerClient(server.url, "key").submit(FILES, "Case 5", deadline=Deadline(DeadlinePolicy(response_timeout=0.3, retries=0)))
+    assert error.value.phase == "response"
+    assert time.monotonic() - started < 1.5
+
+
+def test_upload_deadline_is_not_retried():
+    files = [("a.jpg", b"jpeg" * 1_000_000)]
+    with MockServer(MockConfig(mode=JSON), port=0) as server:
+        client = FraudScannerClient(server.url, "key")
+        body = client.upload_body(files)
+        body.chunk_size = 1024
+        # Every chunk takes a while, so the upload cannot finish within its time limit
+        iterate = body._iter_zip
+        body._iter_zip = lambda: (time.sleep(0.01) or chunk for chunk in iterate())
+        attempts = []
+        with pytest.raises(DeadlineExceeded) as error:
+            client.post_with_deadline(body, "Case 9", Deadline(DeadlinePolicy(upload_timeout=0.2, retries=2, retry_backoff=0.01)), on_attempt=attempts.append)
+    assert error.value.phase == "upload"
+    assert len(attempts) == 1
+
+
+@pytest.mark.parametrize("config", [MockConfig(mode=JSON, delay=3.0), MockConfig(zips=1, images=20, trickle_chunk=1024, trickle_interval=0.05)])
+def test_cancel_aborts_the_submission(config):
+    """Cancelled while waiting for the response, and while the response trickles in."""
+    with MockServer(config, port=0) as server, ThreadPoolExecutor(1) as executor:
+        job = SubmissionJob(FraudScannerClient(server.url, "key"), FILES, "Case 6", "Local").start(executor)
+        time.sleep(0.5)
+        job.cancel()
+        assert _wait(job) < 1.0
+        assert job.status == jobs.CANCELLED
+        job.close()
+
+
+def test_cancel_closes_the_connections_of_all_attempts():
+    """Neither the first nor the hedged attempt keeps waiting for its response after a cancel."""
+    with MockServer(MockConfig(mode=JSON, delay=4.0), port=0) as server, ThreadPoolExecutor(1) as executor:
+        job = SubmissionJob(FraudScannerClient(server.url, "key"), FILES, "Case 7", "Local", policy=DeadlinePolicy(hedge_after=0.2)).start(executor)
+        time.sleep(0.6)
+        assert job.attempts == 2
+        job.cancel()
+        assert _wait(job) < 1.0
+        started = time.monotonic()
+        while any(thread.name.startswith("post") for thread in threading.enumerate()) and time.monotonic() - started < 1.0:
+            time.sleep(0.01)
+        assert not [thread.name for thread in threading.enumerate() if thread.name.startswith("post")]
+        assert job.status == jobs.CANCELLED
+
+
+def test_upload_is_timed_from_the_answered_attempt(monkeypatch):
+    """Neither deflating the body nor the failed first attempt and its backoff count as upload time."""
+    deflate_block = encoder._deflate_block
+    monkeypatch.setattr(encoder, "_deflate_block", lambda *args: time.sleep(0.3) or deflate_block(*args))
+    files = [("notizen.txt", b"Hagelschaden am Fahrzeug.\n" * 1000)]
+    with MockServer(MockConfig(mode=JSON, fail_first=1), port=0) as server:
+        client = FraudScannerClient(server.url, "key", compression=CompressionPolicy())
+        job = SubmissionJob(client, files, "Case 8", "Local", policy=DeadlinePolicy())
+        monkeypatch.setattr(DeadlinePolicy, "retry_delay", lambda *args, **kwargs: 0.3)
+        job.run()
+    assert job.status == jobs.DONE and job.attempts == 2
+    assert job.metrics.zip_build >= 0.3
+    assert job.metrics.upload < 0.2 and job.metrics.ttfb < 0.2
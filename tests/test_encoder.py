@@ -0,0 +1,131 @@
+import io
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from fraudscanner import encoder
+from fraudscanner.encoder import STORED, CompressionPolicy, ZipUploadBody, sample_entropy
+
+FILES = [
+    ("photo.jpg", b"\xff\xd8\xff\xe0" + bytes(range(256)) * 700),
+    ("rechnung ä.pdf", b"%PDF-1.4\n" + b"0" * 5000 + b"\n%%EOF"),
+    ("empty.png", b""),
+]
+
+
+def _reference_request(files):
+    """Build the request body the way streamlit_app.py did with a temporary ZIP file and requests."""
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zip_file:
+        for name, data in files:
+            zip_file.writestr(name, data)
+    zip_buffer.seek(0)
+
+    prepared = requests.Request(
+        "POST",
+        "http://127.0.0.1:9999/fraudScanner_v2",
+        files={"file": ("upload.zip", zip_buffer, "application/zip")},
+    ).prepare()
+    date_time = zipfile.ZipFile(zip_buffer).infolist()[0].date_time
+    return prepared, date_time
+
+
+def test_body_matches_tempfile_zip_upload():
+    prepared, date_time = _reference_request(FILES)
+    boundary = prepared.headers["Content-Type"].split("boundary=")[1]
+
+    body = ZipUploadBody(FILES, boundary=boundary, date_time=date_time, chunk_size=1000)
+
+    assert body.content_type == prepared.headers["Content-Type"]
+    assert b"".join(body) == prepared.body
+    assert len(body) == len(prepared.body)
+    assert body.bytes_sent == len(prepared.body)
+
+
+def test_body_streams_slices_of_input_buffers():
+    body = ZipUploadBody(FILES, chunk_size=4096)
+    chunks = list(body)
+
+    data_chunks = [chunk for chunk in chunks if isinstance(chunk, memoryview)]
+    assert data_chunks
+    assert all(len(chunk) <= 4096 for chunk in data_chunks)
+
+
+def test_body_is_a_valid_zip_and_can_be_resent():
+    body = ZipUploadBody(FILES)
+    first, second = b"".join(body), b"".join(body)
+    assert first == second
+
+    start = first.index(b"PK\x03\x04")
+    end = first.rindex(f"\r\n--{body.boundary}--".encode())
+    with zipfile.ZipFile(io.BytesIO(first[start:end])) as zip_file:
+        assert zip_file.testzip() is None
+        assert [(info.filename, zip_file.read(info)) for info in zip_file.infolist()] == FILES
+
+
+def _archive(body: ZipUploadBody) -> zipfile.ZipFile:
+    data = b"".join(body)
+    assert len(data) == len(body)
+    return zipfile.ZipFile(io.BytesIO(data[data.index(b"PK\x03\x04") : data.rindex(f"\r\n--{body.boundary}--".encode())]))
+
+
+def test_policy_stores_photos_and_incompressible_data():
+    policy = CompressionPolicy()
+    text = b"Rechnung Nr. 4711, Betrag 120,00 EUR\n" * 1000
+    assert sample_entropy(os.urandom(100_000)) > 7.5 > sample_entropy(text)
+    assert policy.level_for("IMG_0001.JPG", text) == 0
+    assert policy.level_for("notes.txt", os.urandom(100_000)) == policy.level
+    assert policy.level_for("scan.pdf", text) == policy.level
+    assert policy.level_for("scan.pdf", os.urandom(100_000)) == 0
+    assert policy.level_for("scan.pdf", text[:100]) == 0
+    assert CompressionPolicy(level=0).level_for("notes.txt", text) == 0
+
+
+def test_compression_is_opt_in(monkeypatch):
+    monkeypatch.delenv("FRAUDSCANNER_COMPRESSION_LEVEL", raising=False)
+    assert CompressionPolicy.from_env() == STORED
+    monkeypatch.setenv("FRAUDSCANNER_COMPRESSION_LEVEL", "6")
+    monkeypatch.setenv("FRAUDSCANNER_COMPRESSION_WORKERS", "2")
+    assert CompressionPolicy.from_env() == CompressionPolicy(level=6, workers=2)
+
+
+def test_deflated_member_matches_zipfile():
+    files = [("rechnung.pdf", b"%PDF-1.4\n" + b"0 0 612 792 re f\n" * 2000)]
+    reference = io.BytesIO()
+    with zipfile.ZipFile(reference, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zip_file:
+        zip_file.writestr(*files[0])
+    date_time = zipfile.ZipFile(reference).infolist()[0].date_time
+
+    body = ZipUploadBody(files, date_time=date_time, compression=CompressionPolicy())
+    data = b"".join(body)
+    assert reference.getvalue() in data
+    assert body.zip_size == len(reference.getvalue()) < body.uncompressed_size
+
+
+def test_large_members_are_deflated_in_parallel_blocks(monkeypatch):
+    monkeypatch.setattr(encoder, "BLOCK_SIZE", 64 * 1024)
+    threads = set()
+    deflate_block = encoder._deflate_block
+    monkeypatch.setattr(encoder, "_deflate_block", lambda *args: threads.add(threading.get_ident()) or deflate_block(*args))
+    text = b"".join(b"Position %d: Reparatur Stossfaenger\n" % i for i in range(50_000))
+    files = [("bericht.pdf", text), ("IMG_0001.jpg", os.urandom(200_000)), ("empty.txt", b"")]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        body = ZipUploadBody(files, compression=CompressionPolicy(), executor=executor)
+    with _archive(body) as zip_file:
+        assert zip_file.testzip() is None
+        assert [(info.filename, zip_file.read(info)) for info in zip_file.infolist()] == files
+        assert [info.compress_type for info in zip_file.infolist()] == [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED, zipfile.ZIP_STORED]
+    assert len(threads) > 1
+    assert len(body) < len(text) / 5
+
+
+def test_uploaded_bytes_are_not_copied():
+    data = os.urandom(100_000)
+    upload = io.BytesIO(data)
+    body = ZipUploadBody([("IMG_0001.jpg", upload.getvalue())])
+    # Streamlit's UploadedFile is a BytesIO; getvalue() hands out the uploaded bytes and the body keeps a view of them
+    assert body._entries[0].data.obj is data
@@ -0,0 +1,42 @@
+import io
+import zipfile
+
+from PIL import Image
+
+from fraudscanner.gallery import ZipGallery
+
+
+def _make_zip(images: int) -> io.BytesIO:
+    image = io.BytesIO()
+    Image.new("RGB", (800, 600), "red").save(image, "PNG")
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        archive.writestr("report/", b"")
+        archive.writestr("summary.txt", b"ok")
+        archive.writestr("report.pdf", b"%PDF-1.4")
+        for i in range(images):
+            archive.writestr(f"image_{i:03d}.png", image.getvalue())
+    output.seek(0)
+    return output
+
+
+def test_pages_cover_all_previewable_members():
+    with ZipGallery(_make_zip(25), page_size=10) as gallery:
+        assert gallery.page_count == 3
+        assert [info.filename for info in gallery.others] == ["summary.txt"]
+        pages = [gallery.page(number) for number in range(1, 4)]
+        assert [len(page) for page in pages] == [10, 10, 6]
+        assert [info.filename for page in pages for info in page] == [info.filename for info in gallery.items]
+        assert gallery.page(99) == pages[-1]
+
+
+def test_only_members_of_the_shown_page_are_decompressed(monkeypatch):
+    gallery = ZipGallery(_make_zip(50), page_size=4)
+    read = []
+    original_read = gallery.zip.read
+    monkeypatch.setattr(gallery.zip, "read", lambda name: read.append(name) or original_read(name))
+
+    previews = [gallery.preview(info.filename, (100, 100)) for info in gallery.page(2)]
+    assert len(read) == 4
+    with Image.open(io.BytesIO(previews[0])) as preview:
+        assert max(preview.size) == 100
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from fraudscanner import jsonrepair
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1, "b": [1, 2]}', {"a": 1, "b": [1, 2]}),
+        ('{\n  "a": 1\n  "b": "x"\n  "c": true\n}', {"a": 1, "b": "x", "c": True}),
+        ('{"a": {"b": 1,}, "c": [1, 2,],}', {"a": {"b": 1}, "c": [1, 2]}),
+        ('[{"a": 1} {"a": 2}]', [{"a": 1}, {"a": 2}]),
+        ('{"a": 1,, "b": 2}', {"a": 1, "b": 2}),
+        ('{"text": "a, b }\\" c" "n": null}', {"text": 'a, b }" c', "n": None}),
+        ('response: {"a": 1} trailing garbage', {"a": 1}),
+        ('{"a": [1, 2', {"a": [1, 2]}),
+        ('{"a": "cut off', {"a": "cut off"}),
+        ('{"a": 1, "b":', {"a": 1, "b": None}),
+    ],
+)
+def test_loads_lenient_repairs(text, expected):
+    assert jsonrepair.loads_lenient(text) == expected
+
+
+def test_loads_lenient_keeps_valid_scalars():
+    assert jsonrepair.loads_lenient(" 42 ") == 42
+
+
+def test_loads_lenient_raises_without_json():
+    with pytest.raises(json.JSONDecodeError):
+        jsonrepair.loads_lenient("Internal Server Error")
+
+
+def test_repair_output_of_valid_json_is_equivalent():
+    data = {"images": [{"name": f"{i}.jpg", "score": i / 7, "flags": [True, None], "note": "a\\b \"q\""} for i in range(50)]}
+    assert json.loads(jsonrepair.repair(json.dumps(data, indent=2))) == data
@@ -0,0 +1,123 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from fraudscanner import memory, multipart, thumbnails
+from fraudscanner.client import Artifact
+
+# Submits a case to the mock server with the memory limit from the environment and
+# prints the peak RSS in kilobytes and the bytes received
+CLIENT = """
+import resource, sys
+from fraudscanner import memory
+from fraudscanner.artifacts import ArtifactProcessor
+from fraudscanner.client import FraudScannerClient
+
+memory.configure_from_env()
+processor = ArtifactProcessor(max_workers=2)
+with FraudScannerClient(sys.argv[1], "key").submit([("a.jpg", b"jpeg")], "Case 1") as result:
+    received = sum(artifact.size for artifact in result.artifacts)
+    for artifact in result.artifacts:
+        with processor.index(artifact, page_size=4) as gallery:
+            processor.previews(gallery, gallery.page(1))
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, received)
+"""
+
+
+@pytest.fixture(autouse=True)
+def restore_defaults():
+    yield
+    memory.configure(None)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("1048576", 1048576), ("512M", 512 * 1024**2), ("2GiB", 2 * 1024**3), ("1.5k", 1536), (" 64 mb ", 64 * 1024**2)],
+)
+def test_parse_size(value, expected):
+    assert memory.parse_size(value) == expected
+
+
+def test_parse_size_rejects_garbage():
+    with pytest.raises(ValueError):
+        memory.parse_size("a lot")
+
+
+def test_configure_lowers_spool_threshold_and_thumbnail_cache():
+    memory.configure(64 * 1024**2)
+    assert multipart.SPOOL_MAX_SIZE == 2 * 1024**2
+    assert thumbnails._cache.max_entries == 128
+    assert thumbnails._cache.max_bytes == 16 * 1024**2
+    # The spool threshold is read at call time
+    with multipart.spool([b"x" * (3 * 1024**2)]) as spooled:
+        assert spooled._rolled
+
+    memory.configure(None)
+    assert multipart.SPOOL_MAX_SIZE == multipart.DEFAULT_SPOOL_MAX_SIZE
+    assert thumbnails._cache.max_entries == thumbnails.CACHE_ENTRIES
+
+
+def test_configure_from_env(monkeypatch):
+    monkeypatch.setenv(memory.ENV_VARIABLE, "16M")
+    assert memory.configure_from_env() == 16 * 1024**2
+    assert multipart.SPOOL_MAX_SIZE == memory.MIN_SPOOL_SIZE * 2
+    monkeypatch.delenv(memory.ENV_VARIABLE)
+    assert memory.configure_from_env() is None
+    assert multipart.SPOOL_MAX_SIZE == multipart.DEFAULT_SPOOL_MAX_SIZE
+
+
+def test_part_bodies_are_streamed_as_views_into_the_buffer():
+    body = b"--b\r\nContent-Type: application/zip\r\n\r\n" + b"z" * 100_000 + b"\r\n--b--\r\n"
+    chunks = [body[i : i + 4096] for i in range(0, len(body), 4096)]
+    part = next(multipart.iter_parts(chunks, "b"))
+    views = part.iter_chunks()
+    first = next(views)
+    assert isinstance(first, memoryview)
+    size = len(first)
+    with multipart.spool(views) as spooled:
+        assert size + len(spooled.read()) == 100_000
+    # Views are released once the next chunk is requested
+    with pytest.raises(ValueError):
+        len(first)
+
+
+@pytest.mark.parametrize("max_size", [1 << 20, 16])
+def test_reads_keep_the_file_position(max_size):
+    """read_all(), is_zip and size do not seek, so they are safe while another thread reads the file."""
+    with Artifact("a.zip", "application/zip", multipart.spool([b"PK\x03\x04", b"data"], max_size=max_size)) as artifact:
+        artifact.file.seek(3)
+        assert artifact.read_all() == b"PK\x03\x04data"
+        assert artifact.is_zip
+        assert artifact.size == 8
+        assert artifact.file.tell() == 3
+
+    with tempfile.TemporaryFile() as file:
+        file.write(b"on disk")
+        assert Artifact("a.bin", "", file).read_all() == b"on disk"
+    assert Artifact("a.json", "", io.BytesIO(b"{}")).read_all() == b"{}"
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="ru_maxrss is in kilobytes on Linux only")
+def test_peak_rss_stays_under_the_limit_for_a_larger_response():
+    limit = 96 * 1024**2
+    server = subprocess.Popen(
+        [sys.executable, "-u", "-m", "fraudscanner.mockserver", "--port", "0", "--zips", "6", "--images", "20", "--image-size", "1024", "--noise"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        url = server.stdout.readline().split(" on ")[-1].strip()
+        env = {**os.environ, memory.ENV_VARIABLE: str(limit)}
+        output = subprocess.run([sys.executable, "-c", CLIENT, url], env=env, capture_output=True, text=True, check=True, timeout=120).stdout
+    finally:
+        server.terminate()
+        server.wait()
+
+    peak_kb, received = map(int, output.split())
+    # The response alone is larger than the limit, and each ZIP is below the default spool threshold
+    assert received > limit
+    assert peak_kb * 1024 < limit
@@ -0,0 +1,37 @@
+from fraudscanner.metrics import MetricsLog, SubmissionMetrics, percentile, prometheus_text, summarize
+
+
+def _record(stage, total, **kwargs):
+    return SubmissionMetrics(stage, "Case 1", status="done", total=total, upload=total / 2, upload_bytes=1000, render={"a.zip": 0.1}, **kwargs).as_record()
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert [percentile(values, q) for q in (50, 95, 99, 100)] == [50, 95, 99, 100]
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_log_roundtrip_and_summary(tmp_path):
+    log = MetricsLog(tmp_path / "metrics" / "metrics.jsonl")
+    for total in range(1, 21):
+        log.append(SubmissionMetrics("Dev", "Case 1", status="done", total=float(total)))
+    log.append(SubmissionMetrics("Dev", "Case 1", status="done", total=999.0, from_cache=True))
+    log.append(SubmissionMetrics("Dev", "Case 1", status="failed", total=999.0))
+
+    summary = summarize(log.read())
+    assert summary["Dev", "total"] == {"count": 20, "p50": 10.0, "p95": 19.0, "p99": 20.0}
+    assert ("Dev", "upload") not in summary
+
+
+def test_prometheus_histograms():
+    text = prometheus_text([_record("Dev", 0.2), _record("Dev", 7.0), _record("Production", 1.0)])
+    assert 'fraudscanner_phase_seconds_bucket{stage="Dev",phase="total",le="0.25"} 1' in text
+    assert 'fraudscanner_phase_seconds_bucket{stage="Dev",phase="total",le="+Inf"} 2' in text
+    assert 'fraudscanner_phase_seconds_sum{stage="Dev",phase="total"} 7.200000' in text
+    assert 'fraudscanner_phase_seconds_count{stage="Production",phase="render"} 1' in text
+
+
+def test_throughput():
+    metrics = SubmissionMetrics("Dev", "Case 1", upload_bytes=2_000_000, upload=2.0, download_bytes=10, download=None)
+    assert metrics.upload_throughput == 1_000_000
+    assert metrics.download_throughput is None
@@ -0,0 +1,39 @@
+import zipfile
+
+import pytest
+
+from fraudscanner.client import ApiError, FraudScannerClient
+from fraudscanner.mockserver import JSON, MockConfig, MockServer
+
+FILES = [("a.jpg", b"jpeg"), ("b.pdf", b"%PDF")]
+
+
+def test_multipart_response_with_malformed_verdict_and_referenced_zips():
+    config = MockConfig(zips=2, images=3, image_size=32, referenced=2, malformed_json=True)
+    with MockServer(config, port=0) as server:
+        client = FraudScannerClient(server.url, "key")
+        with client.submit(FILES, "Case 1") as result:
+            assert result.json["caseNumber"] == "Case 1"
+            assert [image["name"] for image in result.json["images"]] == ["a.jpg", "b.pdf"]
+            names = [artifact.name for artifact in result.artifacts]
+            # Referenced ZIPs are downloaded concurrently and appended as they finish
+            assert names[:2] == ["result_0.zip", "result_1.zip"]
+            assert sorted(names[2:]) == ["report_0.zip", "report_1.zip"]
+            for artifact in result.artifacts:
+                with zipfile.ZipFile(artifact.file) as archive:
+                    assert len(archive.namelist()) == 3
+        assert server.received_bytes > 0
+
+
+def test_json_response_trickled_slowly():
+    with MockServer(MockConfig(mode=JSON, trickle_chunk=16, trickle_interval=0.001), port=0) as server:
+        with FraudScannerClient(server.url, "key").submit(FILES, "Case 2") as result:
+            assert result.json["verdict"] == "ok"
+            assert result.artifacts == []
+
+
+def test_missing_api_key_is_rejected():
+    with MockServer(port=0) as server:
+        with pytest.raises(ApiError) as error:
+            FraudScannerClient(server.url, "").submit(FILES, "Case 3")
+    assert error.value.status_code == 403
@@ -0,0 +1,78 @@
+import pytest
+
+from fraudscanner import multipart
+from fraudscanner.multipart import MultipartError, get_boundary, iter_parts
+
+BOUNDARY = "b0undary"
+BODY = (
+    b"This is the preamble.\r\n"
+    b"--b0undary\r\n"
+    b"Content-Type: application/json\r\n"
+    b"\r\n"
+    b'{"score": 1}\r\n'
+    b"--b0undary  \r\n"
+    b'Content-Type: application/zip\r\nContent-Disposition: attachment; filename="result_0.zip"\r\n'
+    b"\r\n"
+    b"PK\x03\x04 zip data with --b0undar inside\r\n"
+    b"--b0undary--\r\n"
+    b"This is the epilogue.\r\n"
+)
+
+
+def _chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def _read(chunks) -> list[tuple[dict, bytes]]:
+    return [(part.headers, part.read()) for part in iter_parts(chunks, BOUNDARY)]
+
+
+def test_get_boundary():
+    assert get_boundary('multipart/mixed; boundary="b0undary"; charset=utf-8') == BOUNDARY
+    assert get_boundary("application/json") is None
+
+
+def test_preamble_epilogue_and_padding_are_skipped():
+    (json_headers, json_body), (zip_headers, zip_body) = _read([BODY])
+    assert json_headers == {"content-type": "application/json"}
+    assert json_body == b'{"score": 1}'
+    assert zip_headers["content-disposition"] == 'attachment; filename="result_0.zip"'
+    assert zip_body == b"PK\x03\x04 zip data with --b0undar inside"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 11, 64])
+def test_boundaries_and_headers_split_across_chunks(size):
+    """Every chunk size splits delimiters and header lines at different offsets."""
+    assert _read(_chunks(BODY, size)) == _read([BODY])
+
+
+def test_part_metadata():
+    parts = list(iter_parts([BODY], BOUNDARY))
+    assert [part.index for part in parts] == [1, 2]
+    assert parts[0].is_json and not parts[1].is_json
+    assert parts[1].filename == "result_0.zip"
+
+
+def test_unread_bodies_are_skipped():
+    parts = [part.content_type for part in iter_parts(_chunks(BODY, 5), BOUNDARY)]
+    assert parts == ["application/json", "application/zip"]
+
+
+@pytest.mark.parametrize(
+    ("data", "message"),
+    [
+        (BODY[: BODY.index(b"--b0undary--")], "Unexpected end of multipart body"),
+        (BODY[: BODY.index(b"PK\x03\x04") - 4], "Unexpected end of multipart headers"),
+        (b"no delimiter at all", "No multipart boundary found"),
+    ],
+)
+def test_truncated_bodies_raise(data, message):
+    with pytest.raises(MultipartError, match=message):
+        _read(_chunks(data, 16))
+
+
+def test_oversized_headers_raise(monkeypatch):
+    monkeypatch.setattr(multipart, "MAX_HEADER_SIZE", 64)
+    body = b"--b0undary\r\nX-Padding: " + b"x" * 200 + b"\r\n\r\nbody\r\n--b0undary--\r\n"
+    with pytest.raises(MultipartError, match="maximum size"):
+        _read(_chunks(body, 16))
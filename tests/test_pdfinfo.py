@@ -0,0 +1,122 @@
+import io
+import os
+import time
+import zlib
+
+import PyPDF2
+import pytest
+
+from fraudscanner import pdfinfo
+
+
+def _make_pdf(pages: int) -> bytes:
+    writer = PyPDF2.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(100, 100)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("pages", [1, 3, 40])
+def test_page_count_reads_page_tree(pages):
+    data = _make_pdf(pages)
+    assert pdfinfo._page_tree_count(data) == pages
+    assert pdfinfo.page_count(memoryview(data)) == pages
+
+
+def _assemble(objects: dict[int, bytes], xref_stream: bool = False, predictor: bool = False) -> bytes:
+    """A PDF of ``objects`` numbered 1 to n, with object 1 as catalog, indexed by a table or a stream."""
+    output = bytearray(b"%PDF-1.5\n")
+    offsets = {}
+    for number, body in objects.items():
+        offsets[number] = len(output)
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    start = len(output)
+    if not xref_stream:
+        output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1)
+        output += b"".join(b"%010d 00000 n \n" % offsets[number] for number in range(1, len(offsets) + 1))
+        output += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(offsets) + 1)
+    else:
+        number = len(offsets) + 1
+        offsets[number] = start
+        rows = [b"\x00\x00\x00\x00\x00\xff\xff"] + [b"\x01" + offsets[n].to_bytes(4, "big") + b"\x00\x00" for n in range(1, number + 1)]
+        params = b""
+        if predictor:
+            previous, encoded = bytes(7), []
+            for row in rows:
+                encoded.append(b"\x02" + bytes((a - b) & 0xFF for a, b in zip(row, previous)))
+                previous = row
+            rows, params = encoded, b" /DecodeParms << /Predictor 12 /Columns 7 >>"
+        stream = zlib.compress(b"".join(rows))
+        output += b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] /Root 1 0 R /Filter /FlateDecode%s /Length %d >>\nstream\n" % (
+            number,
+            number + 1,
+            params,
+            len(stream),
+        )
+        output += stream + b"\nendstream\nendobj\n"
+    output += b"startxref\n%d\n%%%%EOF\n" % start
+    return bytes(output)
+
+
+def _scan(size: int) -> dict[int, bytes]:
+    # A one-page scan: a large image stream, and the objects that lead to it
+    return {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        3: b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>",
+        4: b"<< /Length %d >>\nstream\n%s\nendstream" % (size, os.urandom(size)),
+    }
+
+
+@pytest.mark.parametrize(("xref_stream", "predictor"), [(False, False), (True, False), (True, True)])
+def test_page_count_follows_the_cross_reference(xref_stream, predictor):
+    data = _assemble(_scan(1000), xref_stream, predictor)
+    assert len(PyPDF2.PdfReader(io.BytesIO(data)).pages) == 1
+    assert pdfinfo._page_tree_count(data) == 1
+
+
+def test_large_pdf_is_counted_without_scanning_it(monkeypatch):
+    data = _assemble(_scan(32 * 1024 * 1024))
+    monkeypatch.setattr(pdfinfo, "_reader_count", None)
+    started = time.perf_counter()
+    assert pdfinfo.count_pages(memoryview(data)) == 1
+    assert time.perf_counter() - started < 0.05
+
+
+def test_incremental_update_wins():
+    data = _make_pdf(2)
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    pages = reader.trailer["/Root"].raw_get("/Pages").idnum
+    startxref = int(data[data.rindex(b"startxref") + 9 :].split()[0])
+    offset = len(data)
+    update = b"%d 0 obj\n<< /Type /Pages /Kids [] /Count 7 >>\nendobj\n" % pages
+    xref = offset + len(update)
+    update += b"xref\n%d 1\n%010d 00000 n \ntrailer\n<< /Size %d /Root %d 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n" % (
+        pages,
+        offset,
+        reader.trailer["/Size"],
+        reader.trailer.raw_get("/Root").idnum,
+        startxref,
+        xref,
+    )
+    assert pdfinfo._page_tree_count(data + update) == 7
+
+
+def test_broken_cross_reference_falls_back_to_reader():
+    data = _make_pdf(3)
+    broken = data[: data.rindex(b"startxref")] + b"startxref\n12\n%%EOF\n"
+    assert pdfinfo._page_tree_count(broken) is None
+    assert pdfinfo.count_pages(broken) == 3
+
+
+def test_page_count_falls_back_to_reader_without_page_tree(monkeypatch):
+    data = _make_pdf(2)
+    monkeypatch.setattr(pdfinfo, "_page_tree_count", lambda data: None)
+    assert pdfinfo.count_pages(data) == 2
+
+
+def test_unreadable_pdf_raises():
+    with pytest.raises(pdfinfo.PdfInfoError):
+        pdfinfo.count_pages(b"%PDF-1.4 truncated")
@@ -0,0 +1,102 @@
+import io
+import struct
+
+import PyPDF2
+import pytest
+from PIL import Image
+
+from fraudscanner import preflight
+from fraudscanner.cache import content_hash
+from fraudscanner.preflight import PreflightChecker, check_file
+
+
+def _image(format: str) -> bytes:
+    output = io.BytesIO()
+    Image.effect_noise((128, 96), 64).convert("RGB").save(output, format)
+    return output.getvalue()
+
+
+def _pdf(pages: int = 2) -> bytes:
+    writer = PyPDF2.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(100, 100)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+HEIC = _box(b"ftyp", b"heic\x00\x00\x00\x00mif1heic") + _box(b"meta", b"\x00" * 32) + _box(b"mdat", b"\x01" * 200)
+JPEG = _image("JPEG")
+PNG = _image("PNG")
+PDF = _pdf()
+
+
+@pytest.mark.parametrize(
+    "name, data, problem",
+    [
+        ("photo.jpg", JPEG, None),
+        ("screenshot.png", PNG, None),
+        ("photo.webp", _image("WEBP"), None),
+        ("photo.heic", HEIC, None),
+        ("invoice.pdf", PDF, None),
+        ("photo.jpg", JPEG[: len(JPEG) // 2], "truncated"),
+        ("screenshot.png", PNG[:50] + bytes([PNG[50] ^ 0xFF]) + PNG[51:], "bad header checksum"),
+        ("screenshot.jpg", PNG, "content is PNG, not JPEG"),
+        ("photo.heic", HEIC[:-50], "truncated"),
+        ("clip.heic", _box(b"ftyp", b"msf1\x00\x00\x00\x00") + _box(b"mdat", b""), "sequences"),
+        ("photo.heic", _box(b"ftyp", b"heic\x00\x00\x00\x00") + _box(b"mdat", b"\x01"), "missing meta"),
+        ("invoice.pdf", PDF[:-200], "truncated"),
+        ("invoice.pdf", PDF.replace(b"startxref", b"startxref\n1"), "cross-reference"),
+        ("invoice.pdf", b"just text", "not a PDF"),
+        ("empty.jpg", b"", "empty"),
+        ("animation.gif", b"GIF89a", "unsupported file type"),
+    ],
+)
+def test_check_file(name, data, problem):
+    report = check_file(name, data)
+    if problem is None:
+        assert report.ok, report.problems
+    else:
+        assert any(problem in message for message in report.problems), report.problems
+
+
+def test_pdf_report_has_page_count():
+    assert check_file("invoice.pdf", _pdf(3)).pages == 3
+
+
+def test_checker_reports_all_files_in_order_and_memoizes(monkeypatch):
+    preflight._cache.clear()
+    files = [("a.jpg", JPEG), ("b.png", JPEG), ("c.pdf", PDF[:-200]), ("d.pdf", PDF)]
+    checker = PreflightChecker(max_workers=2, inline_max_bytes=0)
+    reports = checker.check(files)
+    assert [report.name for report in reports] == ["a.jpg", "b.png", "c.pdf", "d.pdf"]
+    assert [report.ok for report in reports] == [True, False, False, True]
+
+    # Known contents are not checked again, also under another name
+    monkeypatch.setattr(preflight, "check_file", None)
+    checker.executor.shutdown()
+    again = checker.check([("renamed.jpg", JPEG), ("c.pdf", PDF[:-200])])
+    assert [(report.name, report.ok) for report in again] == [("renamed.jpg", True), ("c.pdf", False)]
+
+
+def test_small_cases_are_checked_without_a_process_pool():
+    preflight._cache.clear()
+    checker = PreflightChecker(max_workers=2)
+    reports = checker.check([("a.jpg", JPEG), ("b.pdf", PDF), ("c.pdf", PDF[:-200])])
+    assert [report.ok for report in reports] == [True, True, False]
+    assert checker._executor is None
+    checker.shutdown()
+
+
+def test_checker_uses_given_digests(monkeypatch):
+    preflight._cache.clear()
+    digest = content_hash(JPEG)
+    monkeypatch.setattr(preflight, "content_hash", None)
+    checker = PreflightChecker(max_workers=1)
+    assert checker.check([("a.jpg", JPEG)], [digest])[0].ok
+    assert preflight._cache.get((".jpg", digest)) is not None
+    checker.shutdown()
@@ -0,0 +1,64 @@
+import io
+
+from fraudscanner.cache import content_hash
+from fraudscanner.client import Artifact
+from fraudscanner.resultcache import ResultCache
+
+FILES = [("a.jpg", b"jpeg"), ("b.pdf", b"%PDF")]
+
+
+def _store(cache, key, body=b"--B\r\n\r\n{}\r\n--B--\r\n"):
+    writer = cache.writer(key, "multipart/mixed; boundary=B")
+    assert b"".join(writer.tee([body[:5], body[5:]])) == body
+    writer.add_referenced("report", Artifact("report.zip", "application/zip", io.BytesIO(b"PK\x03\x04zip")))
+    writer.commit()
+
+
+def test_key_depends_on_content_but_not_order():
+    key = ResultCache.key("Dev", "Case 1", FILES, "secret")
+    assert key == ResultCache.key("Dev", "Case 1", list(reversed(FILES)), "secret")
+    assert key != ResultCache.key("Production", "Case 1", FILES, "secret")
+    assert key != ResultCache.key("Dev", "Case 1", [("a.jpg", b"other"), FILES[1]], "secret")
+    assert key != ResultCache.key("Dev", "Case 1", FILES, "other key")
+    # Given digests, the file contents are not hashed again
+    digests = [content_hash(data) for _, data in FILES]
+    assert key == ResultCache.key("Dev", "Case 1", [(name, None) for name, _ in FILES], "secret", digests)
+
+
+def test_roundtrip(tmp_path):
+    cache = ResultCache(tmp_path)
+    _store(cache, "k")
+
+    cached = cache.get("k")
+    assert cached.content_type == "multipart/mixed; boundary=B"
+    assert b"".join(cached.iter_chunks(4)) == b"--B\r\n\r\n{}\r\n--B--\r\n"
+    with cached.open_referenced("report") as artifact:
+        assert artifact.read() == b"PK\x03\x04zip"
+    assert cached.open_referenced("missing") is None
+
+
+def test_incomplete_or_discarded_response_is_not_stored(tmp_path):
+    cache = ResultCache(tmp_path)
+    writer = cache.writer("k", "application/json")
+    next(writer.tee(iter([b"{", b"}"])))
+    writer.discard()
+    assert cache.get("k") is None
+    assert [path.name for path in tmp_path.iterdir()] == ["index.sqlite3"]
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = ResultCache(tmp_path, ttl=-1)
+    _store(cache, "k")
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=100)
+    _store(cache, "old", b"x" * 40)
+    _store(cache, "new", b"y" * 40)
+    assert cache.get("old") is not None
+
+    _store(cache, "newest", b"z" * 40)
+    assert cache.get("new") is None
+    assert cache.get("old") is not None
+    assert cache.get("newest") is not None
@@ -0,0 +1,42 @@
+from fraudscanner.session import SessionConfig, SubmitHTTPAdapter, TimeoutHTTPAdapter, create_retry, create_session, mount_submit_adapter
+
+
+def test_config_from_env(monkeypatch):
+    monkeypatch.setenv("FRAUDSCANNER_READ_TIMEOUT", "12.5")
+    monkeypatch.setenv("FRAUDSCANNER_POOL_MAXSIZE", "16")
+    monkeypatch.setenv("FRAUDSCANNER_RETRIES", "")
+    config = SessionConfig.from_env()
+    assert (config.read_timeout, config.pool_maxsize) == (12.5, 16)
+    assert config.retries == SessionConfig().retries
+    assert config.timeout == (SessionConfig().connect_timeout, 12.5)
+
+
+def test_retry_never_resubmits_posts():
+    retry = create_retry(SessionConfig(retries=4, backoff_factor=0.1))
+    assert (retry.total, retry.connect, retry.read, retry.status) == (4, 4, 4, 4)
+    assert retry.backoff_factor == 0.1
+    assert set(retry.status_forcelist) == {429, 502, 503, 504}
+    assert "GET" in retry.allowed_methods and "POST" not in retry.allowed_methods
+    assert retry.respect_retry_after_header and not retry.raise_on_status
+
+
+def test_session_mounts_pooled_adapter_with_default_timeout():
+    session = create_session(SessionConfig(pool_maxsize=3, connect_timeout=2.0, read_timeout=5.0))
+    adapter = session.get_adapter("https://example.com/")
+    assert isinstance(adapter, TimeoutHTTPAdapter)
+    assert adapter.timeout == (2.0, 5.0)
+    assert adapter._pool_maxsize == 3
+    assert session.get_adapter("http://127.0.0.1/") is adapter
+
+
+def test_submit_adapter_sends_posts_once():
+    session = create_session(SessionConfig(pool_maxsize=3, connect_timeout=2.0, read_timeout=5.0))
+    mount_submit_adapter(session, "https://example.com/api")
+    adapter = session.get_adapter("https://example.com/api")
+    assert isinstance(adapter, SubmitHTTPAdapter)
+    assert adapter.max_retries.total == 0
+    assert (adapter.timeout, adapter._pool_maxsize) == ((2.0, 5.0), 3)
+    # Downloads keep the retrying adapter, and mounting again keeps the pooled connections
+    assert not isinstance(session.get_adapter("https://example.com/results/1.zip"), SubmitHTTPAdapter)
+    mount_submit_adapter(session, "https://example.com/api")
+    assert session.get_adapter("https://example.com/api") is adapter
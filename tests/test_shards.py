@@ -0,0 +1,121 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fraudscanner import jobs, shards
+from fraudscanner.client import FraudScannerClient
+from fraudscanner.deadline import DeadlinePolicy
+from fraudscanner.jobs import ShardedJob
+from fraudscanner.mockserver import JSON, MockConfig, MockServer
+from fraudscanner.resultcache import ResultCache
+
+FILES = [("a.jpg", b"a" * 1000), ("b.jpg", b"b" * 1000)]
+NO_RETRIES = DeadlinePolicy(retries=0)
+
+
+def _run(server, files=FILES, executor=None, **kwargs):
+    job = ShardedJob(FraudScannerClient(server.url, "key"), files, "Case 1", "Local", max_bytes=1000, policy=NO_RETRIES, **kwargs)
+    # One worker sends the shards in order, so that the server's failures hit the first ones
+    with executor or ThreadPoolExecutor(max_workers=1) as pool:
+        job.start(pool)
+    return job
+
+
+def test_plan_shards_bounds_size_and_keeps_order():
+    files = [(f"{i}.jpg", b"x" * size) for i, size in enumerate([40, 30, 50, 120, 10, 10])]
+    planned = shards.plan_shards(files, max_bytes=100)
+    assert [[name for name, _ in shard] for shard in planned] == [["0.jpg", "1.jpg"], ["2.jpg"], ["3.jpg"], ["4.jpg", "5.jpg"]]
+    assert shards.plan_shards(files, max_bytes=1000) == [files]
+
+
+def test_merge_verdicts():
+    merged = shards.merge_verdicts(
+        [
+            {"caseNumber": "C1", "verdict": "ok", "images": [{"name": "a.jpg"}], "summary": {"count": 1, "model": "v2"}},
+            None,
+            {"caseNumber": "C1", "verdict": "suspicious", "images": [{"name": "b.jpg"}], "summary": {"count": 1, "model": "v2"}},
+        ]
+    )
+    assert merged == {
+        "caseNumber": "C1",
+        "verdict": ["ok", "suspicious"],
+        "images": [{"name": "a.jpg"}, {"name": "b.jpg"}],
+        "summary": {"count": 1, "model": "v2"},
+    }
+    assert shards.merge_verdicts([None]) is None
+
+
+def test_sharded_job_keeps_the_results_of_the_shards_that_succeeded():
+    with MockServer(MockConfig(mode=JSON, fail_first=1, fail_status=400), port=0) as server:
+        job = _run(server)
+    assert [shard.status for shard in job.shards] == [jobs.FAILED, jobs.DONE]
+    assert job.status == jobs.DONE
+    assert job.error is job.shards[0].error
+    assert [image["name"] for image in job.json["images"]] == ["b.jpg"]
+
+    with MockServer(MockConfig(mode=JSON, fail_first=2, fail_status=400), port=0) as server:
+        job = _run(server)
+    assert job.status == jobs.FAILED
+    assert job.json is None
+
+
+def test_cancel_stops_all_shards():
+    with MockServer(MockConfig(mode=JSON, delay=3.0), port=0) as server:
+        job = ShardedJob(FraudScannerClient(server.url, "key"), FILES, "Case 1", "Local", max_bytes=1000, policy=NO_RETRIES)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            job.start(pool)
+            while not job.shards[0].attempts:
+                time.sleep(0.01)
+            started = time.monotonic()
+            job.cancel()
+        assert time.monotonic() - started < 2.0
+    # The queued shard never sends its upload
+    assert [shard.attempts for shard in job.shards] == [1, 0]
+    assert [shard.status for shard in job.shards] == [jobs.CANCELLED, jobs.CANCELLED]
+    assert job.status == jobs.CANCELLED
+
+
+def test_sharded_job_renames_the_results_of_each_shard():
+    with MockServer(MockConfig(zips=1, images=1, image_size=8, referenced=1), port=0) as server:
+        job = _run(server, executor=ThreadPoolExecutor(max_workers=2))
+    assert job.status == jobs.DONE
+    assert [artifact.name for artifact in job.artifacts] == ["verdict.json", "teil1_result_0.zip", "teil2_result_0.zip"]
+    assert job.artifacts[0].json() == job.json
+    assert {image["name"] for image in job.json["images"]} == {"a.jpg", "b.jpg"}
+    assert {key: artifact.name for key, artifact in job.referenced.items()} == {
+        "report_0 (Teil 1)": "teil1_report_0.zip",
+        "report_0 (Teil 2)": "teil2_report_0.zip",
+    }
+    job.close()
+
+    with MockServer(MockConfig(zips=1, images=1, image_size=8, referenced=1), port=0) as server:
+        job = _run(server, files=FILES[:1])
+    assert [artifact.name for artifact in job.artifacts] == ["verdict.json", "result_0.zip"]
+    assert list(job.referenced) == ["report_0"]
+    job.close()
+
+
+def test_sharded_job_serves_each_shard_from_the_result_cache(tmp_path):
+    cache = ResultCache(tmp_path)
+    cache_key_for = lambda files: ResultCache.key("Local", "Case 1", files)  # noqa: E731
+    with MockServer(MockConfig(mode=JSON), port=0) as server:
+        first = _run(server, files=FILES[:1], cache=cache, cache_key_for=cache_key_for)
+        assert not first.from_cache
+        job = _run(server, cache=cache, cache_key_for=cache_key_for)
+        # Only the shard that was not sent before is uploaded
+        assert [shard.from_cache for shard in job.shards] == [True, False]
+        assert not job.from_cache
+        again = _run(server, cache=cache, cache_key_for=cache_key_for)
+        assert again.from_cache
+        assert next(server.posts) == 2
+    assert again.json == job.json
+
+
+def test_sharded_job_merges_the_metrics_of_its_shards():
+    with MockServer(MockConfig(mode=JSON), port=0) as server:
+        job = _run(server, executor=ThreadPoolExecutor(max_workers=2))
+    metrics, shard_metrics = job.metrics, [shard.metrics for shard in job.shards]
+    assert (metrics.shards, metrics.status, metrics.from_cache) == (2, jobs.DONE, False)
+    assert metrics.upload_bytes == sum(shard.upload_bytes for shard in shard_metrics) == job.uploaded > 0
+    assert metrics.download_bytes == sum(shard.download_bytes for shard in shard_metrics)
+    assert metrics.ttfb == min(shard.ttfb for shard in shard_metrics)
+    assert metrics.total == max(shard.total for shard in shard_metrics) == job.elapsed